@@ -1,80 +1,188 @@
 #!/usr/bin/env python3
-import re, sys
-from collections import defaultdict, OrderedDict
-
-if len(sys.argv) < 2:
-    print("Usage: python3 fgt_link_report.py <fmg_output.txt>")
-    sys.exit(1)
-
-text = open(sys.argv[1], 'r', encoding='utf-8', errors='ignore').read()
-
-# --- Parse switch-interface section ---
-switch_members = defaultdict(list)
-cur_switch = None
-for line in text.splitlines():
-    line = line.strip()
-    # start of a switch block: edit "<name>"
-    m = re.match(r'^edit\s+"?([A-Za-z0-9._-]+)"?', line)
-    if m:
-        cur_switch = m.group(1)
-        continue
-    # members
-    if cur_switch and line.startswith("set member "):
-        # members may be quoted or unquoted, space-separated
-        members = re.findall(r'"?([A-Za-z0-9._-]+)"?', line[len("set member "):])
-        switch_members[cur_switch].extend(members)
-    # end of block
-    if line == "next":
-        cur_switch = None
-
-# --- Parse physical interface status section ---
-# Blocks look like:
-# ==[port1]
-# mode: ...
-# status: up
-# speed: 1000Mbps (Duplex: full)
-iface = None
-status = {}
-speed = {}
-for line in text.splitlines():
-    m = re.match(r'^==\[(.+?)\]', line.strip())
-    if m:
-        iface = m.group(1)
-        continue
-    if iface:
-        if line.strip().startswith('status:'):
-            status[iface] = line.split(':',1)[1].strip()
-        elif line.strip().startswith('speed:'):
-            speed[iface] = line.split(':',1)[1].strip()
-
-# --- Build reverse map: interface -> switch (if any) ---
-iface_to_switch = {}
-for sw, members in switch_members.items():
-    for m in members:
-        iface_to_switch[m] = sw
-
-# --- Output: grouped by switch, then unassigned ---
+import re, sys, os, csv, json
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# shared FortiOS CLI parser lives one level up, next to the DHCP scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from fortios_cli import ConfigParser, chunk_size, expand_paths, is_batch, prompt_device
+
+USAGE = """Usage: python3 fgt_link_report.py [--csv | --json] [--jobs N] [--output FILE] <fmg_output.txt | dir | glob>...
+  one file          port status grouped by switch (text), or rows with --csv/--json
+  several/dir/glob  every file parsed in worker processes into one CSV (default) or JSON
+                    of device, switch, port, status, speed"""
+
+RE_IFACE  = re.compile(r"==\[(.+?)\]")
+FIELDS = ("device", "switch", "port", "status", "speed")
+
+# ---------------- parse ----------------
+def parse_report(lines) -> Tuple[Optional[str], Dict[str, List[str]], Dict[str, str], Dict[str, str]]:
+    """
+    One pass over an FMG "run on device" output: (device, switch -> member ports,
+    port -> status, port -> speed). Switch members come only from the
+    "config system switch-interface" section; status/speed from the
+    "get system interface physical" blocks:
+      ==[port1]
+      status: up
+      speed: 1000Mbps (Duplex: full)
+    """
+    cli = ConfigParser({"system switch-interface"})
+    switch_members = defaultdict(list)
+    status, speed = {}, {}
+    device = None
+    iface = None
+    for line in lines:
+        s = line.strip()
+        if s.startswith("==["):
+            m = RE_IFACE.match(s)
+            if m:
+                iface = m.group(1)
+                continue
+        if iface:
+            if s.startswith("status:"):
+                status[iface] = s.split(":", 1)[1].strip()
+                continue
+            if s.startswith("speed:"):
+                speed[iface] = s.split(":", 1)[1].strip()
+                continue
+        section = cli.feed(s)
+        if section is not None:
+            for sw in section.edits:
+                switch_members[sw.name].extend(sw.values("member"))
+        elif device is None and not cli.in_section:
+            device = prompt_device(s)
+    return device, switch_members, status, speed
+
 def sort_key(name):
     m = re.match(r'([A-Za-z]+)(\d+)$', name)
     if m:
         return (m.group(1), int(m.group(2)))
     return (name, 0)
 
-print("=== PORT STATUS BY SWITCH ===")
-if switch_members:
-    for sw in sorted(switch_members.keys()):
-        print(f"[{sw}]")
-        for m in sorted(switch_members[sw], key=sort_key):
-            s = status.get(m, 'unknown')
-            sp = speed.get(m, '')
-            print(f"  {m:<12} {s:<5} {sp}")
-        print()
-else:
-    print("(No switch-interface configured)")
-
-print("[UNASSIGNED PORTS]")
-others = [i for i in status.keys() if i not in iface_to_switch]
-for i in sorted(others, key=sort_key):
-    print(f"  {i:<12} {status.get(i,'unknown'):<5} {speed.get(i,'')}")
-
-    
\ No newline at end of file
+def port_rows(device: str, switch_members: Dict[str, List[str]], status: Dict[str, str],
+              speed: Dict[str, str]) -> List[Dict]:
+    """(device, switch, port, status, speed) dicts: switch members first, then unassigned ports (switch "")."""
+    rows = []
+    assigned = set()
+    for sw in sorted(switch_members):
+        for p in sorted(switch_members[sw], key=sort_key):
+            assigned.add(p)
+            rows.append({"device": device, "switch": sw, "port": p,
+                         "status": status.get(p, "unknown"), "speed": speed.get(p, "")})
+    for p in sorted((i for i in status if i not in assigned), key=sort_key):
+        rows.append({"device": device, "switch": "", "port": p, "status": status[p], "speed": speed.get(p, "")})
+    return rows
+
+def parse_file(path: str) -> Tuple[str, List[Dict], Optional[str]]:
+    """Parse one FMG output in a worker: (path, rows, error message or None)."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            device, members, status, speed = parse_report(f)
+    except OSError as e:
+        return path, [], str(e)
+    device = device or os.path.splitext(os.path.basename(path))[0]
+    return path, port_rows(device, members, status, speed), None
+
+# ---------------- output ----------------
+def print_text(switch_members, status, speed):
+    iface_to_switch = {m: sw for sw, members in switch_members.items() for m in members}
+
+    print("=== PORT STATUS BY SWITCH ===")
+    if switch_members:
+        for sw in sorted(switch_members.keys()):
+            print(f"[{sw}]")
+            for m in sorted(switch_members[sw], key=sort_key):
+                s = status.get(m, 'unknown')
+                sp = speed.get(m, '')
+                print(f"  {m:<12} {s:<5} {sp}")
+            print()
+    else:
+        print("(No switch-interface configured)")
+
+    print("[UNASSIGNED PORTS]")
+    others = [i for i in status.keys() if i not in iface_to_switch]
+    for i in sorted(others, key=sort_key):
+        print(f"  {i:<12} {status.get(i,'unknown'):<5} {speed.get(i,'')}")
+
+def write_rows(results, fmt: str, out) -> int:
+    """Write (path, rows, error) results as one CSV or JSON array; returns the number of failed files."""
+    failed = 0
+    writer = None
+    if fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=FIELDS, lineterminator="\n")
+        writer.writeheader()
+    else:
+        out.write("[")
+    first = True
+    for path, rows, err in results:
+        if err:
+            failed += 1
+            print(f"[error] {path}: {err}", file=sys.stderr)
+            continue
+        if writer:
+            writer.writerows(rows)
+            continue
+        for r in rows:
+            out.write(("\n  " if first else ",\n  ") + json.dumps(r))
+            first = False
+    if not writer:
+        out.write("\n]\n" if not first else "]\n")
+    return failed
+
+def main(argv: List[str]):
+    # ---------------- CLI flags ----------------
+    fmt = None
+    jobs = None
+    output = None
+    paths = []
+    it = iter(argv)
+    for a in it:
+        if a == "--csv":
+            fmt = "csv"
+        elif a == "--json":
+            fmt = "json"
+        elif a == "--jobs" or a.startswith("--jobs="):
+            v = a.split("=", 1)[1] if "=" in a else next(it, "")
+            jobs = int(v) if v.isdigit() else 0
+            if jobs < 1:
+                print(f"[error] --jobs must be at least 1, got {v!r}", file=sys.stderr)
+                return 2
+        elif a in ("--output", "-o") or a.startswith("--output="):
+            output = a.split("=", 1)[1] if "=" in a else next(it, "")
+        elif a in ("-h", "--help"):
+            print(USAGE)
+            return 0
+        else:
+            paths.append(a)
+
+    if not paths:
+        print(USAGE)
+        return 1
+
+    if not is_batch(paths) and fmt is None:
+        with open(paths[0], "r", encoding="utf-8", errors="ignore") as f:
+            _, members, status, speed = parse_report(f)
+        print_text(members, status, speed)
+        return 0
+
+    files = expand_paths(paths)
+    if not files:
+        print("[error] no input files found", file=sys.stderr)
+        return 2
+    out = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        if len(files) == 1:
+            failed = write_rows([parse_file(files[0])], fmt or "csv", out)
+        else:
+            jobs = jobs or os.cpu_count() or 1
+            chunk = chunk_size(len(files), jobs)
+            with ProcessPoolExecutor(max_workers=jobs) as pool:
+                failed = write_rows(pool.map(parse_file, files, chunksize=chunk), fmt or "csv", out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,161 @@
+"""Tests for fgt_link_report module."""
+
+import csv
+import io
+import json
+import os
+import shutil
+
+import pytest
+
+from fgt_link_report import FIELDS, main, parse_file, parse_report, port_rows, write_rows
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fmg_output.txt")
+
+# Text report for fmg_output.txt as printed by the original single-file script
+BASELINE = """\
+=== PORT STATUS BY SWITCH ===
+[int.dhca-cook]
+  port7        up    1000Mbps (Duplex: full)
+
+[int.management]
+  port1        down  n/a
+  port2        down  n/a
+  port4        down  n/a
+  x2           up    10000Mbps (Duplex: full)
+
+[sw-uplink-ge]
+  port5        up    1000Mbps (Duplex: full)
+
+[UNASSIGNED PORTS]
+  ha           up    1000Mbps (Duplex: full)
+  mgmt         up    1000Mbps (Duplex: full)
+  modem        down  n/a
+  npu0_vlink0  up    n/a (Duplex: n/a)
+  npu0_vlink1  up    n/a (Duplex: n/a)
+  port3        up    1000Mbps (Duplex: full)
+  port6        down  n/a
+  port8        up    1000Mbps (Duplex: full)
+  port9        down  n/a
+  port10       down  n/a
+  port11       down  n/a
+  port12       down  n/a
+  s1           down  n/a
+  s2           down  n/a
+  vw1          down  n/a
+  vw2          down  n/a
+  x1           up    10000Mbps (Duplex: full)
+"""
+
+PORTS = 23   # switch members + unassigned ports in the sample
+
+
+@pytest.fixture
+def reports(tmp_path):
+    """A directory of FMG outputs: the sample under three device names and one without prompts."""
+    with open(SAMPLE, encoding="utf-8", errors="ignore") as f:
+        text = f.read()
+    for n in range(3):
+        (tmp_path / f"out{n}.txt").write_text(text.replace("fgt-600e-drt2", f"fgt-{n}"))
+    lines = [l for l in text.splitlines() if "fgt-600e-drt2" not in l]
+    (tmp_path / "noprompt.txt").write_text("\n".join(lines) + "\n")
+    return tmp_path
+
+
+def read_csv(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+class TestParseReport:
+    """Tests for parse_report and port_rows."""
+
+    def test_sample(self):
+        """Test device, switch members and port status from the sample."""
+        with open(SAMPLE, encoding="utf-8", errors="ignore") as f:
+            device, members, status, speed = parse_report(f)
+
+        assert device == "fgt-600e-drt2"
+        assert sorted(members) == ["int.dhca-cook", "int.management", "sw-uplink-ge"]
+        assert sorted(members["int.management"]) == ["port1", "port2", "port4", "x2"]
+        assert (status["x2"], speed["x2"]) == ("up", "10000Mbps (Duplex: full)")
+
+    def test_port_rows(self):
+        """Test that members come first and unassigned ports have switch ""."""
+        rows = port_rows("fw", {"sw": ["port10", "port2"]}, {"port2": "up", "port3": "down"}, {"port2": "1G"})
+
+        assert rows == [
+            {"device": "fw", "switch": "sw", "port": "port2", "status": "up", "speed": "1G"},
+            {"device": "fw", "switch": "sw", "port": "port10", "status": "unknown", "speed": ""},
+            {"device": "fw", "switch": "", "port": "port3", "status": "down", "speed": ""},
+        ]
+
+    def test_device_falls_back_to_file_name(self, reports):
+        """Test that an output without a prompt is named after its file."""
+        _, rows, err = parse_file(str(reports / "noprompt.txt"))
+
+        assert err is None
+        assert {r["device"] for r in rows} == {"noprompt"}
+
+
+class TestOutput:
+    """Tests for the text, CSV and JSON output modes."""
+
+    def test_text_matches_baseline(self, capsys):
+        """Test that the single-file text report is unchanged."""
+        assert main([SAMPLE]) == 0
+        assert capsys.readouterr().out == BASELINE
+
+    def test_csv_rows(self, reports, capsys):
+        """Test one CSV row per port per device."""
+        assert main(["--csv", "--jobs", "1", str(reports)]) == 0
+        rows = read_csv(capsys.readouterr().out)
+
+        assert tuple(rows[0]) == FIELDS
+        assert len(rows) == 4 * PORTS
+        assert sorted({r["device"] for r in rows}) == ["fgt-0", "fgt-1", "fgt-2", "noprompt"]
+        assert {"device": "fgt-1", "switch": "int.management", "port": "x2", "status": "up",
+                "speed": "10000Mbps (Duplex: full)"} in rows
+        assert {"device": "fgt-2", "switch": "", "port": "modem", "status": "down", "speed": "n/a"} in rows
+
+    def test_json_matches_csv(self, reports, capsys):
+        """Test that --json gives the same rows as --csv."""
+        main(["--csv", str(reports)])
+        from_csv = read_csv(capsys.readouterr().out)
+        main(["--json", str(reports)])
+
+        assert json.loads(capsys.readouterr().out) == from_csv
+
+    def test_single_file_csv(self, capsys):
+        """Test that --csv on one file gives rows instead of the text report."""
+        assert main(["--csv", SAMPLE]) == 0
+        assert len(read_csv(capsys.readouterr().out)) == PORTS
+
+    def test_missing_file(self, reports, capsys):
+        """Test that an unreadable file is reported and gives rc 1."""
+        assert main(["--csv", str(reports / "out0.txt"), str(reports / "gone.txt")]) == 1
+        out = capsys.readouterr()
+
+        assert "[error]" in out.err and "gone.txt" in out.err
+        assert len(read_csv(out.out)) == PORTS
+
+
+class TestParallel:
+    """Tests for the worker-process batch path."""
+
+    @pytest.mark.parametrize("fmt", ("--csv", "--json"))
+    def test_jobs_match_serial(self, reports, tmp_path, fmt):
+        """Test that --jobs 2 writes exactly what a serial parse does."""
+        for n in range(3, 8):
+            shutil.copy(reports / "out0.txt", reports / f"out{n}.txt")
+        files = sorted(str(p) for p in reports.iterdir())
+        serial = io.StringIO()
+        write_rows([parse_file(f) for f in files], fmt[2:], serial)
+
+        out = tmp_path / f"parallel{fmt[2:]}"
+        assert main([fmt, "--jobs", "2", "--output", str(out), str(reports)]) == 0
+        assert out.read_text() == serial.getvalue()
+
+    def test_rejects_bad_jobs(self, reports, capsys):
+        """Test that --jobs below 1 is an [error] with rc 2."""
+        assert main(["--jobs", "0", str(reports)]) == 2
+        assert "[error] --jobs must be at least 1" in capsys.readouterr().err
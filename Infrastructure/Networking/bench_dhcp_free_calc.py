@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Synthetic FortiGate DHCP output and a parser benchmark for fg_dhcp_free_calc.py.
+
+Generate a fixture:
+  python bench_dhcp_free_calc.py --generate leases out.txt --scopes 1000 --leases 1000000
+
+Benchmark every format (each measured in a fresh interpreter so peak RSS is its own):
+  python bench_dhcp_free_calc.py --scopes 1,100,1000 --leases 10000,1000000
+"""
+import sys, os, json, time, random, tempfile, subprocess
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from fg_dhcp_free_calc import DhcpParser, scope_rows, int_to_ip
+
+# ---------------- generator ----------------
+FORMATS = ("stats", "config", "config-multi", "leases", "legacy", "full")
+
+NOW = datetime(2025, 9, 23, 11, 0, 0)   # fixed so expiry horizons are reproducible
+EPOCH = datetime(1970, 1, 1)
+DEVICE = "FG-SYNTH"
+BASE = 10 << 24                          # everything is carved out of 10.0.0.0/8
+UTILISATION = 0.7                        # leases / pool size per scope
+LEASE_TIME = 86400
+VCIS = ("MSFT 5.0", "Cisco Systems, Inc. IP Phone CP-8851", "android-dhcp-14", "")
+
+class Scope:
+    """One DHCP server: its pool ranges, reserved addresses and leased addresses."""
+
+    def __init__(self, index: int, leases: int, block: int, multi: bool, rng: random.Random):
+        self.name = f"vlan{index + 1:04d}"
+        self.server_id = index + 1
+        pool = max(10, int(leases / UTILISATION) + 1)
+        start = BASE + index * block + 10     # .1-.9 left for gateways
+        if multi and pool >= 8:
+            # four ranges with a two-address hole between each
+            part, extra = divmod(pool, 4)
+            self.ranges = []
+            for k in range(4):
+                n = part + (k < extra)
+                self.ranges.append((start, start + n - 1))
+                start += n + 2
+        else:
+            self.ranges = [(start, start + pool - 1)]
+        self.total = pool
+        picks = rng.sample(range(pool), min(pool, leases + 4))
+        self.leased = [self._nth(i) for i in picks[:leases]]
+        self.reserved = [self._nth(i) for i in picks[leases:]]
+
+    def _nth(self, i: int) -> int:
+        for a, b in self.ranges:
+            if i <= b - a:
+                return a + i
+            i -= b - a + 1
+        raise IndexError(i)
+
+def layout(scopes: int, leases: int, multi: bool = False, seed: int = 0) -> List[Scope]:
+    """Spread `leases` over `scopes` servers, each in its own power-of-two block of 10/8."""
+    rng = random.Random(seed)
+    per, extra = divmod(leases, scopes)
+    need = int((per + 1) / UTILISATION) + 32
+    block = 256
+    while block < need:
+        block *= 2
+    if block * scopes > 1 << 24:
+        raise ValueError(f"{scopes} scopes x {per + 1} leases do not fit in 10.0.0.0/8")
+    return [Scope(i, per + (i < extra), block, multi, rng) for i in range(scopes)]
+
+def _expiry_strings(rng: random.Random) -> Iterator[str]:
+    """Lease-list expiry column: from an hour ago to one lease time ahead of NOW."""
+    days = {}
+    start = int((NOW - EPOCH).total_seconds())
+    while True:
+        t = start + rng.randint(-3600, LEASE_TIME)
+        day, sec = divmod(t, 86400)
+        prefix = days.get(day)
+        if prefix is None:
+            d = EPOCH + timedelta(days=day)
+            prefix = days[day] = (d.strftime("%a %b %d"), d.year)
+        h, rem = divmod(sec, 3600)
+        yield f"{prefix[0]} {h:02d}:{rem // 60:02d}:{rem % 60:02d} {prefix[1]}"
+
+def _mac(n: int) -> str:
+    return "02:" + ":".join(f"{(n >> s) & 0xff:02x}" for s in (32, 24, 16, 8, 0))
+
+def stats_lines(scopes: List[Scope]) -> Iterator[str]:
+    yield f"{DEVICE} $ diagnose ip dhcp server statistics"
+    for sc in scopes:
+        yield f'DHCP server: "{sc.name}"'
+        yield f"  Total addresses: {sc.total}"
+        yield f"  Leases in use: {len(sc.leased)}"
+        yield "  Leases offered: 0"
+
+def config_lines(scopes: List[Scope]) -> Iterator[str]:
+    yield f"{DEVICE} $ show system dhcp server"
+    yield "config system dhcp server"
+    for sc in scopes:
+        gw = int_to_ip(sc.ranges[0][0] - 9)
+        yield f"edit {sc.server_id}"
+        yield f"set lease-time {LEASE_TIME}"
+        yield f"set default-gateway {gw}"
+        yield f'set interface "{sc.name}"'
+        yield "config ip-range"
+        for k, (a, b) in enumerate(sc.ranges, 1):
+            yield f"edit {k}"
+            yield f"set start-ip {int_to_ip(a)}"
+            yield f"set end-ip {int_to_ip(b)}"
+            yield "next"
+        yield "end"
+        yield f"set dns-server1 {gw}"
+        if sc.reserved:
+            yield "config reserved-address"
+            for k, ip in enumerate(sc.reserved, 1):
+                yield f"edit {k}"
+                yield f"set ip {int_to_ip(ip)}"
+                yield f"set mac {_mac(ip)}"
+                yield "next"
+            yield "end"
+        yield "next"
+    yield "end"
+
+def lease_lines(scopes: List[Scope], seed: int = 0) -> Iterator[str]:
+    expiry = _expiry_strings(random.Random(seed))
+    yield f"{DEVICE} $ exec dhcp lease-list"
+    n = 0
+    for sc in scopes:
+        yield sc.name
+        yield "IP MAC-Address Hostname VCI SSID AP SERVER-ID Expiry"
+        for ip in sc.leased:
+            n += 1
+            yield f"{int_to_ip(ip)} {_mac(ip)} HOST-{n:07d} {VCIS[n & 3]} {sc.server_id} {next(expiry)}"
+
+def legacy_lines(scopes: List[Scope]) -> Iterator[str]:
+    yield f"{DEVICE} $ get system dhcp lease"
+    for sc in scopes:
+        for ip in sc.leased:
+            yield f"ip: {int_to_ip(ip)} mac: {_mac(ip)} interface: {sc.name}"
+
+def generate(fmt: str, scopes: int, leases: int, seed: int = 0) -> Tuple[Iterator[str], Dict[str, Tuple[int, int]]]:
+    """
+    Lines of one synthetic dump and the expected scope -> (total, used) for it
+    (total is 0 where the format carries no pool sizes).
+    """
+    sc = layout(scopes, leases, fmt == "config-multi", seed)
+    if fmt == "stats":
+        lines = stats_lines(sc)
+    elif fmt in ("config", "config-multi"):
+        lines = config_lines(sc)
+    elif fmt == "leases":
+        lines = lease_lines(sc, seed)
+    elif fmt == "legacy":
+        lines = legacy_lines(sc)
+    elif fmt == "full":
+        # what an FMG "run on device" task returns: config then lease-list
+        lines = (l for part in (config_lines(sc), lease_lines(sc, seed)) for l in part)
+    else:
+        raise ValueError(f"unknown format {fmt!r} (one of {', '.join(FORMATS)})")
+    has_total = fmt in ("stats", "config", "config-multi", "full")
+    has_used = fmt in ("stats", "leases", "legacy", "full")
+    expected = {s.name: (s.total if has_total else 0, len(s.leased) if has_used else 0) for s in sc}
+    return lines, expected
+
+def write_fixture(path: str, fmt: str, scopes: int, leases: int, seed: int = 0) -> Dict[str, Tuple[int, int]]:
+    lines, expected = generate(fmt, scopes, leases, seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
+    return expected
+
+# ---------------- benchmark ----------------
+def _peak_rss_mb() -> Optional[float]:
+    # VmHWM belongs to this address space; ru_maxrss survives exec on Linux and
+    # would report the parent's high-water mark (the generator's) instead
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _parse(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        p = DhcpParser(now=NOW).parse(f)
+    return scope_rows(p, p.device or "")
+
+def measure(path: str, repeat: int = 3) -> Dict:
+    """
+    Parse one file in this process: best of `repeat` timed runs (parse plus the
+    per-scope rows, bitmaps included) and peak RSS, in total and above what the
+    interpreter had reached before parsing (the parser's own footprint).
+    """
+    base = _peak_rss_mb()
+    best = None
+    rows = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        rows = _parse(path)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    rss = _peak_rss_mb()
+    size = os.path.getsize(path)
+    return {
+        "bytes": size,
+        "seconds": best,
+        "mb_per_s": size / (1024 * 1024) / best if best else None,
+        "peak_rss_mb": rss,
+        "parse_rss_mb": rss - base if rss is not None else None,
+        "scopes": {r["scope"]: (r["total"], r["used"]) for r in rows},
+    }
+
+def run_isolated(path: str, repeat: int) -> Dict:
+    """measure() in a fresh interpreter so peak RSS is not inherited from the generator."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), "--measure", path, "--repeat", str(repeat)],
+                         check=True, capture_output=True, text=True, cwd=here)
+    return json.loads(out.stdout)
+
+def benchmark(formats: List[str], scopes: List[int], leases: List[int], repeat: int = 3,
+              seed: int = 0, keep: Optional[str] = None) -> List[Dict]:
+    """Generate each format x size into a temp dir (or `keep`) and measure it."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = keep or tmp
+        os.makedirs(workdir, exist_ok=True)
+        for fmt in formats:
+            for n_scopes in scopes:
+                for n_leases in leases:
+                    path = os.path.join(workdir, f"{fmt}-{n_scopes}s-{n_leases}l.txt")
+                    expected = write_fixture(path, fmt, n_scopes, n_leases, seed)
+                    r = run_isolated(path, repeat)
+                    got = {k: tuple(v) for k, v in r.pop("scopes").items()}
+                    r.update({"format": fmt, "n_scopes": n_scopes, "n_leases": n_leases,
+                              "ok": got == expected})
+                    print_result(r)
+                    results.append(r)
+    return results
+
+def print_header():
+    print("Format        | Scopes |  Leases |     Size |     Time |   MB/s | Peak RSS | Parse RSS | Check")
+    print("-----------------------------------------------------------------------------------------------")
+
+def print_result(r: Dict):
+    rss = f"{r['peak_rss_mb']:.1f} MB" if r["peak_rss_mb"] is not None else "n/a"
+    grew = f"+{r['parse_rss_mb']:.1f} MB" if r["parse_rss_mb"] is not None else "n/a"
+    print(f"{r['format']:13}   {r['n_scopes']:>6}   {r['n_leases']:>7}   {r['bytes'] / 1048576:>6.2f}MB"
+          f"   {r['seconds']:>6.3f}s   {r['mb_per_s']:>6.1f}   {rss:>8}   {grew:>9}"
+          f"   {'ok' if r['ok'] else 'MISMATCH'}", flush=True)
+
+def _int_list(v: str) -> List[int]:
+    return [int(x) for x in v.split(",") if x]
+
+def main(argv: List[str]):
+    # ---------------- CLI flags ----------------
+    formats = list(FORMATS)
+    scopes = [1, 100, 1000]
+    leases = [10000, 100000]
+    repeat = 3
+    seed = 0
+    keep = None
+    generate_args = None
+    measure_path = None
+    it = iter(argv)
+    for a in it:
+        v = a.split("=", 1)[1] if "=" in a else None
+        flag = a.split("=", 1)[0]
+        if flag == "--formats":
+            formats = (v or next(it, "")).split(",")
+        elif flag == "--scopes":
+            scopes = _int_list(v or next(it, ""))
+        elif flag == "--leases":
+            leases = _int_list(v or next(it, ""))
+        elif flag == "--repeat":
+            repeat = max(1, int(v or next(it, "1")))
+        elif flag == "--seed":
+            seed = int(v or next(it, "0"))
+        elif flag == "--keep":
+            # leave the generated fixtures in this directory
+            keep = v or next(it, "")
+        elif flag == "--generate":
+            generate_args = (next(it, ""), next(it, ""))
+        elif flag == "--measure":
+            measure_path = next(it, "")
+        else:
+            print(f"[error] unknown argument {a!r}", file=sys.stderr)
+            return 2
+
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        print(f"[error] unknown format {unknown[0]!r} (one of {', '.join(FORMATS)})", file=sys.stderr)
+        return 2
+
+    if measure_path:
+        print(json.dumps(measure(measure_path, repeat)))
+        return 0
+
+    if generate_args:
+        fmt, out = generate_args
+        if fmt not in FORMATS or not out:
+            print(f"[error] --generate FORMAT OUT, FORMAT one of {', '.join(FORMATS)}", file=sys.stderr)
+            return 2
+        write_fixture(out, fmt, scopes[0], leases[0], seed)
+        return 0
+
+    print_header()
+    results = benchmark(formats, scopes, leases, repeat, seed, keep)
+    return 0 if all(r["ok"] for r in results) else 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Prometheus exporter for DHCP utilization from a directory of FortiGate dumps.
+
+A background thread stats the dumps every --interval seconds and reparses only
+the files whose mtime or size changed; scrapes are answered from the cached
+text, so /metrics never waits on a parse.
+
+  python fg_dhcp_free_calc.py --serve 9617 --interval 30 /srv/fmg-dumps
+
+Lease expiries in the dumps are the devices' wall-clock times with no zone;
+--tz names the zone they are in (default: this host's) so the exported unix
+timestamps are right when the exporter runs elsewhere, e.g. in UTC.
+"""
+import sys, os, time, threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone, tzinfo
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fg_dhcp_free_calc import parse_file
+from fortios_cli import expand_paths
+
+PREFIX = "fortigate_dhcp_scope"
+
+# (metric suffix, row key, help text); soonest expiry is exported as unix time
+GAUGES = (
+    ("free_percent", "pct_free", "Free addresses in the scope's pool, percent."),
+    ("used", "used", "Addresses in use (leases, or statistics when present)."),
+    ("total", "total", "Addresses in the scope's pool."),
+    ("available", "available", "Total minus used."),
+    ("true_free", "free", "Addresses neither leased nor reserved, from the ip-range bitmap."),
+    ("soonest_expiry_timestamp_seconds", "soonest_expiry", "Soonest lease expiry, unix time."),
+)
+
+def _label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def parse_tz(name: str) -> tzinfo:
+    """Time zone for --tz: "UTC" or an IANA name such as "Europe/Berlin"."""
+    if name.upper() == "UTC":
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (KeyError, ValueError):   # ZoneInfoNotFoundError is a KeyError
+        raise ValueError(f"unknown time zone {name!r}") from None
+
+def render(rows: List[Dict], tz: Optional[tzinfo] = None) -> str:
+    """
+    Prometheus text exposition of the per-scope gauges for these report rows.
+    Naive expiry datetimes are read as wall-clock time in `tz` (None: this host's zone).
+    """
+    out = []
+    for suffix, key, help_text in GAUGES:
+        name = f"{PREFIX}_{suffix}"
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} gauge")
+        for r in rows:
+            v = r[key]
+            if v is None:
+                continue
+            if isinstance(v, datetime):
+                v = (v if v.tzinfo else v.replace(tzinfo=tz)).timestamp()
+            out.append(f'{name}{{device="{_label(r["device"])}",scope="{_label(r["scope"])}"}} {v}')
+    return "\n".join(out) + "\n"
+
+class DumpCache:
+    """
+    Report rows per dump file, keyed by path and (mtime_ns, size) so a file is
+    reparsed only after it changes. Files that disappear are dropped. The gauge
+    text is rebuilt only when some file was reparsed or dropped.
+    """
+
+    def __init__(self, paths: List[str], jobs: Optional[int] = None, tz: Optional[tzinfo] = None):
+        self.paths = paths
+        self.jobs = jobs
+        self.tz = tz
+        self.files: Dict[str, Tuple[Tuple[int, int], List[Dict]]] = {}
+        self.errors: Dict[str, str] = {}
+        self.parses = 0
+        self.parse_errors = 0
+        self.last_refresh = 0.0
+        self.last_duration = 0.0
+        self._gauges = render([], tz)
+
+    def refresh(self) -> int:
+        """Stat every dump and reparse what changed; returns the number of files reparsed."""
+        t0 = time.monotonic()
+        seen, changed = {}, []
+        for path in expand_paths(self.paths):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            key = (st.st_mtime_ns, st.st_size)
+            seen[path] = key
+            cached = self.files.get(path)
+            if cached is None or cached[0] != key:
+                changed.append(path)
+        gone = set(self.files) - set(seen)
+        for path in gone:
+            del self.files[path]
+        for path in set(self.errors) - set(seen):
+            del self.errors[path]
+
+        if len(changed) > 4 and self.jobs != 1:
+            with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+                results = list(pool.map(parse_file, changed))
+        else:
+            results = [parse_file(p) for p in changed]
+        for path, rows, err in results:
+            self.parses += 1
+            if err:
+                self.parse_errors += 1
+                self.errors[path] = err
+                self.files.pop(path, None)
+                print(f"[error] {path}: {err}", file=sys.stderr)
+            else:
+                self.errors.pop(path, None)
+                self.files[path] = (seen[path], rows)
+        if changed or gone:
+            self._gauges = render(self.rows(), self.tz)
+
+        self.last_refresh = time.time()
+        self.last_duration = time.monotonic() - t0
+        return len(changed)
+
+    def rows(self) -> List[Dict]:
+        return [r for path in sorted(self.files) for r in self.files[path][1]]
+
+    def render(self) -> str:
+        meta = [
+            "# HELP dhcp_exporter_files Dump files currently parsed.",
+            "# TYPE dhcp_exporter_files gauge",
+            f"dhcp_exporter_files {len(self.files)}",
+            "# HELP dhcp_exporter_parses_total Dump files parsed since start.",
+            "# TYPE dhcp_exporter_parses_total counter",
+            f"dhcp_exporter_parses_total {self.parses}",
+            "# HELP dhcp_exporter_parse_errors_total Dump files that could not be read.",
+            "# TYPE dhcp_exporter_parse_errors_total counter",
+            f"dhcp_exporter_parse_errors_total {self.parse_errors}",
+            "# HELP dhcp_exporter_last_refresh_timestamp_seconds End of the last directory check, unix time.",
+            "# TYPE dhcp_exporter_last_refresh_timestamp_seconds gauge",
+            f"dhcp_exporter_last_refresh_timestamp_seconds {self.last_refresh}",
+            "# HELP dhcp_exporter_last_refresh_duration_seconds Time the last check and reparse took.",
+            "# TYPE dhcp_exporter_last_refresh_duration_seconds gauge",
+            f"dhcp_exporter_last_refresh_duration_seconds {self.last_duration}",
+        ]
+        return self._gauges + "\n".join(meta) + "\n"
+
+class Exporter:
+    """DumpCache refreshed on a timer, with the rendered text swapped in under a lock."""
+
+    def __init__(self, paths: List[str], interval: float = 30.0, jobs: Optional[int] = None,
+                 tz: Optional[tzinfo] = None):
+        self.cache = DumpCache(paths, jobs, tz)
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._body = b""
+        self._stop = threading.Event()
+
+    def refresh(self):
+        self.cache.refresh()
+        body = self.cache.render().encode()
+        with self._lock:
+            self._body = body
+
+    @property
+    def body(self) -> bytes:
+        with self._lock:
+            return self._body
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:   # keep serving the last good text
+                print(f"[error] refresh failed: {e}", file=sys.stderr)
+
+    def start(self):
+        self.refresh()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+def make_handler(exporter: Exporter):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] != "/metrics":
+                body, code, ctype = b"see /metrics\n", 404, "text/plain"
+            else:
+                body, code, ctype = exporter.body, 200, "text/plain; version=0.0.4; charset=utf-8"
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def serve(paths: List[str], port: int, interval: float = 30.0, jobs: Optional[int] = None,
+          host: str = "", tz: Optional[tzinfo] = None) -> int:
+    exporter = Exporter(paths, interval, jobs, tz)
+    exporter.start()
+    srv = ThreadingHTTPServer((host, port), make_handler(exporter))
+    srv.daemon_threads = True
+    print(f"[exporter] {len(exporter.cache.files)} dump(s), serving http://{host or '0.0.0.0'}:{port}/metrics",
+          file=sys.stderr)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exporter.stop()
+        srv.server_close()
+    return 0
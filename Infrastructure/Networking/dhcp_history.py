@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Per-scope DHCP utilization history in SQLite, with exhaustion forecasts."""
+import sqlite3
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    device TEXT NOT NULL,
+    scope  TEXT NOT NULL,
+    ts     INTEGER NOT NULL,          -- unix seconds
+    used   INTEGER NOT NULL,
+    total  INTEGER NOT NULL,
+    PRIMARY KEY (device, scope, ts)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS trend (
+    device TEXT NOT NULL,
+    scope  TEXT NOT NULL,
+    origin INTEGER NOT NULL,          -- ts of the first sample; t below is days since origin
+    last_ts INTEGER NOT NULL,
+    last_used INTEGER NOT NULL,
+    last_total INTEGER NOT NULL,
+    w REAL NOT NULL, wt REAL NOT NULL, wu REAL NOT NULL, wtt REAL NOT NULL, wtu REAL NOT NULL,
+    PRIMARY KEY (device, scope)
+) WITHOUT ROWID;
+"""
+
+DAY = 86400.0
+
+# Fitted slopes smaller than this (addresses/day) are reported as flat, so
+# noise around zero does not print as "-0.0/day"
+MIN_SLOPE = 0.05
+
+
+class Forecast(NamedTuple):
+    device: str
+    scope: str
+    used: int
+    total: int
+    per_day: Optional[float]          # fitted change in used addresses per day (None: < 2 samples)
+    exhaustion: Optional[datetime]    # projected date the pool fills (None: not growing)
+
+
+class DhcpHistory:
+    """
+    Append-only time series of (used, total) per device and scope.
+
+    Each sample also updates running weighted least-squares sums in the trend
+    table, so a forecast is a single-row lookup: nothing is re-read or
+    re-parsed as the history grows. Older samples are decayed with the given
+    half-life so the trend follows recent behaviour rather than the whole past.
+    """
+
+    def __init__(self, path: str, half_life_days: float = 30.0):
+        self.path = path
+        self.half_life = half_life_days
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self) -> "DhcpHistory":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.commit()
+            self.conn.close()
+            self.conn = None
+
+    def record(self, device: str, scope: str, ts: datetime, used: int, total: int) -> bool:
+        """Store one sample and fold it into the trend. Returns False if already stored."""
+        t_unix = int(ts.timestamp())
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO samples VALUES (?, ?, ?, ?, ?)", (device, scope, t_unix, used, total))
+        if cur.rowcount == 0:
+            return False
+        row = self.conn.execute(
+            "SELECT origin, last_ts, last_used, last_total, w, wt, wu, wtt, wtu FROM trend"
+            " WHERE device = ? AND scope = ?", (device, scope)).fetchone()
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO trend VALUES (?, ?, ?, ?, ?, ?, 1, 0, ?, 0, 0)",
+                (device, scope, t_unix, t_unix, used, total, float(used)))
+            return True
+        origin, last_ts, last_used, last_total, w, wt, wu, wtt, wtu = row
+        t = (t_unix - origin) / DAY
+        if t_unix >= last_ts:
+            # decay what is there, the new sample gets full weight
+            d = 0.5 ** ((t_unix - last_ts) / DAY / self.half_life)
+            w, wt, wu, wtt, wtu = w * d, wt * d, wu * d, wtt * d, wtu * d
+            k = 1.0
+            last_ts, last_used, last_total = t_unix, used, total
+        else:
+            # a late (back-filled) sample enters already decayed
+            k = 0.5 ** ((last_ts - t_unix) / DAY / self.half_life)
+        self.conn.execute(
+            "UPDATE trend SET last_ts = ?, last_used = ?, last_total = ?,"
+            " w = ?, wt = ?, wu = ?, wtt = ?, wtu = ? WHERE device = ? AND scope = ?",
+            (last_ts, last_used, last_total,
+             w + k, wt + k * t, wu + k * used, wtt + k * t * t, wtu + k * t * used, device, scope))
+        return True
+
+    def record_rows(self, rows: Iterable[Dict], ts: datetime) -> int:
+        """Record report rows (device, scope, used, total) in one transaction; returns rows added."""
+        added = 0
+        with self.conn:
+            for r in rows:
+                if r["total"]:
+                    added += self.record(r["device"], r["scope"], ts, r["used"], r["total"])
+        return added
+
+    def forecast(self, device: str, scope: str) -> Optional[Forecast]:
+        row = self.conn.execute(
+            "SELECT origin, last_ts, last_used, last_total, w, wt, wu, wtt, wtu FROM trend"
+            " WHERE device = ? AND scope = ?", (device, scope)).fetchone()
+        return self._forecast(device, scope, row) if row else None
+
+    def forecasts(self) -> List[Forecast]:
+        rows = self.conn.execute(
+            "SELECT device, scope, origin, last_ts, last_used, last_total, w, wt, wu, wtt, wtu"
+            " FROM trend ORDER BY device, scope").fetchall()
+        return [self._forecast(r[0], r[1], r[2:]) for r in rows]
+
+    @staticmethod
+    def _forecast(device: str, scope: str, row) -> Forecast:
+        origin, last_ts, used, total, w, wt, wu, wtt, wtu = row
+        den = w * wtt - wt * wt
+        if den <= 1e-12:
+            return Forecast(device, scope, used, total, None, None)
+        slope = (w * wtu - wt * wu) / den
+        if abs(slope) < MIN_SLOPE:
+            slope = 0.0
+        exhaustion = None
+        if slope > 0:
+            # from the fitted level at the last sample, not the noisy last reading
+            t_last = (last_ts - origin) / DAY
+            level = (wu - slope * wt) / w + slope * t_last
+            days = max(0.0, (total - level) / slope)
+            # far-off dates are not useful and would overflow datetime
+            if days < 36500:
+                exhaustion = datetime.fromtimestamp(last_ts) + timedelta(days=days)
+        return Forecast(device, scope, used, total, slope, exhaustion)
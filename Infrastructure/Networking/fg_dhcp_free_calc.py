@@ -1,19 +1,13 @@
 #!/usr/bin/env python3
-import sys, re, ipaddress
-from datetime import datetime
-from typing import Optional, Dict, Tuple
-
-# ---------------- CLI flags ----------------
-DEBUG = False
-CSV = False
-paths = []
-for a in sys.argv[1:]:
-    if a == "--debug":
-        DEBUG = True
-    elif a == "--csv":
-        CSV = True
-    else:
-        paths.append(a)
+import sys, os, re, json, bisect, functools, ipaddress
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Optional, Dict, Iterable, List, NamedTuple, Tuple, TextIO
+
+from dhcp_history import DhcpHistory
+from fortios_cli import (ConfigParser, Node, KEYWORDS as CLI_KEYWORDS, chunk_size, expand_paths,
+                         is_batch, prompt_device)
 
 # ---------------- helpers ----------------
 def norm_name(s: Optional[str]) -> str:
@@ -32,159 +26,751 @@ def parse_dt(s: str) -> Optional[datetime]:
     except Exception:
         return None
 
-def read_all_text() -> str:
-    if paths:
-        with open(paths[0], "r", encoding="utf-8", errors="ignore") as f:
-            return f.read()
-    else:
-        return sys.stdin.read()
+# ---------------- lease expiry ----------------
+# Times are kept as whole seconds since 0001-01-01 (date ordinal * 86400 + time of day):
+# plain ints compare and subtract far faster than datetimes, and convert back exactly.
+MONTHS = {m: i for i, m in enumerate(("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+                                      "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"), 1)}
+WEEKDAYS = {"Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"}
+
+# Expiry horizons reported per scope, in seconds (1h/8h/24h)
+HORIZONS = (3600, 8 * 3600, 24 * 3600)
+
+@functools.lru_cache(maxsize=4096)
+def _day_seconds(year: int, month: int, day: int) -> int:
+    # A lease list spans a few days, so nearly every row is a cache hit
+    return date(year, month, day).toordinal() * 86400
+
+def expiry_seconds(raw: str) -> Optional[int]:
+    """
+    Decode a lease row ending in 'Mon Sep 29 11:05:03 2025' without strptime.
+    Returns seconds (see above), or None if the row has no valid expiry.
+    """
+    parts = raw.rsplit(None, 5)
+    if len(parts) < 6:
+        return None
+    wd, mon, day, hms, year = parts[1:]
+    month = MONTHS.get(mon)
+    if month is None or wd not in WEEKDAYS or len(hms) != 8 or hms[2] != ":" or hms[5] != ":":
+        return None
+    try:
+        return (_day_seconds(int(year), month, int(day))
+                + int(hms[:2]) * 3600 + int(hms[3:5]) * 60 + int(hms[6:]))
+    except ValueError:
+        return None
+
+def dt_to_seconds(d: datetime) -> int:
+    return d.toordinal() * 86400 + d.hour * 3600 + d.minute * 60 + d.second
+
+def seconds_to_dt(n: int) -> datetime:
+    return datetime.fromordinal(n // 86400) + timedelta(seconds=n % 86400)
+
+def ip_range_size(a: str, b: str) -> int:
+    """Number of addresses in an inclusive IPv4 range (0 if invalid or reversed)."""
+    try:
+        ai = int(ipaddress.IPv4Address(a))
+        bi = int(ipaddress.IPv4Address(b))
+    except Exception:
+        return 0
+    return bi - ai + 1 if bi >= ai else 0
+
+def ip_to_int(ip: str) -> Optional[int]:
+    """Dotted quad to int without building an ipaddress object (None if invalid)."""
+    try:
+        a, b, c, d = map(int, ip.split("."))
+    except ValueError:
+        return None
+    if a > 255 or b > 255 or c > 255 or d > 255:
+        return None
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+def int_to_ip(n: int) -> str:
+    return f"{n >> 24}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+# ---------------- pool bitmaps ----------------
+# Scopes whose ip-ranges add up to more addresses than this (a /8, 2 MB per
+# bitmap) are reported without the exact bitmap figures
+MAX_BITMAP_ADDRESSES = 1 << 24
+
+class Occupancy(NamedTuple):
+    """Exact address-level state of one scope's configured ranges."""
+    size: int                 # addresses in the ip-ranges
+    leased: int               # distinct leased addresses inside the ranges
+    reserved: int             # reserved addresses inside the ranges not currently leased
+    free: int                 # addresses neither leased nor reserved
+    largest_free: int         # longest run of consecutive free addresses
+    largest_free_start: str   # first address of that run ("" if none)
+    out_of_range: int         # lease rows whose address is outside every range
+    duplicates: int           # lease rows repeating an address already counted
+
+def longest_run(x: int) -> Tuple[int, int]:
+    """
+    (length, lowest bit index) of the longest run of 1 bits in x, (0, 0) if none.
+    Bit i of runs[j] is set when bits i .. i + 2**j - 1 of x all are, so the
+    length is found by doubling and then halving: O(log n) big-int ANDs and
+    shifts rather than one step per bit.
+    """
+    if not x:
+        return 0, 0
+    runs = [x]
+    k = 1
+    while True:
+        y = runs[-1] & (runs[-1] >> k)
+        if not y:
+            break
+        runs.append(y)
+        k <<= 1
+    length, y = k, runs[-1]
+    for j in range(len(runs) - 2, -1, -1):
+        longer = y & (runs[j] >> length)
+        if longer:
+            y, length = longer, length + (1 << j)
+    return length, (y & -y).bit_length() - 1
+
+class PoolBitmap:
+    """
+    One bit per address of a scope's ip-ranges (a /16 is 8 KB per bitmap).
+
+    Overlapping and adjacent ranges are merged first, and each merged range
+    gets its own leased and reserved bitmaps, so ranges far apart (the same
+    scope name on two devices of a bulk dump) cost nothing for the gap between
+    them. A free run can therefore only end at a gap, and the longest one is
+    the longest within any merged range. Raises ValueError when the ranges
+    cover more than MAX_BITMAP_ADDRESSES.
+    """
+
+    def __init__(self, ranges: List[Tuple[int, int]]):
+        merged: List[List[int]] = []
+        for a, b in sorted(r for r in ranges if r[1] >= r[0]):
+            if merged and a <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self.starts = [a for a, _ in merged]
+        self.ends = [b for _, b in merged]
+        self.size = sum(b - a + 1 for a, b in merged)
+        if self.size > MAX_BITMAP_ADDRESSES:
+            raise ValueError(f"ip-ranges cover {self.size} addresses (limit {MAX_BITMAP_ADDRESSES})")
+        self.leased = [bytearray((b - a + 8) // 8) for a, b in merged]
+        self.reserved = [bytearray((b - a + 8) // 8) for a, b in merged]
+        self.out_of_range = 0
+        self.duplicates = 0
+
+    def _locate(self, ip: int) -> Tuple[int, int]:
+        # (merged range index, bit offset in it); index -1 if outside every range
+        i = bisect.bisect_right(self.starts, ip) - 1
+        if i < 0 or ip > self.ends[i]:
+            return -1, 0
+        return i, ip - self.starts[i]
+
+    def reserve(self, ip: int):
+        i, off = self._locate(ip)
+        if i >= 0:
+            self.reserved[i][off >> 3] |= 1 << (off & 7)
+
+    def lease(self, ip: int):
+        i, off = self._locate(ip)
+        if i < 0:
+            self.out_of_range += 1
+            return
+        bits = self.leased[i]
+        bit = 1 << (off & 7)
+        if bits[off >> 3] & bit:
+            self.duplicates += 1
+        else:
+            bits[off >> 3] |= bit
+
+    def occupancy(self) -> Occupancy:
+        leased = reserved = free = 0
+        largest, start = 0, ""
+        for a, b, lb, rb in zip(self.starts, self.ends, self.leased, self.reserved):
+            # Little-endian so that bit i of the int is address a + i, as marked above
+            l = int.from_bytes(lb, "little")
+            r = int.from_bytes(rb, "little")
+            f = ((1 << (b - a + 1)) - 1) & ~(l | r)
+            leased += l.bit_count()
+            reserved += (r & ~l).bit_count()
+            free += f.bit_count()
+            n, off = longest_run(f)
+            if n > largest:   # strictly longer: ties keep the lowest address
+                largest, start = n, int_to_ip(a + off)
+        return Occupancy(
+            size=self.size,
+            leased=leased,
+            reserved=reserved,
+            free=free,
+            largest_free=largest,
+            largest_free_start=start,
+            out_of_range=self.out_of_range,
+            duplicates=self.duplicates,
+        )
+
+# ---------------- patterns (compiled once) ----------------
+IPV4 = r"\d+\.\d+\.\d+\.\d+"
+RE_STATS_SERVER = re.compile(r"DHCP server:\s+(\S+)")
+RE_STATS_TOTAL  = re.compile(r"Total addresses:\s+(\d+)")
+RE_STATS_USED   = re.compile(r"Leases in use:\s+(\d+)")
+RE_SCOPE        = re.compile(r"[A-Za-z0-9._-]+$")
+RE_IP_ONLY      = re.compile(rf"{IPV4}$")
+RE_LEASE_ROW    = re.compile(rf"\s*({IPV4})\s")
+RE_LEGACY_IP    = re.compile(rf"\bip:\s*({IPV4})")
+RE_LEGACY_IF    = re.compile(r"(?:interface|ifname):\s*(\S+)")
+
+# Lines that are CLI keywords, never lease-list scope headers
+KEYWORDS = {"ip", "next", "end"}
 
 # ---------------- parse ----------------
-text = read_all_text()
-
-# Accumulators
-pools: Dict[str, int] = {}    # scope -> total addresses
-used:  Dict[str, int] = {}    # scope -> used count
-exp_min: Dict[str, datetime] = {}  # scope -> earliest expiry
-exp_max: Dict[str, datetime] = {}  # scope -> latest expiry
-
-# 1) Prefer "diagnose ip dhcp server statistics" if present (quick totals/used)
-stats_blocks = re.split(r"\n(?=DHCP server:\s+\S+)", text)
-for b in stats_blocks:
-    m_iface = re.search(r"DHCP server:\s+(\S+)", b)
-    m_tot   = re.search(r"Total addresses:\s+(\d+)", b)
-    m_used  = re.search(r"Leases in use:\s+(\d+)", b)
-    if m_iface and m_tot:
-        name = norm_name(m_iface.group(1))
-        pools[name] = int(m_tot.group(1))
-        if m_used:
-            used[name] = int(m_used.group(1))
-        if DEBUG:
-            print(f"[stats] scope={name} total={pools[name]} used={used.get(name,0)}", file=sys.stderr)
-
-# 2) If we didn’t get totals yet, parse "show system dhcp server"
-if not pools:
-    servers = []  # list of {"iface": str, "ranges": [(start,end),...], "_pending": {}}
-    current = None
-    for line in text.splitlines():
-        s = line.strip()
-        if re.match(r"^edit\s+\d+\s*$", s):
-            if current:
-                servers.append(current)
-            current = {"iface": None, "ranges": [], "_pending": {}}
-            continue
-        if current is None:
-            continue
+class DhcpParser:
+    """
+    Single-pass line state machine over a FortiGate CLI dump.
 
-        # set interface "lan"
-        m_iface = re.match(r'^set\s+interface\s+(.+)$', s)
-        if m_iface:
-            current["iface"] = norm_name(m_iface.group(1))
-            continue
+    Understands, in any order and mixed in one file:
+      * "diagnose ip dhcp server statistics" blocks (totals/used per scope)
+      * "show system dhcp server" config (pool size from ip-range entries)
+      * "exec dhcp lease-list" tables (used count + expiry per scope)
+      * the very old "get system dhcp lease" format (ip:/interface: lines)
 
-        # Single range: set ip-range A.B.C.D W.X.Y.Z
-        m_range = re.match(r"^set\s+ip-range\s+(\d+\.\d+\.\d+\.\d+)\s+(\d+\.\d+\.\d+\.\d+)$", s)
-        if m_range:
-            current["ranges"].append((m_range.group(1), m_range.group(2)))
-            continue
+    Feed lines with feed() (or parse() for a whole stream) and call finish().
+    Only the server being read and the running totals are kept, so memory does
+    not grow with the size of the dump.
 
-        # Multi-range style with start-ip / end-ip inside config ip-range
-        m_start = re.match(r"^set\s+start-ip\s+(\d+\.\d+\.\d+\.\d+)$", s)
-        if m_start:
-            current["_pending"]["start"] = m_start.group(1)
-            continue
-        m_end = re.match(r"^set\s+end-ip\s+(\d+\.\d+\.\d+\.\d+)$", s)
-        if m_end:
-            current["_pending"]["end"] = m_end.group(1)
-            continue
+    Lease expiries are decoded with expiry_seconds() and counted per scope into
+    expired / within 1h / 8h / 24h of `now` in the same pass.
+    """
+
+    def __init__(self, debug: bool = False, now: Optional[datetime] = None):
+        self.debug = debug
+        # reference time for the expiry horizons (device-local, like the lease list)
+        self.now = now or datetime.now()
+        self._now_s = dt_to_seconds(self.now)
+        # statistics blocks
+        self.stats_pools: Dict[str, int] = {}
+        self.stats_used: Dict[str, int] = {}
+        self._stats: Optional[List] = None       # [name, total, used] of the open block
+        # show system dhcp server
+        self.config_pools: Dict[str, int] = {}
+        self.config_ranges: Dict[str, List[Tuple[int, int]]] = {}
+        self.config_reserved: Dict[str, List[int]] = {}
+        # only "system dhcp server" is built into a tree; other sections are skipped
+        self._cli = ConfigParser({"system dhcp server"})
+        self._server: Optional[Dict] = None      # {"iface", "total", "ranges", "reserved"} being added
+        # lease-list and legacy leases
+        self.lease_used: Dict[str, int] = {}
+        self.legacy_used: Dict[str, int] = {}
+        # leased addresses per scope, kept as 4-byte ints for the bitmaps at the end
+        self.lease_ips: Dict[str, array] = {}
+        self.exp_min_s: Dict[str, int] = {}
+        self.exp_max_s: Dict[str, int] = {}
+        # scope -> [expired, within 1h, within 8h, within 24h] (horizons are cumulative)
+        self.expiring: Dict[str, List[int]] = {}
+        self._scope: Optional[str] = None
+        # hostname from the first CLI prompt ("FG100E-ZGBC $ show ...")
+        self.device: Optional[str] = None
+
+    def parse(self, lines: Iterable[str]) -> "DhcpParser":
+        """Feed every line of a stream (file object, stdin, list) and finish."""
+        feed = self.feed
+        for line in lines:
+            feed(line)
+        self.finish()
+        return self
+
+    def feed(self, raw: str):
+        s = raw.strip()
+        if not s:
+            return
+
+        # 1) statistics: a block starts at a line beginning "DHCP server: <name>"
+        if "DHCP server:" in raw:
+            m = RE_STATS_SERVER.search(raw)
+            if m and raw.startswith("DHCP server:"):
+                self._close_stats()
+                self._stats = [norm_name(m.group(1)), None, None]
+                return
+            if m and self._stats is None:
+                self._stats = [norm_name(m.group(1)), None, None]
+        if self._stats is not None:
+            if self._stats[1] is None and "Total addresses:" in raw:
+                m = RE_STATS_TOTAL.search(raw)
+                if m: self._stats[1] = int(m.group(1))
+            if self._stats[2] is None and "Leases in use:" in raw:
+                m = RE_STATS_USED.search(raw)
+                if m: self._stats[2] = int(m.group(1))
+
+        # 2) config sections: the shared CLI parser tracks nesting, so inner
+        #    edit/next don't end a server and other sections are skipped whole
+        first = s.split(None, 1)[0]
+        if first in CLI_KEYWORDS:
+            if first == "edit" and self._cli.idle:
+                # server entries pasted without their "config system dhcp server" line
+                self._cli.feed("config system dhcp server")
+            section = self._cli.feed(s)
+            if section is not None:
+                self._dhcp_servers(section)
+            return
+
+        if self.device is None:
+            self.device = prompt_device(s)
+            if self.device is not None:
+                return
+
+        # 3) lease-list: one-token scope header, then rows starting with an IPv4
+        if not self._cli.in_section and s.lower() not in KEYWORDS and RE_SCOPE.match(s) and not RE_IP_ONLY.match(s):
+            self._scope = norm_name(s)
+            self.lease_used.setdefault(self._scope, 0)
+            return
+        m = self._scope and RE_LEASE_ROW.match(raw)
+        if m:
+            self.add_lease(self._scope, m.group(1), expiry_seconds(raw))
+            return
 
-        if s == "next":
-            p = current.get("_pending", {})
-            if "start" in p and "end" in p:
-                current["ranges"].append((p["start"], p["end"]))
-            current["_pending"] = {}
-
-    if current:
-        servers.append(current)
-
-    # Sum ranges per interface name
-    for sv in servers:
-        iface = sv.get("iface")
-        if not iface: continue
-        total = 0
-        for a, b in sv["ranges"]:
+        # 4) fallback: very old "get system dhcp lease" format (key off interface/ifname)
+        m_ip = "ip:" in raw and RE_LEGACY_IP.search(raw)
+        if m_ip:
+            m = RE_LEGACY_IF.search(raw)
+            if m:
+                name = norm_name(m.group(1))
+                self.legacy_used[name] = self.legacy_used.get(name, 0) + 1
+                self._add_lease_ip(name, m_ip.group(1))
+
+    def add_lease(self, scope: str, ip: str, expiry: Optional[int] = None):
+        """
+        Count one lease-list row: used count, leased address and expiry (in
+        expiry_seconds() units). Also the entry point for non-CLI sources.
+        """
+        self.lease_used[scope] = self.lease_used.get(scope, 0) + 1
+        self._add_lease_ip(scope, ip)
+        t = expiry
+        if t is not None:
+            if scope not in self.exp_min_s:
+                self.exp_min_s[scope] = self.exp_max_s[scope] = t
+                self.expiring[scope] = [0, 0, 0, 0]
+            elif t < self.exp_min_s[scope]:
+                self.exp_min_s[scope] = t
+            elif t > self.exp_max_s[scope]:
+                self.exp_max_s[scope] = t
+            left = t - self._now_s
+            counts = self.expiring[scope]
+            if left < 0:
+                counts[0] += 1
+            else:
+                for i, h in enumerate(HORIZONS, 1):
+                    if left <= h:
+                        counts[i] += 1
+
+    def add_server(self, iface: str, ranges: Iterable[Tuple[str, str]], reserved: Iterable[str] = ()):
+        """Add one DHCP server's pool as if read from "show system dhcp server"."""
+        sv = {"iface": norm_name(iface), "total": 0, "ranges": [], "reserved": []}
+        for a, b in ranges:
+            self._add_range(sv, a, b)
+        for ip in reserved:
+            n = ip_to_int(ip)
+            if n is not None:
+                sv["reserved"].append(n)
+        self._server = sv
+        self._close_server()
+
+    def _dhcp_servers(self, section: Node):
+        for e in section.edits:
+            # single range: set ip-range A.B.C.D W.X.Y.Z; multi-range: config ip-range / edit N
+            single = e.values("ip-range")
+            ranges = [tuple(single[:2])] if len(single) >= 2 else []
+            sub = e.config("ip-range")
+            if sub:
+                ranges += [(r.get("start-ip", ""), r.get("end-ip", "")) for r in sub.edits]
+            sub = e.config("reserved-address")
+            reserved = [r.get("ip", "") for r in sub.edits] if sub else []
+            self.add_server(e.get("interface", ""), ranges, reserved)
+
+    def _add_lease_ip(self, scope: str, ip: str):
+        n = ip_to_int(ip)
+        if n is not None:
+            ips = self.lease_ips.get(scope)
+            if ips is None:
+                ips = self.lease_ips[scope] = array("I")
+            ips.append(n)
+
+    def _add_range(self, sv: Dict, a: str, b: str):
+        sv["total"] += ip_range_size(a, b)
+        ai, bi = ip_to_int(a), ip_to_int(b)
+        if ai is not None and bi is not None and bi >= ai:
+            sv["ranges"].append((ai, bi))
+
+    def _close_stats(self):
+        if self._stats is None:
+            return
+        name, total, in_use = self._stats
+        self._stats = None
+        if total is None:
+            return
+        self.stats_pools[name] = total
+        if in_use is not None:
+            self.stats_used[name] = in_use
+        if self.debug:
+            print(f"[stats] scope={name} total={total} used={self.stats_used.get(name,0)}", file=sys.stderr)
+
+    def _close_server(self):
+        sv, self._server = self._server, None
+        if not sv or not sv["iface"]:
+            return
+        iface = sv["iface"]
+        self.config_pools[iface] = self.config_pools.get(iface, 0) + sv["total"]
+        self.config_ranges.setdefault(iface, []).extend(sv["ranges"])
+        self.config_reserved.setdefault(iface, []).extend(sv["reserved"])
+        if self.debug:
+            print(f"[pool] scope={iface} total={self.config_pools[iface]}", file=sys.stderr)
+
+    def finish(self):
+        self._close_stats()
+        section = self._cli.close()
+        if section is not None:
+            # dump cut off inside the config: keep the servers read so far
+            self._dhcp_servers(section)
+
+    def occupancy(self) -> Dict[str, Occupancy]:
+        """scope -> exact occupancy, for scopes whose ip-ranges were in the config."""
+        out = {}
+        for name, ranges in self.config_ranges.items():
+            if not ranges:
+                continue
             try:
-                ai = int(ipaddress.IPv4Address(a))
-                bi = int(ipaddress.IPv4Address(b))
-                if bi >= ai:
-                    total += (bi - ai + 1)
-            except Exception:
-                pass
-        pools[iface] = pools.get(iface, 0) + total
-        if DEBUG:
-            print(f"[pool] scope={iface} total={pools[iface]}", file=sys.stderr)
-
-# 3) Parse leases + expirations from "exec dhcp lease-list"
-# Block headers are scope names (e.g., lan, VOICE, snow), followed by a table whose
-# data lines start with an IPv4 address. The expiry timestamp is at the end of the line.
-current_scope = None
-expiry_re = re.compile(r'([A-Z][a-z]{2}\s+[A-Z][a-z]{2}\s+\d{1,2}\s+\d{2}:\d{2}:\d{2}\s+\d{4})\s*$')
-for raw in text.splitlines():
-    s = raw.strip()
-
-    # Scope header line: one token, not an IP, not column header "IP"
-    if re.match(r"^[A-Za-z0-9._-]+$", s) and not re.match(r"^\d+\.\d+\.\d+\.\d+$", s) and s.lower() != "ip":
-        current_scope = norm_name(s)
-        used.setdefault(current_scope, 0)
-        continue
-
-    # Lease rows start with an IPv4 address
-    if current_scope and re.match(r"^\s*\d+\.\d+\.\d+\.\d+\s", raw):
-        used[current_scope] = used.get(current_scope, 0) + 1
-        mexp = expiry_re.search(raw)
-        if mexp:
-            dt = parse_dt(mexp.group(1))
-            if dt:
-                if current_scope not in exp_min or dt < exp_min[current_scope]:
-                    exp_min[current_scope] = dt
-                if current_scope not in exp_max or dt > exp_max[current_scope]:
-                    exp_max[current_scope] = dt
-
-# Fallback: very old "get system dhcp lease" format (key off interface/ifname)
-for line in text.splitlines():
-    if re.search(r"\bip:\s*\d+\.\d+\.\d+\.\d+", line):
-        m_if = re.search(r"(?:interface|ifname):\s*(\S+)", line)
-        if m_if:
-            name = norm_name(m_if.group(1))
-            used[name] = used.get(name, 0) + 1
+                bm = PoolBitmap(ranges)
+            except ValueError as e:
+                print(f"[warn] scope {name}: {e}; exact occupancy skipped", file=sys.stderr)
+                continue
+            for ip in self.config_reserved.get(name, ()):
+                bm.reserve(ip)
+            for ip in self.lease_ips.get(name, ()):
+                bm.lease(ip)
+            out[name] = bm.occupancy()
+        return out
+
+    @property
+    def exp_min(self) -> Dict[str, datetime]:
+        """scope -> soonest lease expiry."""
+        return {k: seconds_to_dt(v) for k, v in self.exp_min_s.items()}
+
+    @property
+    def exp_max(self) -> Dict[str, datetime]:
+        """scope -> latest lease expiry."""
+        return {k: seconds_to_dt(v) for k, v in self.exp_max_s.items()}
+
+    @property
+    def pools(self) -> Dict[str, int]:
+        """scope -> total addresses (statistics win over the config when both are present)."""
+        return self.stats_pools or self.config_pools
+
+    @property
+    def used(self) -> Dict[str, int]:
+        """scope -> used count (statistics + lease-list rows + legacy lease lines)."""
+        out: Dict[str, int] = {}
+        for part in (self.stats_used, self.lease_used, self.legacy_used):
+            for name, n in part.items():
+                out[name] = out.get(name, 0) + n
+        return out
+
+def open_input(paths: List[str]) -> TextIO:
+    """First path given, else stdin; read lazily line by line."""
+    if paths:
+        return open(paths[0], "r", encoding="utf-8", errors="ignore")
+    return sys.stdin
 
 # ---------------- output ----------------
 def fmt_dt(d: Optional[datetime]) -> str:
     return d.strftime("%a %b %d %H:%M:%S %Y") if d else "-"
 
-scopes = sorted(set(pools.keys()) | set(used.keys()))
-if CSV:
-    print("Scope,%Free,Used,Total,Available,SoonestExpiry,LatestExpiry")
-    for name in scopes:
+def scope_rows(p: DhcpParser, device: str = "") -> List[Dict]:
+    """
+    One dict per scope: device, scope, pct_free, used, total, available, expiries,
+    plus the exact bitmap figures (free, largest free block, reserved, leases out
+    of range, duplicate rows) where the scope's ip-ranges are known, else None.
+    """
+    pools, used = p.pools, p.used
+    occ = p.occupancy()
+    exp_min, exp_max = p.exp_min, p.exp_max
+    rows = []
+    for name in sorted(set(pools.keys()) | set(used.keys())):
         total = pools.get(name, 0)
         u = used.get(name, 0)
         avail = total - u if total else 0
-        pct = (100.0 * avail / total) if total else None
-        pct_str = f"{pct:.1f}" if pct is not None else ""
-        print(f"{name},{pct_str},{u},{total},{avail},{fmt_dt(exp_min.get(name))},{fmt_dt(exp_max.get(name))}")
-else:
-    print("Scope            | % Free | Used/Total | Available | Soonest Expiry           | Latest Expiry")
+        rows.append({
+            "device": device,
+            "scope": name,
+            "pct_free": round(100.0 * avail / total, 1) if total else None,
+            "used": u,
+            "total": total,
+            "available": avail,
+            "soonest_expiry": exp_min.get(name),
+            "latest_expiry": exp_max.get(name),
+        })
+        expired, h1, h8, h24 = p.expiring.get(name, (0, 0, 0, 0))
+        rows[-1].update({"expired": expired, "expiring_1h": h1, "expiring_8h": h8, "expiring_24h": h24,
+                         "trend_per_day": None, "exhaustion_date": None})
+        o = occ.get(name)
+        rows[-1].update({
+            "free": o.free if o else None,
+            "largest_free_block": o.largest_free if o else None,
+            "largest_free_start": o.largest_free_start if o else None,
+            "reserved": o.reserved if o else None,
+            "out_of_range": o.out_of_range if o else None,
+            "duplicates": o.duplicates if o else None,
+        })
+    return rows
+
+CSV_HEADER = ("Scope,%Free,Used,Total,Available,SoonestExpiry,LatestExpiry,"
+              "TrueFree,LargestFreeBlock,LargestFreeStart,Reserved,OutOfRange,Duplicates,"
+              "Expired,Expiring1h,Expiring8h,Expiring24h,TrendPerDay,ExhaustionDate")
+EXACT_KEYS = ("free", "largest_free_block", "largest_free_start", "reserved", "out_of_range", "duplicates",
+              "expired", "expiring_1h", "expiring_8h", "expiring_24h", "trend_per_day", "exhaustion_date")
+
+def csv_line(r: Dict, device: bool = False) -> str:
+    pct_str = f"{r['pct_free']:.1f}" if r["pct_free"] is not None else ""
+    line = f"{r['scope']},{pct_str},{r['used']},{r['total']},{r['available']},{fmt_dt(r['soonest_expiry'])},{fmt_dt(r['latest_expiry'])}"
+    line += "".join("," + ("" if r[k] is None else str(r[k])) for k in EXACT_KEYS)
+    return f"{r['device']},{line}" if device else line
+
+def json_line(r: Dict) -> str:
+    out = dict(r)
+    for k in ("soonest_expiry", "latest_expiry", "exhaustion_date"):
+        out[k] = out[k].isoformat() if out[k] else None
+    return json.dumps(out)
+
+def apply_history(history: DhcpHistory, rows: List[Dict], ts: datetime):
+    """
+    Append this run's per-scope (used, total) to the history store and fill in
+    trend_per_day / exhaustion_date from the updated forecast. "used" is the
+    same Used figure the report prints, so forecasts agree with the table.
+    """
+    history.record_rows(rows, ts)
+    for r in rows:
+        fc = history.forecast(r["device"], r["scope"])
+        if fc and fc.per_day is not None:
+            r["trend_per_day"] = round(fc.per_day, 2)
+            r["exhaustion_date"] = fc.exhaustion.replace(microsecond=0) if fc.exhaustion else None
+
+def print_forecasts(forecasts: Iterable) -> None:
+    print("Device           | Scope            | Used/Total   | Trend/day | Exhaustion")
     print("-----------------------------------------------------------------------------------------------")
-    for name in scopes:
-        total = pools.get(name, 0)
-        u = used.get(name, 0)
-        avail = total - u if total else 0
-        pct_str = f"{(100.0 * avail / total):6.1f}%" if total else "  n/a  "
-        print(f"{name:16} {pct_str}  {u}/{total:<9} {avail:<9} {fmt_dt(exp_min.get(name)):23} | {fmt_dt(exp_max.get(name))}")
-
-if DEBUG:
-    # Quick visibility into what we matched
-    print("\n[debug] pools:", pools, file=sys.stderr)
-    print("[debug] used:", used, file=sys.stderr)
-    print("[debug] exp_min:", {k: fmt_dt(v) for k,v in exp_min.items()}, file=sys.stderr)
-    print("[debug] exp_max:", {k: fmt_dt(v) for k,v in exp_max.items()}, file=sys.stderr)
\ No newline at end of file
+    for fc in forecasts:
+        trend = f"{fc.per_day:+.1f}" if fc.per_day is not None else "n/a"
+        eta = fc.exhaustion.strftime("%Y-%m-%d") if fc.exhaustion else ("-" if fc.per_day is not None else "need 2 runs")
+        print(f"{fc.device:16}   {fc.scope:16}   {f'{fc.used}/{fc.total}':<12}   {trend:>9}   {eta}")
+
+def print_report(p: DhcpParser, csv: bool = False, rows: Optional[List[Dict]] = None):
+    rows = rows if rows is not None else scope_rows(p)
+    if csv:
+        print(CSV_HEADER)
+        for r in rows:
+            print(csv_line(r))
+    else:
+        print("Scope            | % Free | Used/Total | Available | Soonest Expiry           | Latest Expiry")
+        print("-----------------------------------------------------------------------------------------------")
+        for r in rows:
+            name, u, total, avail = r["scope"], r["used"], r["total"], r["available"]
+            pct_str = f"{r['pct_free']:6.1f}%" if total else "  n/a  "
+            print(f"{name:16} {pct_str}  {u}/{total:<9} {avail:<9} {fmt_dt(r['soonest_expiry']):23} | {fmt_dt(r['latest_expiry'])}")
+
+        exact = [r for r in rows if r["free"] is not None]
+        if exact:
+            print("\nExact occupancy from ip-range bitmaps")
+            print("Scope            | True Free | Largest Free Block        | Reserved | Out of Range | Duplicates")
+            print("-----------------------------------------------------------------------------------------------")
+            for r in exact:
+                block = f"{r['largest_free_block']} from {r['largest_free_start']}" if r["largest_free_block"] else "0"
+                print(f"{r['scope']:16}   {r['free']:<9}   {block:<25} {r['reserved']:<10} {r['out_of_range']:<14} {r['duplicates']}")
+
+        if p.expiring:
+            print(f"\nLeases expiring from {fmt_dt(p.now)} (cumulative)")
+            print("Scope            | Expired | <= 1h   | <= 8h   | <= 24h")
+            print("-----------------------------------------------------------------------------------------------")
+            for r in rows:
+                if r["scope"] in p.expiring:
+                    print(f"{r['scope']:16}   {r['expired']:<7}   {r['expiring_1h']:<7}   {r['expiring_8h']:<7}   {r['expiring_24h']}")
+
+        trended = [r for r in rows if r["trend_per_day"] is not None]
+        if trended:
+            print("\nExhaustion forecast from history")
+            print("Scope            | Trend/day | Exhaustion")
+            print("-----------------------------------------------------------------------------------------------")
+            for r in trended:
+                eta = r["exhaustion_date"].strftime("%Y-%m-%d") if r["exhaustion_date"] else "-"
+                print(f"{r['scope']:16}   {r['trend_per_day']:>+9.1f}   {eta}")
+
+# ---------------- batch ----------------
+def parse_file(path: str, now: Optional[datetime] = None) -> Tuple[str, List[Dict], Optional[str]]:
+    """Parse one device dump in a worker: (path, rows, error message or None)."""
+    try:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            p = DhcpParser(now=now).parse(f)
+    except OSError as e:
+        return path, [], str(e)
+    device = p.device or os.path.splitext(os.path.basename(path))[0]
+    return path, scope_rows(p, device), None
+
+def run_batch(files: List[str], ndjson: bool = False, jobs: Optional[int] = None, out: TextIO = sys.stdout,
+              now: Optional[datetime] = None, history: Optional[DhcpHistory] = None) -> int:
+    """
+    Parse many per-device dumps across a process pool into one report keyed by
+    device and scope (CSV, or NDJSON with --ndjson). Results are written in
+    input order as they arrive; returns the number of files that failed.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    chunk = chunk_size(len(files), jobs)
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # one reference time for every device, fixed before the workers start
+        now = now or datetime.now()
+        work = functools.partial(parse_file, now=now)
+        return write_results(pool.map(work, files, chunksize=chunk), ndjson, out, now, history)
+
+def write_results(results: Iterable[Tuple[str, List[Dict], Optional[str]]], ndjson: bool = False,
+                  out: TextIO = sys.stdout, now: Optional[datetime] = None,
+                  history: Optional[DhcpHistory] = None) -> int:
+    """Print (source, rows, error) results as one device-keyed report; returns the number that failed."""
+    failed = 0
+    if not ndjson:
+        print("Device," + CSV_HEADER, file=out)
+    for source, rows, err in results:
+        if err:
+            failed += 1
+            print(f"[error] {source}: {err}", file=sys.stderr)
+            continue
+        if history is not None:
+            # workers only parse/collect; the single SQLite writer is this process
+            apply_history(history, rows, now or datetime.now())
+        for r in rows:
+            print(json_line(r) if ndjson else csv_line(r, device=True), file=out)
+    return failed
+
+def main(argv: List[str]):
+    # ---------------- CLI flags ----------------
+    debug = False
+    csv = False
+    ndjson = False
+    jobs = None
+    now = None
+    history_path = None
+    forecast_only = False
+    devices_path = None
+    timeout = 30.0
+    serve_port = None
+    interval = 30.0
+    tz_name = None
+    paths = []
+    it = iter(argv)
+    for a in it:
+        if a == "--debug":
+            debug = True
+        elif a == "--csv":
+            csv = True
+        elif a == "--ndjson":
+            ndjson = True
+        elif a == "--jobs" or a.startswith("--jobs="):
+            v = a.split("=", 1)[1] if "=" in a else next(it, "")
+            jobs = int(v) if v.isdigit() else 0
+            if jobs < 1:
+                print(f"[error] --jobs must be at least 1, got {v!r}", file=sys.stderr)
+                return 2
+        elif a == "--history" or a.startswith("--history="):
+            # SQLite file the per-scope used/total of every run is appended to
+            history_path = a.split("=", 1)[1] if "=" in a else next(it, "")
+        elif a == "--forecast":
+            forecast_only = True
+        elif a == "--collect" or a.startswith("--collect="):
+            # pull live from the FortiGates listed in this file instead of parsing dumps
+            devices_path = a.split("=", 1)[1] if "=" in a else next(it, "")
+        elif a == "--serve" or a.startswith("--serve="):
+            # exporter daemon: Prometheus gauges on this port for the dumps given
+            serve_port = int(a.split("=", 1)[1] if "=" in a else next(it, "9617"))
+        elif a == "--interval" or a.startswith("--interval="):
+            # seconds between dump directory checks in --serve mode
+            interval = float(a.split("=", 1)[1] if "=" in a else next(it, "30"))
+        elif a == "--tz" or a.startswith("--tz="):
+            # zone of the dumps' lease times, for --serve's unix timestamps (default: this host's)
+            tz_name = a.split("=", 1)[1] if "=" in a else next(it, "")
+        elif a == "--timeout" or a.startswith("--timeout="):
+            # per-device budget for --collect, in seconds
+            timeout = float(a.split("=", 1)[1] if "=" in a else next(it, "30"))
+        elif a == "--now" or a.startswith("--now="):
+            # reference time for expiry horizons when replaying an old dump:
+            # ISO (2025-09-23T11:00:00) or lease-list style ("Tue Sep 23 11:00:00 2025")
+            v = a.split("=", 1)[1] if "=" in a else next(it, "")
+            try:
+                now = datetime.fromisoformat(v)
+            except ValueError:
+                now = parse_dt(v)
+            if now is None:
+                print(f"[error] cannot parse --now {v!r}", file=sys.stderr)
+                return 2
+        else:
+            paths.append(a)
+
+    history = DhcpHistory(history_path) if history_path else None
+    try:
+        if forecast_only:
+            # Forecasts straight from the store, nothing parsed
+            if history is None:
+                print("[error] --forecast needs --history FILE", file=sys.stderr)
+                return 2
+            print_forecasts(history.forecasts())
+            return 0
+
+        # Exporter mode: long-running, reparses a dump only when it changes
+        if serve_port is not None:
+            from dhcp_exporter import parse_tz, serve
+            if not paths:
+                print("[error] --serve needs a directory, glob or files of dumps", file=sys.stderr)
+                return 2
+            try:
+                tz = parse_tz(tz_name) if tz_name else None
+            except ValueError as e:
+                print(f"[error] {e}", file=sys.stderr)
+                return 2
+            return serve(paths, serve_port, interval, jobs, tz=tz)
+
+        # Collector mode: REST APIs of many devices at once, same report as batch mode
+        if devices_path:
+            from fgt_dhcp_collect import collect, read_devices   # needs requests
+            try:
+                devices = read_devices(devices_path)
+            except (OSError, ValueError) as e:
+                print(f"[error] {e}", file=sys.stderr)
+                return 2
+            if not devices:
+                print("[error] no devices to collect from", file=sys.stderr)
+                return 2
+            now = now or datetime.now()
+            return 1 if write_results(collect(devices, jobs, timeout, now), ndjson, now=now, history=history) else 0
+
+        # Batch mode: several files, a directory or a glob of per-device dumps
+        if is_batch(paths):
+            files = expand_paths(paths)
+            if not files:
+                print("[error] no input files found", file=sys.stderr)
+                return 2
+            return 1 if run_batch(files, ndjson, jobs, now=now, history=history) else 0
+
+        f = open_input(paths)
+        try:
+            p = DhcpParser(debug, now).parse(f)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+        device = p.device or (os.path.splitext(os.path.basename(paths[0]))[0] if paths else "")
+        rows = scope_rows(p, device)
+        if history is not None:
+            apply_history(history, rows, p.now)
+        print_report(p, csv, rows)
+    finally:
+        if history is not None:
+            history.close()
+
+    if debug:
+        # Quick visibility into what we matched
+        print("\n[debug] pools:", p.pools, file=sys.stderr)
+        print("[debug] used:", p.used, file=sys.stderr)
+        print("[debug] exp_min:", {k: fmt_dt(v) for k,v in p.exp_min.items()}, file=sys.stderr)
+        print("[debug] exp_max:", {k: fmt_dt(v) for k,v in p.exp_max.items()}, file=sys.stderr)
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
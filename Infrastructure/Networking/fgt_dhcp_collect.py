@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Live DHCP collection from many FortiGates' REST APIs at once.
+
+Each device is asked for its DHCP server config (pools, ranges, reserved
+addresses) and its lease table, and both are fed into the same DhcpParser
+aggregation fg_dhcp_free_calc.py uses for CLI dumps, so the report is
+identical to parsing "show system dhcp server" + "exec dhcp lease-list".
+
+Devices file, one per line ("#" comments; token "-" reads FGT_API_TOKEN):
+  <host[:port] or URL>  <api-token>  [vdom]
+"""
+import os, time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from http.cookiejar import DefaultCookiePolicy
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from fg_dhcp_free_calc import DhcpParser, dt_to_seconds, norm_name, scope_rows
+
+# Disable SSL warnings for self-signed certs
+requests.packages.urllib3.disable_warnings()
+
+STATUS_PATH = "/api/v2/monitor/system/status"
+CONFIG_PATH = "/api/v2/cmdb/system.dhcp/server"
+LEASES_PATH = "/api/v2/monitor/system/dhcp"
+
+CONNECT_TIMEOUT = 5.0
+
+class Device(NamedTuple):
+    url: str                 # https://host[:port], no trailing slash
+    token: str
+    vdom: Optional[str] = None
+
+def read_devices(path: str) -> List[Device]:
+    devices = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            parts = line.split("#", 1)[0].split()
+            if not parts:
+                continue
+            url = parts[0] if "://" in parts[0] else "https://" + parts[0]
+            token = parts[1] if len(parts) > 1 and parts[1] != "-" else os.environ.get("FGT_API_TOKEN", "")
+            if not token:
+                raise ValueError(f"{path}:{n}: no API token for {parts[0]} (and FGT_API_TOKEN is not set)")
+            devices.append(Device(url.rstrip("/"), token, parts[2] if len(parts) > 2 else None))
+    return devices
+
+def make_session(pool_size: int) -> requests.Session:
+    """
+    One session shared by every worker: a keep-alive pool per device (up to
+    pool_size devices kept open), no retries, no cookies (token auth needs
+    none, and a shared cookie jar is the part of a Session that is not
+    thread-safe).
+    """
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.verify = False
+    s.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return s
+
+def feed_rest(p: DhcpParser, servers: List[Dict], leases: List[Dict]):
+    """Feed cmdb system.dhcp/server entries and monitor system/dhcp leases into a parser."""
+    by_id = {}
+    for sv in servers:
+        iface = sv.get("interface") or ""
+        by_id[sv.get("id")] = norm_name(iface)
+        ranges = [(r.get("start-ip", ""), r.get("end-ip", "")) for r in sv.get("ip-range") or ()]
+        reserved = [r.get("ip", "") for r in sv.get("reserved-address") or ()]
+        p.add_server(iface, ranges, reserved)
+    for lease in leases:
+        ip = lease.get("ip") or ""
+        if ":" in ip:
+            continue   # DHCPv6
+        scope = norm_name(lease.get("interface")) or by_id.get(lease.get("server_mkey"))
+        if not scope:
+            continue
+        t = lease.get("expire_time")
+        # epoch seconds; the report works in local wall-clock time like the CLI
+        expiry = dt_to_seconds(datetime.fromtimestamp(t)) if isinstance(t, (int, float)) and t > 0 else None
+        p.add_lease(scope, ip, expiry)
+    p.finish()
+
+def collect_device(session: requests.Session, dev: Device, timeout: float = 30.0,
+                   now: Optional[datetime] = None) -> Tuple[str, List[Dict], Optional[str]]:
+    """
+    Pull one device: (device name, rows, error message or None). `timeout` is
+    the budget for the whole device; each request gets what is left of it.
+    """
+    deadline = time.monotonic() + timeout
+    headers = {"Authorization": f"Bearer {dev.token}", "Accept": "application/json"}
+    params = {"vdom": dev.vdom} if dev.vdom else None
+
+    def get(path: str):
+        left = deadline - time.monotonic()
+        if left <= 0:
+            raise TimeoutError(f"no response within {timeout:g}s")
+        r = session.get(dev.url + path, headers=headers, params=params, timeout=(min(CONNECT_TIMEOUT, left), left))
+        r.raise_for_status()
+        return r.json()
+
+    name = dev.url.split("://", 1)[-1]
+    try:
+        status = get(STATUS_PATH)
+        name = (status.get("results") or {}).get("hostname") or name
+        servers = get(CONFIG_PATH).get("results") or []
+        leases = get(LEASES_PATH).get("results") or []
+        p = DhcpParser(now=now)
+        p.device = name
+        feed_rest(p, servers, leases)
+    except requests.Timeout:
+        return name, [], f"no response within {timeout:g}s"
+    except (requests.RequestException, TimeoutError, ValueError, AttributeError) as e:
+        return name, [], str(e)
+    return name, scope_rows(p, name), None
+
+def collect(devices: List[Device], jobs: Optional[int] = None, timeout: float = 30.0,
+            now: Optional[datetime] = None) -> Iterator[Tuple[str, List[Dict], Optional[str]]]:
+    """Pull every device on a thread pool; results come back in input order."""
+    jobs = min(jobs or 32, max(1, len(devices)))
+    now = now or datetime.now()
+    session = make_session(max(jobs, len(devices)))
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            yield from pool.map(lambda d: collect_device(session, d, timeout, now), devices)
+    finally:
+        session.close()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+FortiOS CLI config reading shared by the networking scripts.
+
+  tokenize(line)      -> ["set", "member", "port1", "port2"] (quotes/escapes handled)
+  ConfigParser        push parser: feed() lines of a dump, get back each finished
+                      top-level "config ..." section as a Node tree
+  SectionIndex(path)  byte offsets of every top-level section in a file, built on
+                      first use, so load("system dhcp server") parses only that
+                      section of a 50 MB full-configuration
+  prompt_device(line) -> "FG100E-ZGBC" from "FG100E-ZGBC $ show ..." or an FMG
+                      "run on device" line like "fgt-600e-drt2 (global) show ..."
+  expand_paths / is_batch / chunk_size
+                      file arguments (files, directories, globs) of the batch modes
+
+"config vdom" / "edit <vdom>" and "config global" are treated as containers:
+the sections inside them count as top-level (Node.vdom says which VDOM).
+"""
+import os, re, glob
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+KEYWORDS = {"config", "edit", "set", "unset", "append", "next", "end"}
+CONTAINERS = {"vdom", "global"}
+
+RE_TOKEN   = re.compile(r'"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|(\S+)')
+RE_ESCAPE  = re.compile(r"\\(.)")
+# "FG100E-ZGBC $ show ...", "fw01 # get ...", "fgt-600e-drt2 (global) show ..." -> device name
+RE_PROMPT  = re.compile(r"([A-Za-z0-9._-]+)(?:\s+\([^)]*\))?"
+                        r"(?:\s*[$#](?:\s|$)|\s+(?:show|get|config|exec|execute|diagnose)\b)")
+
+def tokenize(line: str) -> List[str]:
+    """Split one CLI line into tokens, unquoting "..." / '...' and backslash escapes."""
+    if '"' not in line and "'" not in line and "\\" not in line:
+        return line.split()
+    out = []
+    for m in RE_TOKEN.finditer(line):
+        q = m.group(1) if m.group(1) is not None else m.group(2)
+        out.append(RE_ESCAPE.sub(r"\1", q) if q is not None else m.group(3))
+    return out
+
+class Node:
+    """A "config <path>" section or one "edit <name>" entry, with its set values and children."""
+    __slots__ = ("kind", "name", "settings", "children", "vdom")
+
+    def __init__(self, kind: str, name: str, vdom: Optional[str] = None):
+        self.kind = kind                            # "config" or "edit"
+        self.name = name                            # "system dhcp server", "1", "port1"
+        self.settings: Dict[str, List[str]] = {}    # set <key> <values...>
+        self.children: List["Node"] = []            # edits and nested configs, in order
+        self.vdom = vdom
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """First value of "set <key> ..."."""
+        v = self.settings.get(key)
+        return v[0] if v else default
+
+    def values(self, key: str) -> List[str]:
+        """All values of "set <key> ..." (e.g. set member "a" "b")."""
+        return self.settings.get(key, [])
+
+    def config(self, name: str) -> Optional["Node"]:
+        """Nested "config <name>" section, e.g. edit.config("ip-range")."""
+        for c in self.children:
+            if c.kind == "config" and c.name == name:
+                return c
+        return None
+
+    @property
+    def edits(self) -> List["Node"]:
+        return [c for c in self.children if c.kind == "edit"]
+
+    def __repr__(self) -> str:
+        return f"Node({self.kind} {self.name!r}, {len(self.settings)} set, {len(self.children)} children)"
+
+class ConfigParser:
+    """
+    Builds the config/edit/set tree from CLI lines pushed one at a time.
+
+    Only the sections named in `sections` (None: all) are tokenized and kept;
+    every other section is skipped by counting config/end, so memory stays at
+    one wanted section. Lines that are not config syntax (prompts, command
+    output) are ignored. Missing "next" before "edit"/"end" is tolerated.
+    """
+
+    def __init__(self, sections: Optional[Iterable[str]] = None):
+        self.sections = set(sections) if sections is not None else None
+        self._stack: List[Node] = []     # open nodes of the section being built
+        self._skip = 0                   # config depth inside a skipped section
+        self._ctx: List[str] = []        # open containers: "vdom", "edit", "global"
+        self._vdom: Optional[str] = None
+
+    @property
+    def in_section(self) -> bool:
+        """True while inside a config section (a container alone does not count)."""
+        return bool(self._stack or self._skip)
+
+    @property
+    def idle(self) -> bool:
+        """True outside every section and container (top level of the dump)."""
+        return not (self._stack or self._skip or self._ctx)
+
+    def feed(self, line: str) -> Optional[Node]:
+        """Take one line; returns the section it completes, if any."""
+        s = line.strip()
+        if not s:
+            return None
+        first = s.split(None, 1)[0]
+        if first not in KEYWORDS:
+            return None
+        if self._skip:
+            if first == "config":
+                self._skip += 1
+            elif first == "end":
+                self._skip -= 1
+            return None
+        if not self._stack:
+            return self._between(s, first)
+
+        stack = self._stack
+        tokens = tokenize(s)
+        top = stack[-1]
+        if first == "config":
+            node = Node("config", " ".join(tokens[1:]), self._vdom)
+            top.children.append(node)
+            stack.append(node)
+        elif first == "edit":
+            if top.kind == "edit":
+                stack.pop()
+                top = stack[-1]
+            node = Node("edit", tokens[1] if len(tokens) > 1 else "", self._vdom)
+            top.children.append(node)
+            stack.append(node)
+        elif first == "next":
+            if top.kind == "edit":
+                stack.pop()
+        elif first == "end":
+            if top.kind == "edit":
+                stack.pop()
+            node = stack.pop()
+            if not stack:
+                return node
+        elif len(tokens) > 1:
+            if first == "set":
+                top.settings[tokens[1]] = tokens[2:]
+            elif first == "append":
+                top.settings.setdefault(tokens[1], []).extend(tokens[2:])
+            else:   # unset
+                top.settings.pop(tokens[1], None)
+        return None
+
+    def _between(self, s: str, first: str) -> Optional[Node]:
+        # Outside any section: open one, or step through the vdom/global containers
+        ctx = self._ctx
+        if first == "config":
+            name = " ".join(tokenize(s)[1:])
+            if name in CONTAINERS and not ctx:
+                ctx.append(name)
+            elif self.sections is not None and name not in self.sections:
+                self._skip = 1
+            else:
+                self._stack.append(Node("config", name, self._vdom))
+        elif first == "edit" and ctx and ctx[-1] == "vdom":
+            tokens = tokenize(s)
+            ctx.append("edit")
+            self._vdom = tokens[1] if len(tokens) > 1 else None
+        elif first == "next" and ctx and ctx[-1] == "edit":
+            ctx.pop()
+            self._vdom = None
+        elif first == "end" and ctx:
+            if ctx[-1] == "edit":
+                ctx.pop()
+                self._vdom = None
+            ctx.pop()
+        return None
+
+    def close(self) -> Optional[Node]:
+        """End of input: the section left open by a truncated dump, if any."""
+        root = self._stack[0] if self._stack else None
+        self._stack = []
+        self._skip = 0
+        return root
+
+def parse_sections(lines: Iterable[str], sections: Optional[Iterable[str]] = None) -> List[Node]:
+    """Every top-level section (or just the named ones) in a stream of CLI lines."""
+    p = ConfigParser(sections)
+    out = []
+    for line in lines:
+        node = p.feed(line)
+        if node is not None:
+            out.append(node)
+    node = p.close()
+    if node is not None:
+        out.append(node)
+    return out
+
+# SectionIndex reads files in pieces of about this size, each ending at a newline
+BLOCK = 1 << 18
+
+def _blocks(f) -> Iterator[Tuple[int, bytes]]:
+    """(file offset, bytes) of a binary file in BLOCK-sized pieces cut after a newline."""
+    base, rest = 0, b""
+    while True:
+        data = f.read(BLOCK)
+        if not data:
+            if rest:
+                yield base, rest
+            return
+        data = rest + data
+        cut = data.rfind(b"\n") + 1
+        if cut:
+            yield base, data[:cut]
+            base += cut
+        rest = data[cut:]
+
+def _at_line_start(buf: bytes, pos: int) -> bool:
+    # only indentation between the previous newline and pos
+    return not buf[buf.rfind(b"\n", 0, pos) + 1:pos].strip()
+
+def _section_lines(buf: bytes, base: int = 0) -> Iterator[Tuple[int, int, Optional[str]]]:
+    """
+    (line start, line end, section name or None for "end") for every "config ..."
+    and "end" line of a block of whole lines starting at file offset `base`, in
+    order. Found with bytes.find rather than a regex: a line-anchored pattern is
+    tried at every line of the file and is ~20x slower.
+    """
+    size = len(buf)
+
+    def configs():
+        pos = buf.find(b"config ")
+        while pos >= 0:
+            eol = buf.find(b"\n", pos)
+            eol = size if eol < 0 else eol
+            if _at_line_start(buf, pos):
+                name = buf[pos + 7:eol].decode("utf-8", "replace").strip()
+                yield base + buf.rfind(b"\n", 0, pos) + 1, base + min(eol + 1, size), name
+            pos = buf.find(b"config ", eol)
+
+    def ends():
+        first_eol = buf.find(b"\n")
+        needle = b"end\r\n" if first_eol > 0 and buf[first_eol - 1:first_eol] == b"\r" else b"end\n"
+        pos = buf.find(needle)
+        while pos >= 0:
+            if _at_line_start(buf, pos):
+                yield base + buf.rfind(b"\n", 0, pos) + 1, base + pos + len(needle), None
+            pos = buf.find(needle, pos + len(needle))
+        # last line of the file without a newline
+        if buf[size - 3:] == b"end" and _at_line_start(buf, size - 3):
+            yield base + buf.rfind(b"\n", 0, size - 3) + 1, base + size, None
+
+    c, e = configs(), ends()
+    nc, ne = next(c, None), next(e, None)
+    while nc is not None or ne is not None:
+        if ne is None or (nc is not None and nc[0] < ne[0]):
+            yield nc
+            nc = next(c, None)
+        else:
+            yield ne
+            ne = next(e, None)
+
+class SectionIndex:
+    """
+    Lazy index of a config file: section name -> [(start, end)] byte ranges of
+    each top-level occurrence (one per VDOM in a multi-VDOM config). Built on
+    first lookup with one pass over the file, a block at a time, that looks
+    only at "config ..." and "end" lines. Sections are loaded without the stream
+    context, so their Node.vdom is None.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[Dict[str, List[Tuple[int, int]]]] = None
+
+    def _build(self) -> Dict[str, List[Tuple[int, int]]]:
+        index: Dict[str, List[Tuple[int, int]]] = {}
+        size = 0
+        # open configs: (name, start offset, recorded?)
+        stack: List[Tuple[str, int, bool]] = []
+        with open(self.path, "rb") as f:
+            for base, buf in _blocks(f):
+                size = base + len(buf)
+                for start, end, raw in _section_lines(buf, base):
+                    if raw is None:
+                        if stack:
+                            name, begin, recorded = stack.pop()
+                            if recorded:
+                                index.setdefault(name, []).append((begin, end))
+                        continue
+                    name = " ".join(tokenize(raw))
+                    top_level = not stack or (len(stack) == 1 and stack[0][0] in CONTAINERS)
+                    stack.append((name, start, top_level and name not in CONTAINERS))
+        # unterminated sections (truncated dump) run to the end of the file
+        for name, start, recorded in stack:
+            if recorded:
+                index.setdefault(name, []).append((start, size))
+        for ranges in index.values():
+            ranges.sort()
+        return index
+
+    @property
+    def index(self) -> Dict[str, List[Tuple[int, int]]]:
+        if self._index is None:
+            self._index = self._build()
+        return self._index
+
+    def names(self) -> List[str]:
+        return sorted(self.index)
+
+    def load(self, name: str) -> List[Node]:
+        """Parse only the byte ranges of the named section; [] if the file has none."""
+        out = []
+        with open(self.path, "rb") as f:
+            for start, end in self.index.get(name, ()):
+                out.extend(parse_sections(_lines(f, start, end), {name}))
+        return out
+
+def _lines(f, start: int, end: int) -> Iterator[str]:
+    # Decoded lines of bytes start .. end of a binary file, read one at a time
+    # so a long section is never held whole
+    f.seek(start)
+    left = end - start
+    for line in f:
+        yield line.decode("utf-8", "ignore")
+        left -= len(line)
+        if left <= 0:
+            break
+
+def prompt_device(line: str) -> Optional[str]:
+    """Device name from a CLI prompt line, or None if the line is not a prompt."""
+    m = RE_PROMPT.match(line.strip())
+    return m.group(1) if m else None
+
+def is_batch(args: List[str]) -> bool:
+    """Several paths, a directory or a glob: the per-device batch modes."""
+    return len(args) > 1 or any(os.path.isdir(a) or glob.has_magic(a) for a in args)
+
+def expand_paths(args: List[str]) -> List[str]:
+    """Files named directly, every file in a named directory, and glob matches."""
+    files = []
+    for a in args:
+        if os.path.isdir(a):
+            files.extend(sorted(os.path.join(a, n) for n in os.listdir(a) if os.path.isfile(os.path.join(a, n))))
+        elif glob.has_magic(a):
+            files.extend(sorted(f for f in glob.glob(a) if os.path.isfile(f)))
+        else:
+            files.append(a)
+    return files
+
+def chunk_size(files: int, jobs: int) -> int:
+    """pool.map chunksize: several files per task keeps IPC overhead low with hundreds of small dumps."""
+    return max(1, files // (jobs * 4))
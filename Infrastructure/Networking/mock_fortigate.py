@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Local mock of the FortiGate REST endpoints fgt_dhcp_collect.py reads, for
+trying the collector without real devices. Serves plain HTTP, one port per
+mock device, with the synthetic pools and leases of bench_dhcp_free_calc.py.
+
+  python mock_fortigate.py --devices 50 --scopes 20 --leases 5000 > devices.txt &
+  python fg_dhcp_free_calc.py --collect devices.txt
+
+--delay N makes every response wait N seconds (to exercise --timeout).
+"""
+import sys, json, time, random, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import urlsplit
+
+from bench_dhcp_free_calc import LEASE_TIME, VCIS, Scope, layout, _mac
+from fg_dhcp_free_calc import int_to_ip
+
+TOKEN = "mock-token"
+
+def device_payloads(index: int, scopes: int, leases: int) -> Dict[str, Dict]:
+    """path -> JSON body for one mock device, shaped like FortiOS 7.x responses."""
+    name = f"FG-MOCK-{index + 1:03d}"
+    sc: List[Scope] = layout(scopes, leases, multi=index % 2 == 1, seed=index)
+    rng = random.Random(index)
+    now = int(time.time())
+    servers, rows = [], []
+    for s in sc:
+        servers.append({
+            "id": s.server_id, "status": "enable", "lease-time": LEASE_TIME,
+            "default-gateway": int_to_ip(s.ranges[0][0] - 9), "interface": s.name,
+            "ip-range": [{"id": k, "start-ip": int_to_ip(a), "end-ip": int_to_ip(b)}
+                         for k, (a, b) in enumerate(s.ranges, 1)],
+            "reserved-address": [{"id": k, "ip": int_to_ip(ip), "mac": _mac(ip)}
+                                 for k, ip in enumerate(s.reserved, 1)],
+        })
+        for n, ip in enumerate(s.leased):
+            rows.append({
+                "ip": int_to_ip(ip), "reserved": False, "mac": _mac(ip), "vci": VCIS[n & 3],
+                "hostname": f"HOST-{n:07d}", "expire_time": now + rng.randint(-3600, LEASE_TIME),
+                "status": "leased", "interface": s.name, "type": "ipv4", "server_mkey": s.server_id,
+            })
+    common = {"http_method": "GET", "vdom": "root", "status": "success", "http_status": 200,
+              "serial": f"FGVMMOCK{index + 1:08d}", "version": "v7.2.8", "build": 1639}
+    return {
+        "/api/v2/monitor/system/status": dict(common, path="system", name="status",
+                                              results={"model_name": "FortiGate", "hostname": name}),
+        "/api/v2/cmdb/system.dhcp/server": dict(common, path="system.dhcp", name="server", results=servers),
+        "/api/v2/monitor/system/dhcp": dict(common, path="system", name="dhcp", results=rows),
+    }
+
+def make_handler(payloads: Dict[str, Dict], delay: float):
+    bodies = {path: json.dumps(body).encode() for path, body in payloads.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, so the collector's pooling is visible
+
+        def do_GET(self):
+            if delay:
+                time.sleep(delay)
+            if self.headers.get("Authorization") != f"Bearer {TOKEN}":
+                return self._send(401, b'{"http_status": 401, "status": "error"}')
+            body = bodies.get(urlsplit(self.path).path)
+            if body is None:
+                return self._send(404, b'{"http_status": 404, "status": "error"}')
+            self._send(200, body)
+
+        def _send(self, code: int, body: bytes):
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+def main(argv: List[str]):
+    devices, scopes, leases, port, delay = 1, 5, 500, 18443, 0.0
+    it = iter(argv)
+    for a in it:
+        flag, _, v = a.partition("=")
+        v = v or None
+        if flag == "--devices":
+            devices = int(v or next(it, "1"))
+        elif flag == "--scopes":
+            scopes = int(v or next(it, "5"))
+        elif flag == "--leases":
+            leases = int(v or next(it, "500"))
+        elif flag == "--port":
+            port = int(v or next(it, "18443"))
+        elif flag == "--delay":
+            delay = float(v or next(it, "0"))
+        else:
+            print(f"[error] unknown argument {a!r}", file=sys.stderr)
+            return 2
+
+    servers = []
+    for i in range(devices):
+        srv = ThreadingHTTPServer(("127.0.0.1", port + i), make_handler(device_payloads(i, scopes, leases), delay))
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        # the devices file for --collect
+        print(f"http://127.0.0.1:{port + i} {TOKEN}", flush=True)
+    print(f"[mock] {devices} device(s) on 127.0.0.1:{port}-{port + devices - 1}, Ctrl-C to stop", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        for srv in servers:
+            srv.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
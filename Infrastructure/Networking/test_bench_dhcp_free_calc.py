@@ -0,0 +1,59 @@
+"""Tests for bench_dhcp_free_calc helpers."""
+
+import pytest
+
+from bench_dhcp_free_calc import FORMATS, generate, layout, measure, write_fixture
+
+
+class TestLayout:
+    """Tests for layout function."""
+
+    def test_leases_and_reserved_inside_ranges(self):
+        """Test that every address handed out lies in its scope's ranges, once."""
+        for sc in layout(10, 1000, multi=True, seed=1):
+            pool = {ip for a, b in sc.ranges for ip in range(a, b + 1)}
+
+            assert len(sc.ranges) == 4
+            assert sum(b - a + 1 for a, b in sc.ranges) == sc.total
+            assert set(sc.leased) <= pool and set(sc.reserved) <= pool
+            assert len(set(sc.leased) | set(sc.reserved)) == len(sc.leased) + len(sc.reserved)
+
+    def test_scopes_do_not_overlap(self):
+        """Test that each scope gets its own block of 10/8."""
+        scopes = layout(50, 5000)
+        spans = sorted((sc.ranges[0][0], sc.ranges[-1][1]) for sc in scopes)
+
+        assert all(a[1] < b[0] for a, b in zip(spans, spans[1:]))
+        assert sum(len(sc.leased) for sc in scopes) == 5000
+
+    def test_too_many_leases(self):
+        """Test that a layout that does not fit in 10/8 raises ValueError."""
+        with pytest.raises(ValueError):
+            layout(1000, 20_000_000)
+
+
+class TestGenerate:
+    """Tests for generate and write_fixture."""
+
+    @pytest.mark.parametrize("fmt", FORMATS)
+    def test_same_seed_same_output(self, fmt):
+        """Test that output is reproducible for every format."""
+        first, expected = generate(fmt, 3, 100, seed=2)
+        second, _ = generate(fmt, 3, 100, seed=2)
+
+        assert list(first) == list(second)
+        assert sum(u for _, u in expected.values()) in (0, 100)
+
+    def test_rejects_unknown_format(self):
+        """Test that an unknown format raises ValueError."""
+        with pytest.raises(ValueError, match="unknown format"):
+            generate("xml", 1, 10)
+
+    def test_measure_checks_against_expected(self, tmp_path):
+        """Test that the parser's totals and used counts match the generator's."""
+        path = str(tmp_path / "full.txt")
+        expected = write_fixture(path, "full", 4, 200)
+
+        r = measure(path, repeat=1)
+        assert r["scopes"] == expected
+        assert r["bytes"] > 0 and r["seconds"] > 0
@@ -0,0 +1,131 @@
+"""Tests for dhcp_exporter module."""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from bench_dhcp_free_calc import write_fixture
+from dhcp_exporter import DumpCache, parse_tz, render
+
+
+@pytest.fixture
+def dumps(tmp_path):
+    """A directory of three synthetic per-device dumps."""
+    for n in range(3):
+        write_fixture(str(tmp_path / f"fw{n}.txt"), "full", 2, 50, seed=n)
+    return tmp_path
+
+
+def touch(path, ns):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + ns))
+
+
+class TestDumpCache:
+    """Tests for DumpCache change detection."""
+
+    def test_first_refresh_parses_everything(self, dumps):
+        """Test that every dump is parsed on the first refresh."""
+        cache = DumpCache([str(dumps)], jobs=1)
+
+        assert cache.refresh() == 3
+        assert len(cache.rows()) == 6
+        assert cache.parses == 3
+
+    def test_unchanged_files_are_not_reparsed(self, dumps):
+        """Test that a second refresh with nothing changed parses nothing."""
+        cache = DumpCache([str(dumps)], jobs=1)
+        cache.refresh()
+        text = cache.render()
+
+        assert cache.refresh() == 0
+        assert cache.parses == 3
+        assert cache._gauges in text
+
+    def test_changed_mtime_is_reparsed(self, dumps):
+        """Test that only the dump whose mtime moved is parsed again."""
+        cache = DumpCache([str(dumps)], jobs=1)
+        cache.refresh()
+        touch(dumps / "fw1.txt", 1_000_000)
+
+        assert cache.refresh() == 1
+        assert cache.parses == 4
+
+    def test_changed_content_updates_gauges(self, dumps):
+        """Test that a rewritten dump replaces its rows and gauge text."""
+        cache = DumpCache([str(dumps / "fw0.txt")], jobs=1)
+        cache.refresh()
+        before = cache.render()
+        write_fixture(str(dumps / "fw0.txt"), "full", 2, 80, seed=0)
+
+        assert cache.refresh() == 1
+        assert sum(r["used"] for r in cache.rows()) == 80
+        assert cache.render() != before
+
+    def test_removed_file_is_dropped(self, dumps):
+        """Test that a deleted dump's rows disappear from the gauges."""
+        cache = DumpCache([str(dumps)], jobs=1)
+        cache.refresh()
+        os.remove(dumps / "fw2.txt")
+
+        assert cache.refresh() == 0
+        assert len(cache.files) == 2
+        assert len(cache.rows()) == 4
+        assert "dhcp_exporter_files 2" in cache.render()
+
+    def test_new_file_is_picked_up(self, dumps):
+        """Test that a dump added to the directory is parsed on the next refresh."""
+        cache = DumpCache([str(dumps)], jobs=1)
+        cache.refresh()
+        write_fixture(str(dumps / "fw9.txt"), "full", 2, 50, seed=9)
+
+        assert cache.refresh() == 1
+        assert len(cache.files) == 4
+
+    def test_uses_time_zone(self, dumps):
+        """Test that expiries are rendered as wall-clock time in the cache's zone."""
+        stamps = []
+        for tz in ("UTC", "Asia/Tokyo"):
+            cache = DumpCache([str(dumps)], jobs=1, tz=parse_tz(tz))
+            cache.refresh()
+            stamps.append([float(l.split()[-1]) for l in cache.render().splitlines()
+                           if l.startswith("fortigate_dhcp_scope_soonest_expiry")])
+
+        assert stamps[0] and [t - 9 * 3600 for t in stamps[0]] == stamps[1]
+
+
+class TestRender:
+    """Tests for render function."""
+
+    def test_gauges_per_scope(self):
+        """Test label escaping and that missing values are left out."""
+        rows = [{"device": 'fw"1', "scope": "lan", "pct_free": 50.0, "used": 5, "total": 10,
+                 "available": 5, "free": None, "soonest_expiry": None}]
+        text = render(rows)
+
+        assert 'fortigate_dhcp_scope_used{device="fw\\"1",scope="lan"} 5' in text
+        assert "fortigate_dhcp_scope_true_free{" not in text
+        assert "# TYPE fortigate_dhcp_scope_total gauge" in text
+
+    @pytest.mark.parametrize("tz, stamp", [("UTC", 1758625200), ("Europe/Berlin", 1758618000),
+                                           ("America/New_York", 1758639600)])
+    def test_expiry_in_given_zone(self, tz, stamp):
+        """Test that a naive expiry is read as wall-clock time in the given zone."""
+        rows = [{"device": "fw", "scope": "lan", "pct_free": None, "used": 1, "total": 0,
+                 "available": 0, "free": None, "soonest_expiry": datetime(2025, 9, 23, 11)}]
+
+        text = render(rows, parse_tz(tz))
+        assert f'soonest_expiry_timestamp_seconds{{device="fw",scope="lan"}} {stamp}.0' in text
+
+    def test_aware_expiry_keeps_its_zone(self):
+        """Test that an expiry that already has a zone is not shifted."""
+        rows = [{"device": "fw", "scope": "lan", "pct_free": None, "used": 1, "total": 0, "available": 0,
+                 "free": None, "soonest_expiry": datetime(2025, 9, 23, 11, tzinfo=timezone.utc)}]
+
+        assert "} 1758625200.0" in render(rows, parse_tz("Asia/Tokyo"))
+
+    def test_unknown_zone(self):
+        """Test that an unknown zone name raises ValueError."""
+        with pytest.raises(ValueError, match="unknown time zone"):
+            parse_tz("Mars/Olympus")
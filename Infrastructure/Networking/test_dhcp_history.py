@@ -0,0 +1,135 @@
+"""Tests for dhcp_history module."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from dhcp_history import DhcpHistory
+from fg_dhcp_free_calc import DhcpParser, apply_history, scope_rows
+
+T0 = datetime(2025, 9, 1, 12, 0, 0)
+
+
+@pytest.fixture
+def history(tmp_path):
+    """An empty history store in a temp file."""
+    h = DhcpHistory(str(tmp_path / "history.db"))
+    yield h
+    h.close()
+
+
+def record_days(history, used_per_day, total=200, scope="lan"):
+    for day, used in enumerate(used_per_day):
+        history.record("FW01", scope, T0 + timedelta(days=day), used, total)
+
+
+class TestRecord:
+    """Tests for DhcpHistory.record and record_rows."""
+
+    def test_duplicate_sample_is_ignored(self, history):
+        """Test that the same (device, scope, ts) is stored once."""
+        assert history.record("FW01", "lan", T0, 10, 100)
+        assert not history.record("FW01", "lan", T0, 11, 100)
+
+    def test_record_rows_skips_scopes_without_total(self, history):
+        """Test that rows with no pool size are not recorded."""
+        rows = [{"device": "FW01", "scope": "lan", "used": 5, "total": 50},
+                {"device": "FW01", "scope": "voice", "used": 3, "total": 0}]
+
+        assert history.record_rows(rows, T0) == 1
+        assert [f.scope for f in history.forecasts()] == ["lan"]
+
+    def test_history_persists(self, tmp_path):
+        """Test that the trend survives closing and reopening the file."""
+        path = str(tmp_path / "history.db")
+        with DhcpHistory(path) as h:
+            record_days(h, [10, 20])
+        with DhcpHistory(path) as h:
+            h.record("FW01", "lan", T0 + timedelta(days=2), 30, 200)
+            fc = h.forecast("FW01", "lan")
+
+        assert fc.used == 30
+        assert fc.per_day == pytest.approx(10.0)
+
+
+class TestForecast:
+    """Tests for DhcpHistory forecasts."""
+
+    def test_single_sample_has_no_trend(self, history):
+        """Test that one sample gives no slope and no exhaustion date."""
+        record_days(history, [10])
+        fc = history.forecast("FW01", "lan")
+
+        assert (fc.used, fc.total, fc.per_day, fc.exhaustion) == (10, 200, None, None)
+
+    def test_unknown_scope(self, history):
+        """Test that a scope never recorded has no forecast."""
+        assert history.forecast("FW01", "nope") is None
+
+    def test_linear_growth(self, history):
+        """Test slope and exhaustion date for steady growth of 10 a day."""
+        record_days(history, [100, 110, 120, 130, 140])
+        fc = history.forecast("FW01", "lan")
+
+        assert fc.per_day == pytest.approx(10.0)
+        assert abs(fc.exhaustion - (T0 + timedelta(days=10))) < timedelta(minutes=1)
+
+    def test_flat_usage(self, history):
+        """Test that a flat scope has zero trend and no exhaustion."""
+        record_days(history, [50, 50, 50])
+        fc = history.forecast("FW01", "lan")
+
+        assert (fc.per_day, fc.exhaustion) == (0.0, None)
+
+    def test_near_zero_slope_is_flat(self, history):
+        """Test that noise around zero is reported as 0, not -0.0."""
+        record_days(history, [50] * 30 + [49])
+        fc = history.forecast("FW01", "lan")
+
+        assert fc.per_day == 0.0
+        assert f"{fc.per_day:+.1f}" == "+0.0"
+
+    def test_shrinking_usage(self, history):
+        """Test that a falling scope has a negative trend and no exhaustion."""
+        record_days(history, [150, 140, 130])
+        fc = history.forecast("FW01", "lan")
+
+        assert fc.per_day == pytest.approx(-10.0)
+        assert fc.exhaustion is None
+
+    def test_backfilled_sample(self, history):
+        """Test that a late sample does not replace the latest reading."""
+        history.record("FW01", "lan", T0, 100, 200)
+        history.record("FW01", "lan", T0 + timedelta(days=2), 120, 200)
+        history.record("FW01", "lan", T0 + timedelta(days=1), 110, 200)
+        fc = history.forecast("FW01", "lan")
+
+        assert fc.used == 120
+        assert fc.per_day == pytest.approx(10.0)
+
+
+class TestApplyHistory:
+    """Tests for fg_dhcp_free_calc.apply_history."""
+
+    def test_records_reported_used_figure(self, history):
+        """Test that history stores the Used column, not total minus bitmap free."""
+        p = DhcpParser(now=T0)
+        p.add_server("lan", [("10.0.0.1", "10.0.0.100")], ["10.0.0.90", "10.0.0.91"])
+        for n in range(1, 11):
+            p.add_lease("lan", f"10.0.0.{n}")
+        p.finish()
+        rows = scope_rows(p, "FW01")
+
+        apply_history(history, rows, T0)
+        assert rows[0]["used"] == 10
+        assert history.forecast("FW01", "lan").used == 10
+
+    def test_fills_trend_columns(self, history):
+        """Test that trend_per_day and exhaustion_date are set from the forecast."""
+        record_days(history, [80, 85])
+        rows = [{"device": "FW01", "scope": "lan", "used": 90, "total": 200,
+                 "trend_per_day": None, "exhaustion_date": None}]
+
+        apply_history(history, rows, T0 + timedelta(days=2))
+        assert rows[0]["trend_per_day"] == pytest.approx(5.0)
+        assert rows[0]["exhaustion_date"] is not None
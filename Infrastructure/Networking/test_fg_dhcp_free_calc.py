@@ -0,0 +1,246 @@
+"""Tests for fg_dhcp_free_calc module."""
+
+import io
+import os
+import random
+from datetime import datetime
+
+import pytest
+
+from bench_dhcp_free_calc import DEVICE, FORMATS, NOW, layout, write_fixture
+from fg_dhcp_free_calc import (MAX_BITMAP_ADDRESSES, DhcpParser, PoolBitmap, dt_to_seconds, expiry_seconds,
+                               ip_to_int, longest_run, main, parse_dt, parse_file, run_batch, scope_rows,
+                               seconds_to_dt, write_results)
+
+SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fmg_task_output.txt")
+
+
+@pytest.fixture
+def fixture_file(tmp_path):
+    """Write a synthetic dump; returns (path, expected scope -> (total, used))."""
+    def make(fmt, scopes=5, leases=300, seed=0):
+        path = str(tmp_path / f"{fmt}.txt")
+        return path, write_fixture(path, fmt, scopes, leases, seed)
+    return make
+
+
+def parse(path, now=NOW):
+    with open(path) as f:
+        return DhcpParser(now=now).parse(f)
+
+
+def ip_range(a, b):
+    return ip_to_int(a), ip_to_int(b)
+
+
+class TestDhcpParser:
+    """Tests for DhcpParser class."""
+
+    @pytest.mark.parametrize("fmt", FORMATS)
+    def test_generated_formats(self, fixture_file, fmt):
+        """Test that every synthetic format gives the generator's totals and used counts."""
+        path, expected = fixture_file(fmt)
+
+        p = parse(path)
+        assert {k: v for k, v in p.pools.items() if v} == {k: t for k, (t, _) in expected.items() if t}
+        assert {k: v for k, v in p.used.items() if v} == {k: u for k, (_, u) in expected.items() if u}
+        assert p.device == DEVICE
+
+    @pytest.mark.parametrize("fmt", ("config-multi", "full"))
+    def test_parse_file_matches_parse(self, fixture_file, fmt):
+        """Test that the batch worker gives the rows of a plain parse, keyed by the prompt's device."""
+        path, _ = fixture_file(fmt)
+
+        assert parse_file(path, NOW) == (path, scope_rows(parse(path), DEVICE), None)
+
+    def test_known_sample(self):
+        """Test the report for the FMG task output shipped with the script."""
+        p = parse(SAMPLE, datetime(2025, 9, 23, 11))
+        rows = {r["scope"]: r for r in scope_rows(p, p.device)}
+
+        assert p.device == "FG100E-ZGBC"
+        assert [(r["used"], r["total"], r["available"]) for r in rows.values()] == [(75, 155, 80), (48, 190, 142)]
+        assert (rows["lan"]["free"], rows["lan"]["reserved"]) == (53, 27)
+        assert (rows["lan"]["largest_free_block"], rows["lan"]["largest_free_start"]) == (24, "192.168.1.231")
+        assert rows["voice"]["free"] == 142
+        assert p.expiring == {"lan": [51, 23, 24, 24], "voice": [44, 4, 4, 4]}
+
+    def test_fmg_run_on_device_prompt(self, tmp_path):
+        """Test that the device name comes from an FMG "(global) show" line."""
+        with open(SAMPLE) as f:
+            text = f.read().replace("FG100E-ZGBC $ ", "fgt-600e-drt2 (global) ", 1)
+        path = tmp_path / "task.txt"
+        path.write_text(text)
+
+        _, rows, err = parse_file(str(path))
+        assert err is None
+        assert {r["device"] for r in rows} == {"fgt-600e-drt2"}
+
+    def test_pasted_server_entries(self, fixture_file, tmp_path):
+        """Test server entries pasted without their "config system dhcp server" line."""
+        path, expected = fixture_file("config-multi")
+        with open(path) as f:
+            lines = f.read().splitlines()
+        orphan = tmp_path / "orphan.txt"
+        orphan.write_text("\n".join(l for l in lines if l != "config system dhcp server") + "\n")
+
+        assert parse(str(orphan)).pools == {k: t for k, (t, _) in expected.items()}
+
+    def test_statistics_win_over_config(self):
+        """Test that statistics totals replace config pool sizes."""
+        p = DhcpParser(now=NOW)
+        p.add_server("lan", [("10.0.0.1", "10.0.0.100")])
+        for line in ('DHCP server: "lan"', "  Total addresses: 50", "  Leases in use: 7"):
+            p.feed(line)
+        p.finish()
+
+        assert (p.pools, p.used) == ({"lan": 50}, {"lan": 7})
+
+    def test_expiry_horizons(self):
+        """Test that leases are counted as expired or within 1h/8h/24h of now."""
+        p = DhcpParser(now=datetime(2025, 9, 23, 11))
+        base = dt_to_seconds(p.now)
+        for ip, left in (("10.0.0.1", -5), ("10.0.0.2", 1800), ("10.0.0.3", 7200), ("10.0.0.4", 90000)):
+            p.add_lease("lan", ip, base + left)
+
+        assert p.expiring["lan"] == [1, 1, 2, 2]
+        assert p.exp_min["lan"] == datetime(2025, 9, 23, 10, 59, 55)
+
+
+class TestPoolBitmap:
+    """Tests for PoolBitmap class."""
+
+    def test_generated_scopes(self):
+        """Test that free = size - leased - reserved for every synthetic scope."""
+        for sc in layout(20, 2000, multi=True, seed=3):
+            bm = PoolBitmap(sc.ranges)
+            for ip in sc.reserved:
+                bm.reserve(ip)
+            for ip in sc.leased:
+                bm.lease(ip)
+            occ = bm.occupancy()
+
+            assert occ.size == sc.total
+            assert (occ.leased, occ.reserved) == (len(sc.leased), len(sc.reserved))
+            assert occ.free == sc.total - len(sc.leased) - len(sc.reserved)
+
+    def test_far_apart_ranges(self):
+        """Test that ranges on unrelated networks do not allocate the gap between them."""
+        bm = PoolBitmap([ip_range("192.168.1.10", "192.168.1.200"), ip_range("10.20.1.10", "10.20.1.200")])
+        bm.lease(ip_to_int("10.20.1.50"))
+        bm.lease(ip_to_int("192.168.1.100"))
+        occ = bm.occupancy()
+
+        assert sum(len(b) for b in bm.leased) < 64
+        assert (occ.size, occ.leased, occ.free) == (382, 2, 380)
+        assert (occ.largest_free, occ.largest_free_start) == (150, "10.20.1.51")
+
+    def test_free_run_crosses_adjacent_ranges(self):
+        """Test that a run continues from one range into the next when they touch."""
+        bm = PoolBitmap([ip_range("10.0.0.101", "10.0.0.200"), ip_range("10.0.0.1", "10.0.0.100")])
+        occ = bm.occupancy()
+
+        assert (occ.largest_free, occ.largest_free_start) == (200, "10.0.0.1")
+
+    def test_out_of_range_and_duplicates(self):
+        """Test that stray and repeated lease rows are counted, not marked."""
+        bm = PoolBitmap([ip_range("10.0.0.1", "10.0.0.10")])
+        for ip in ("10.0.0.1", "10.0.0.1", "10.0.0.11", "9.255.255.255"):
+            bm.lease(ip_to_int(ip))
+        bm.reserve(ip_to_int("10.0.0.1"))
+        bm.reserve(ip_to_int("10.0.0.2"))
+        occ = bm.occupancy()
+
+        assert (occ.leased, occ.reserved, occ.free) == (1, 1, 8)
+        assert (occ.out_of_range, occ.duplicates) == (2, 1)
+        assert (occ.largest_free, occ.largest_free_start) == (8, "10.0.0.3")
+
+    def test_oversized_scope_is_skipped(self, capsys):
+        """Test that a scope beyond MAX_BITMAP_ADDRESSES gets no exact figures."""
+        with pytest.raises(ValueError):
+            PoolBitmap([(0, MAX_BITMAP_ADDRESSES)])
+
+        p = DhcpParser(now=NOW)
+        p.add_server("huge", [("0.0.0.0", "255.255.255.255")])
+        p.add_server("lan", [("10.0.0.1", "10.0.0.9")])
+        p.finish()
+        assert list(p.occupancy()) == ["lan"]
+        assert "scope huge" in capsys.readouterr().err
+
+
+class TestLongestRun:
+    """Tests for longest_run function."""
+
+    @pytest.mark.parametrize("x, expected", [
+        (0, (0, 0)),
+        (0b1, (1, 0)),
+        (0b1110111, (3, 0)),
+        (0b1111011, (4, 3)),
+        ((1 << 1000) - 1, (1000, 0)),
+        (((1 << 64) - 1) << 100, (64, 100)),
+    ])
+    def test_known_values(self, x, expected):
+        """Test length and lowest start of the longest run of 1 bits."""
+        assert longest_run(x) == expected
+
+    def test_matches_bit_string_scan(self):
+        """Test against a scan of the bit string on random values."""
+        rng = random.Random(0)
+        for _ in range(2000):
+            n = rng.randint(1, 200)
+            x = rng.getrandbits(n) | rng.getrandbits(n)
+            bits = format(x, "b")[::-1] if x else ""
+            runs = [(len(r), bits.index("1" * len(r))) for r in bits.split("0") if r]
+            best = max(r[0] for r in runs) if runs else 0
+            start = bits.index("1" * best) if best else 0
+
+            assert longest_run(x) == (best, start)
+
+
+class TestExpirySeconds:
+    """Tests for expiry_seconds function."""
+
+    def test_matches_strptime(self):
+        """Test that the decoded time equals the strptime result."""
+        row = "10.0.0.5  00:11:22:33:44:55  host  MSFT 5.0  1  Mon Sep 29 11:05:03 2025"
+
+        assert expiry_seconds(row) == dt_to_seconds(parse_dt("Mon Sep 29 11:05:03 2025"))
+        assert seconds_to_dt(expiry_seconds(row)) == datetime(2025, 9, 29, 11, 5, 3)
+
+    @pytest.mark.parametrize("row", [
+        "10.0.0.5 00:11:22:33:44:55 host",
+        "10.0.0.5 mac host 1 Xyz Sep 29 11:05:03 2025",
+        "10.0.0.5 mac host 1 Mon Foo 29 11:05:03 2025",
+        "10.0.0.5 mac host 1 Mon Sep 29 11-05-03 2025",
+        "10.0.0.5 mac host 1 Mon Sep 31 11:05:03 2025",
+        "10.0.0.5 mac host 1 Mon Sep xx 11:05:03 2025",
+    ])
+    def test_invalid_rows(self, row):
+        """Test that rows without a valid expiry give None."""
+        assert expiry_seconds(row) is None
+
+
+class TestBatch:
+    """Tests for run_batch and the batch command line."""
+
+    @pytest.mark.parametrize("ndjson", (False, True))
+    def test_jobs_match_serial(self, tmp_path, ndjson):
+        """Test that --jobs 2 writes the same report as a serial run over several dumps."""
+        files = []
+        for n, fmt in enumerate(("full", "config-multi", "full", "leases", "full")):
+            path = str(tmp_path / f"dev{n}.txt")
+            write_fixture(path, fmt, 3, 200, seed=n)
+            files.append(path)
+        serial = io.StringIO()
+        write_results((parse_file(f, NOW) for f in files), ndjson, serial)
+
+        for jobs in (1, 2):
+            out = io.StringIO()
+            assert run_batch(files, ndjson, jobs, out, now=NOW) == 0
+            assert out.getvalue() == serial.getvalue()
+
+    @pytest.mark.parametrize("value", ("0", "-1", "two"))
+    def test_rejects_bad_jobs(self, tmp_path, capsys, value):
+        """Test that --jobs below 1 is an [error] with rc 2, not a pool traceback."""
+        assert main(["--jobs", value, str(tmp_path)]) == 2
+        assert "[error] --jobs must be at least 1" in capsys.readouterr().err
@@ -0,0 +1,139 @@
+"""Tests for fgt_dhcp_collect module, against mock_fortigate servers."""
+
+import socket
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from bench_dhcp_free_calc import layout
+from fg_dhcp_free_calc import DhcpParser, main, scope_rows
+from fgt_dhcp_collect import CONFIG_PATH, LEASES_PATH, Device, collect, feed_rest, read_devices
+from mock_fortigate import TOKEN, device_payloads, make_handler
+
+SCOPES, LEASES = 4, 300
+
+
+@pytest.fixture
+def mock_device():
+    """Start a mock FortiGate on an ephemeral port; returns its URL."""
+    servers = []
+
+    def start(payloads, delay=0.0):
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(payloads, delay))
+        srv.daemon_threads = True
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        servers.append(srv)
+        return f"http://127.0.0.1:{srv.server_address[1]}"
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+@pytest.fixture
+def closed_port():
+    """A local port nothing listens on."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def expected_rows(payloads, now):
+    """The rows a DhcpParser gives for the same server and lease data."""
+    name = payloads["/api/v2/monitor/system/status"]["results"]["hostname"]
+    p = DhcpParser(now=now)
+    feed_rest(p, payloads[CONFIG_PATH]["results"], payloads[LEASES_PATH]["results"])
+    return name, scope_rows(p, name)
+
+
+def write_devices(tmp_path, lines):
+    path = tmp_path / "devices.txt"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+class TestReadDevices:
+    """Tests for read_devices function."""
+
+    def test_parses_lines(self, tmp_path, monkeypatch):
+        """Test URL defaulting, the "-" token, vdoms and comments."""
+        monkeypatch.setenv("FGT_API_TOKEN", "env-token")
+        path = write_devices(tmp_path, ["# firewalls", "fw1.example:8443 abc root", "", "http://fw2/ -  # lab"])
+
+        assert read_devices(path) == [Device("https://fw1.example:8443", "abc", "root"),
+                                      Device("http://fw2", "env-token", None)]
+
+    def test_missing_token(self, tmp_path, monkeypatch):
+        """Test that a device with no token and no FGT_API_TOKEN raises ValueError."""
+        monkeypatch.delenv("FGT_API_TOKEN", raising=False)
+        path = write_devices(tmp_path, ["fw1 -"])
+
+        with pytest.raises(ValueError, match="no API token"):
+            read_devices(path)
+
+
+class TestCollect:
+    """Tests for collect function."""
+
+    def test_rows_match_parser(self, mock_device):
+        """Test that every device's rows equal the parser's for the same data, in input order."""
+        now = datetime.now().replace(microsecond=0)
+        payloads = [device_payloads(i, SCOPES, LEASES) for i in range(3)]
+        devices = [Device(mock_device(p), TOKEN) for p in payloads]
+
+        results = list(collect(devices, jobs=2, timeout=10, now=now))
+        assert [(name, rows) for name, rows, _ in results] == [expected_rows(p, now) for p in payloads]
+        assert [err for _, _, err in results] == [None] * 3
+
+    def test_used_and_total_match_layout(self, mock_device):
+        """Test pool sizes and used counts against the generated scopes."""
+        url = mock_device(device_payloads(1, SCOPES, LEASES))
+
+        (name, rows, err), = collect([Device(url, TOKEN)])
+        assert (name, err) == ("FG-MOCK-002", None)
+        assert {r["scope"]: (r["total"], r["used"]) for r in rows} == \
+            {s.name: (s.total, len(s.leased)) for s in layout(SCOPES, LEASES, multi=True, seed=1)}
+
+
+class TestCollectErrors:
+    """Tests for failing devices in fg_dhcp_free_calc --collect."""
+
+    def run(self, tmp_path, capsys, bad_line, timeout="5"):
+        """Collect from one good mock device and one bad one; returns (rc, stderr)."""
+        rc = main(["--collect", write_devices(tmp_path, [self.good, bad_line]), "--timeout", timeout])
+        return rc, capsys.readouterr().err
+
+    @pytest.fixture(autouse=True)
+    def good_device(self, mock_device):
+        """A working mock device listed before the failing one."""
+        self.good = f"{mock_device(device_payloads(0, SCOPES, LEASES))} {TOKEN}"
+
+    def assert_one_error(self, rc, err):
+        # only the bad device fails; the good one is still collected
+        assert rc == 1
+        assert len(err.splitlines()) == 1 and err.startswith("[error] ")
+
+    def test_connection_refused(self, tmp_path, capsys, closed_port):
+        """Test that a device that refuses the connection is an [error] and rc 1."""
+        rc, err = self.run(tmp_path, capsys, f"http://127.0.0.1:{closed_port} {TOKEN}")
+
+        self.assert_one_error(rc, err)
+        assert f"127.0.0.1:{closed_port}" in err
+
+    def test_bad_token(self, tmp_path, capsys, mock_device):
+        """Test that a 401 from the API is an [error] and rc 1."""
+        url = mock_device(device_payloads(1, SCOPES, LEASES))
+        rc, err = self.run(tmp_path, capsys, f"{url} wrong-token")
+
+        self.assert_one_error(rc, err)
+        assert "401" in err
+
+    def test_timeout(self, tmp_path, capsys, mock_device):
+        """Test that a device slower than --timeout is an [error] and rc 1."""
+        url = mock_device(device_payloads(1, SCOPES, LEASES), delay=2.0)
+        rc, err = self.run(tmp_path, capsys, f"{url} {TOKEN}", timeout="0.5")
+
+        self.assert_one_error(rc, err)
+        assert "no response within 0.5s" in err
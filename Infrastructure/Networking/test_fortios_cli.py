@@ -0,0 +1,252 @@
+"""Tests for fortios_cli module."""
+
+import pytest
+
+import fortios_cli
+from fortios_cli import (ConfigParser, SectionIndex, chunk_size, expand_paths, is_batch, parse_sections,
+                         prompt_device, tokenize)
+
+DHCP = """\
+config system dhcp server
+    edit 1
+        set interface "lan"
+        config ip-range
+            edit 1
+                set start-ip 10.0.0.10
+                set end-ip 10.0.0.99
+            next
+        end
+    next
+end
+"""
+
+MULTI_VDOM = """\
+FW01 # show
+config vdom
+edit root
+config system dhcp server
+    edit 1
+        set interface "lan"
+    next
+end
+next
+edit guest
+config system interface
+    edit "port1"
+        set vdom "guest"
+    next
+end
+config system dhcp server
+    edit 1
+        set interface "wifi"
+    next
+end
+next
+end
+config global
+config system global
+    set hostname "FW01"
+end
+end
+"""
+
+
+class TestTokenize:
+    """Tests for tokenize function."""
+
+    def test_plain_line_splits_on_whitespace(self):
+        """Test that a line without quotes is split like str.split."""
+        assert tokenize("  set member port1   port2 ") == ["set", "member", "port1", "port2"]
+
+    def test_quotes_are_removed(self):
+        """Test that double- and single-quoted values keep their spaces."""
+        assert tokenize('set comments "two words" \'and more\'') == ["set", "comments", "two words", "and more"]
+
+    def test_escapes_inside_quotes(self):
+        """Test that backslash escapes in quoted values are undone."""
+        assert tokenize(r'set comments "say \"hi\" \\ bye"') == ["set", "comments", 'say "hi" \\ bye']
+
+    def test_empty_quoted_value(self):
+        """Test that "" is kept as an empty token."""
+        assert tokenize('set comments ""') == ["set", "comments", ""]
+
+
+class TestConfigParser:
+    """Tests for ConfigParser class."""
+
+    def test_nested_sections(self):
+        """Test that edits and nested configs build a tree."""
+        (root,) = parse_sections(DHCP.splitlines())
+
+        assert root.name == "system dhcp server"
+        (server,) = root.edits
+        assert server.get("interface") == "lan"
+        (rng,) = server.config("ip-range").edits
+        assert rng.values("start-ip") == ["10.0.0.10"]
+        assert rng.get("end-ip") == "10.0.0.99"
+
+    def test_missing_next_is_tolerated(self):
+        """Test that an edit ends at the following edit or end without next."""
+        lines = ["config firewall address", "edit a", "set subnet 1", "edit b", "set subnet 2", "end"]
+        (root,) = parse_sections(lines)
+
+        assert [(e.name, e.get("subnet")) for e in root.edits] == [("a", "1"), ("b", "2")]
+
+    def test_unwanted_sections_are_skipped(self):
+        """Test that only the named sections are returned, nested configs included."""
+        lines = ["config system interface", "edit port1", "config ipv6", "end", "next", "end"] + DHCP.splitlines()
+
+        assert [n.name for n in parse_sections(lines, {"system dhcp server"})] == ["system dhcp server"]
+
+    def test_command_output_is_ignored(self):
+        """Test that prompts and other lines do not disturb the parse."""
+        lines = ["FW01 # show system dhcp server"] + DHCP.splitlines() + ["FW01 # exec dhcp lease-list"]
+
+        assert len(parse_sections(lines)) == 1
+
+    def test_vdom_and_global_containers(self):
+        """Test that sections inside config vdom / config global count as top-level."""
+        sections = parse_sections(MULTI_VDOM.splitlines())
+
+        assert [(n.name, n.vdom) for n in sections] == [
+            ("system dhcp server", "root"), ("system interface", "guest"),
+            ("system dhcp server", "guest"), ("system global", None)]
+
+    def test_idle_and_in_section(self):
+        """Test the state properties while stepping through a container."""
+        p = ConfigParser()
+        assert p.idle
+        p.feed("config vdom")
+        p.feed("edit root")
+        assert not p.idle and not p.in_section
+        p.feed("config system dhcp server")
+        assert p.in_section
+        assert p.feed("end") is not None
+        p.feed("next")
+        p.feed("end")
+        assert p.idle
+
+    def test_close_returns_truncated_section(self):
+        """Test that close() hands back a section the dump cut off."""
+        p = ConfigParser()
+        for line in DHCP.splitlines()[:3]:
+            p.feed(line)
+
+        root = p.close()
+        assert root.edits[0].get("interface") == "lan"
+        assert p.close() is None
+
+
+class TestSectionIndex:
+    """Tests for SectionIndex class."""
+
+    def test_offsets_cover_sections(self, tmp_path):
+        """Test that each recorded range is exactly one top-level section."""
+        path = tmp_path / "dump.txt"
+        path.write_text("FW01 # show\n" + DHCP + "FW01 # exec dhcp lease-list\n")
+        data = path.read_bytes()
+
+        (start, end), = SectionIndex(str(path)).index["system dhcp server"]
+        assert data[start:end] == DHCP.encode()
+
+    def test_crlf_offsets(self, tmp_path):
+        """Test that ranges include the CRLF of the closing end line."""
+        path = tmp_path / "dump.txt"
+        path.write_bytes(("FW01 # show\n" + DHCP).replace("\n", "\r\n").encode())
+        data = path.read_bytes()
+
+        index = SectionIndex(str(path))
+        (start, end), = index.index["system dhcp server"]
+        assert data[start:end] == DHCP.replace("\n", "\r\n").encode()
+        assert end == len(data)
+        assert index.load("system dhcp server")[0].edits[0].get("interface") == "lan"
+
+    def test_truncated_dump_runs_to_end_of_file(self, tmp_path):
+        """Test that an unterminated section is indexed to EOF and still loads."""
+        path = tmp_path / "dump.txt"
+        text = "".join(DHCP.splitlines(True)[:4])
+        path.write_text(text)
+
+        index = SectionIndex(str(path))
+        assert index.index == {"system dhcp server": [(0, len(text))]}
+        (root,) = index.load("system dhcp server")
+        assert root.edits[0].get("interface") == "lan"
+
+    def test_multi_vdom(self, tmp_path):
+        """Test that a section inside each VDOM is indexed, containers are not."""
+        path = tmp_path / "full.conf"
+        path.write_text(MULTI_VDOM)
+
+        index = SectionIndex(str(path))
+        assert index.names() == ["system dhcp server", "system global", "system interface"]
+        interfaces = [n.edits[0].get("interface") for n in index.load("system dhcp server")]
+        assert interfaces == ["lan", "wifi"]
+
+    def test_block_boundaries(self, tmp_path, monkeypatch):
+        """Test that the index does not depend on where file blocks are cut."""
+        path = tmp_path / "full.conf"
+        path.write_text(MULTI_VDOM + DHCP)
+        expected = SectionIndex(str(path)).index
+
+        monkeypatch.setattr(fortios_cli, "BLOCK", 7)
+        assert SectionIndex(str(path)).index == expected
+
+    def test_empty_file(self, tmp_path):
+        """Test that an empty file has no sections."""
+        path = tmp_path / "empty.txt"
+        path.write_text("")
+
+        index = SectionIndex(str(path))
+        assert index.index == {}
+        assert index.load("system dhcp server") == []
+
+
+class TestPromptDevice:
+    """Tests for prompt_device function."""
+
+    @pytest.mark.parametrize("line, device", [
+        ("FG100E-ZGBC $ show system dhcp server", "FG100E-ZGBC"),
+        ("fw01 # get system interface physical", "fw01"),
+        ("fw01 #", "fw01"),
+        ("fgt-600e-drt2 (global) show system switch-interface", "fgt-600e-drt2"),
+        ("fgt-600e-drt2 show system switch-interface", "fgt-600e-drt2"),
+    ])
+    def test_prompts(self, line, device):
+        """Test CLI and FMG "run on device" prompt lines."""
+        assert prompt_device(line) == device
+
+    @pytest.mark.parametrize("line", [
+        "Starting log (Run on device)",
+        "config system dhcp server",
+        "10.0.0.10  00:11:22:33:44:55  host  Mon Sep 29 11:05:03 2025",
+        "lan",
+    ])
+    def test_other_lines(self, line):
+        """Test that config and command output lines are not prompts."""
+        assert prompt_device(line) is None
+
+
+class TestBatchInputs:
+    """Tests for expand_paths, is_batch and chunk_size."""
+
+    def test_expand_paths(self, tmp_path):
+        """Test that directories and globs expand to sorted files."""
+        (tmp_path / "b.txt").write_text("")
+        (tmp_path / "a.txt").write_text("")
+        (tmp_path / "sub").mkdir()
+
+        assert expand_paths([str(tmp_path)]) == [str(tmp_path / "a.txt"), str(tmp_path / "b.txt")]
+        assert expand_paths([str(tmp_path / "a*")]) == [str(tmp_path / "a.txt")]
+        assert expand_paths(["missing.txt"]) == ["missing.txt"]
+
+    def test_is_batch(self, tmp_path):
+        """Test that one plain file is not a batch."""
+        assert not is_batch(["one.txt"])
+        assert is_batch(["one.txt", "two.txt"])
+        assert is_batch([str(tmp_path)])
+        assert is_batch(["dumps/*.txt"])
+
+    def test_chunk_size(self):
+        """Test that chunks are a quarter of a file share per worker, at least 1."""
+        assert chunk_size(400, 4) == 25
+        assert chunk_size(3, 8) == 1
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""Benchmark the disk walker strategies on reproducible synthetic trees."""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from disk_scan import TopNTracker, scan_tree
+from size_index import SizeIndex
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+SHAPES = ["wide", "deep", "skewed", "small", "hardlinks", "unreadable"]
+STRATEGIES = ["legacy", "single", "parallel", "stream", "disk-usage", "incremental"]
+
+
+# ---------------- tree generator ----------------
+def _write_file(path: str, size: int):
+    """Create a file of the given apparent size without writing its data."""
+    with open(path, "wb") as f:
+        f.truncate(size)
+
+
+def _fill_dir(path: str, count: int, rng: random.Random, max_size: int):
+    os.makedirs(path, exist_ok=True)
+    for i in range(count):
+        _write_file(os.path.join(path, f"f{i:05d}.dat"), rng.randint(0, max_size))
+
+
+def generate_tree(root: str, shape: str, files: int = 20000, seed: int = 0) -> str:
+    """
+    Generate a reproducible synthetic directory tree.
+
+    Args:
+        root: Directory to create the tree in (created if missing).
+        shape: One of SHAPES:
+            wide - one level of many small directories
+            deep - a long chain of nested directories
+            skewed - one subfolder holds 90% of the files
+            small - many tiny files in a few hundred directories
+            hardlinks - every file linked from three directories
+            unreadable - like wide, with every tenth directory unreadable
+        files: Approximate number of files to create.
+        seed: Seed for file sizes, so the same arguments give the same tree.
+
+    Returns:
+        Path of the generated tree.
+
+    Raises:
+        ValueError: If the shape is unknown.
+    """
+    rng = random.Random(seed)
+    os.makedirs(root, exist_ok=True)
+
+    if shape in ("wide", "unreadable"):
+        dirs = max(1, files // 10)
+        for d in range(dirs):
+            _fill_dir(os.path.join(root, f"d{d:05d}"), 10, rng, 1 << 20)
+        if shape == "unreadable":
+            for d in range(0, dirs, 10):
+                os.chmod(os.path.join(root, f"d{d:05d}"), 0)
+    elif shape == "deep":
+        path = root
+        for d in range(max(1, files // 5)):
+            # Stay well below PATH_MAX by restarting the chain every 200 levels
+            parent = root if d % 200 == 0 else path
+            path = os.path.join(parent, f"l{d:05d}")
+            _fill_dir(path, 5, rng, 1 << 16)
+    elif shape == "skewed":
+        big = files * 9 // 10
+        for d in range(max(1, big // 50)):
+            _fill_dir(os.path.join(root, "big", f"b{d // 20:04d}", f"d{d:05d}"), 50, rng, 1 << 20)
+        rest = files - big
+        for d in range(max(1, rest // 10)):
+            _fill_dir(os.path.join(root, f"s{d:05d}"), 10, rng, 1 << 20)
+    elif shape == "small":
+        for d in range(max(1, files // 200)):
+            _fill_dir(os.path.join(root, f"d{d:04d}"), 200, rng, 4096)
+    elif shape == "hardlinks":
+        originals = max(1, files // 3)
+        _fill_dir(os.path.join(root, "data"), originals, rng, 1 << 20)
+        for copy in ("snap1", "snap2"):
+            os.makedirs(os.path.join(root, copy))
+            for i in range(originals):
+                name = f"f{i:05d}.dat"
+                os.link(os.path.join(root, "data", name), os.path.join(root, copy, name))
+    else:
+        raise ValueError(f"Unknown shape: {shape}")
+    return root
+
+
+def remove_tree(root: str):
+    """Remove a generated tree, restoring permissions on unreadable directories."""
+    for dirpath, dirnames, _ in os.walk(root):
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            if not os.access(path, os.R_OK | os.X_OK):
+                os.chmod(path, stat.S_IRWXU)
+    shutil.rmtree(root, ignore_errors=True)
+
+
+# ---------------- strategies ----------------
+def _legacy_folder_size(folder_path: str) -> int:
+    """The original get_folder_size: os.walk plus a getsize stat per file."""
+    total_size = 0
+    try:
+        for dirpath, dirnames, filenames in os.walk(folder_path):
+            for filename in filenames:
+                try:
+                    total_size += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return total_size
+
+
+def _legacy_top_folders(path: str) -> int:
+    """The original get_top_folders: one walk per immediate subfolder."""
+    total = 0
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                total += _legacy_folder_size(entry.path)
+    return total
+
+
+def _prepare(strategy: str, path: str, workers: int, workdir: str) -> Callable[[], int]:
+    """Do any untimed setup for a strategy and return the timed scan."""
+    if strategy == "legacy":
+        return lambda: _legacy_top_folders(path)
+    if strategy == "single":
+        return lambda: scan_tree(path).total_size
+    if strategy == "parallel":
+        return lambda: scan_tree(path, workers=workers).total_size
+    if strategy == "disk-usage":
+        return lambda: scan_tree(path, disk_usage=True).total_size
+    if strategy == "stream":
+
+        def run():
+            tracker = TopNTracker()
+            return scan_tree(
+                path, on_file=tracker.on_file, on_dir=tracker.on_dir, keep_tree=False
+            ).total_size
+
+        return run
+    if strategy == "incremental":
+        index = SizeIndex(os.path.join(workdir, "index.sqlite"))
+        # Age the tree so the warm-up scan is allowed to cache every directory
+        past = time.time() - 3600
+        for dirpath, _, _ in os.walk(path):
+            os.utime(dirpath, (past, past))
+        scan_tree(path, index=index)
+        return lambda: scan_tree(path, index=index).total_size
+    raise ValueError(f"Unknown strategy: {strategy}")
+
+
+# ---------------- measurement ----------------
+class _CountingEntry:
+    """DirEntry proxy that counts stat calls."""
+
+    __slots__ = ("_entry", "_counts")
+
+    def __init__(self, entry: os.DirEntry, counts: Dict[str, int]):
+        self._entry = entry
+        self._counts = counts
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+    def __fspath__(self):
+        return self._entry.path
+
+    def stat(self, *, follow_symlinks=True):
+        self._counts["stat"] += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+
+class _CountingScandir:
+    """os.scandir wrapper that counts listings and wraps entries."""
+
+    def __init__(self, iterator, counts: Dict[str, int]):
+        self._iterator = iterator
+        self._counts = counts
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._iterator.close()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return _CountingEntry(next(self._iterator), self._counts)
+
+    def close(self):
+        self._iterator.close()
+
+
+@contextmanager
+def count_calls():
+    """Count os.scandir and stat calls made inside the block (not thread-safe)."""
+    counts = {"scandir": 0, "stat": 0}
+    real_scandir, real_stat, real_lstat = os.scandir, os.stat, os.lstat
+
+    def scandir(path="."):
+        counts["scandir"] += 1
+        return _CountingScandir(real_scandir(path), counts)
+
+    def counted(func):
+        def wrapper(*args, **kwargs):
+            counts["stat"] += 1
+            return func(*args, **kwargs)
+
+        return wrapper
+
+    os.scandir, os.stat, os.lstat = scandir, counted(real_stat), counted(real_lstat)
+    try:
+        yield counts
+    finally:
+        os.scandir, os.stat, os.lstat = real_scandir, real_stat, real_lstat
+
+
+def _peak_rss_mb() -> Optional[float]:
+    # VmHWM belongs to this address space; ru_maxrss survives exec on Linux and
+    # would report the parent's high-water mark (the generator's) instead
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(strategy: str, path: str, workers: int, repeat: int) -> Dict[str, object]:
+    """
+    Time one strategy in the current process.
+
+    The best of `repeat` timed runs is reported. Peak RSS is read before the
+    instrumented run that counts listings and stats, which is done with a
+    single worker since the counters are not thread-safe.
+    """
+    with tempfile.TemporaryDirectory() as workdir:
+        run = _prepare(strategy, path, workers, workdir)
+        best = None
+        total = 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            total = run()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        peak_rss = _peak_rss_mb()
+        counted = _prepare(strategy, path, 1, workdir) if strategy == "parallel" else run
+        with count_calls() as counts:
+            counted()
+    return {
+        "strategy": strategy,
+        "seconds": best,
+        "bytes": total,
+        "scandir_calls": counts["scandir"],
+        "stat_calls": counts["stat"],
+        "peak_rss_mb": peak_rss,
+    }
+
+
+def run_isolated(strategy: str, path: str, workers: int, repeat: int) -> Dict[str, object]:
+    """Measure a strategy in a fresh interpreter so peak RSS is per strategy."""
+    out = subprocess.run(
+        [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--measure",
+            strategy,
+            path,
+            "--workers",
+            str(workers),
+            "--repeat",
+            str(repeat),
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+    )
+    return json.loads(out.stdout)
+
+
+def benchmark(
+    shapes: List[str],
+    strategies: List[str],
+    files: int,
+    workers: int,
+    repeat: int,
+    seed: int = 0,
+    keep: Optional[str] = None,
+) -> List[Dict[str, object]]:
+    """
+    Generate each tree shape and measure every strategy on it.
+
+    Returns:
+        One result dictionary per (shape, strategy).
+    """
+    results = []
+    base = keep or tempfile.mkdtemp(prefix="bench_disk_scan_")
+    try:
+        for shape in shapes:
+            root = os.path.join(base, shape)
+            if not os.path.isdir(root):
+                generate_tree(root, shape, files, seed)
+            reference = scan_tree(root)
+            entries = reference.file_count + reference.dir_count
+            for strategy in strategies:
+                result = run_isolated(strategy, root, workers, repeat)
+                result.update(
+                    shape=shape,
+                    entries=entries,
+                    entries_per_sec=entries / result["seconds"] if result["seconds"] else None,
+                )
+                results.append(result)
+                print_result(result)
+    finally:
+        if keep is None:
+            remove_tree(base)
+    return results
+
+
+def print_result(result: Dict[str, object]):
+    rss = result["peak_rss_mb"]
+    rss_str = f"{rss:8.1f}" if rss is not None else "     n/a"
+    print(
+        f"{result['shape']:<11} {result['strategy']:<12} {result['entries']:>9,} "
+        f"{result['seconds']:>8.3f} {result['entries_per_sec']:>12,.0f} "
+        f"{result['scandir_calls']:>9,} {result['stat_calls']:>9,} {rss_str}",
+        flush=True,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark disk walker strategies on synthetic trees"
+    )
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES)
+    parser.add_argument("--strategies", nargs="+", choices=STRATEGIES, default=STRATEGIES)
+    parser.add_argument(
+        "--files", type=int, default=20000, help="Approximate files per tree (default: 20000)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="Threads for the parallel strategy (default: 8)"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed runs per strategy, best is kept (default: 3)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for file sizes (default: 0)")
+    parser.add_argument(
+        "--keep", help="Generate trees here and keep them (reused by later runs if present)"
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--measure", nargs=2, metavar=("STRATEGY", "PATH"), help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.measure:
+        strategy, path = args.measure
+        print(json.dumps(measure(strategy, path, args.workers, args.repeat)))
+        return
+
+    print(
+        f"{'shape':<11} {'strategy':<12} {'entries':>9} {'seconds':>8} {'entries/s':>12} "
+        f"{'scandirs':>9} {'stats':>9} {'peak MB':>8}"
+    )
+    results = benchmark(
+        args.shapes, args.strategies, args.files, args.workers, args.repeat, args.seed, args.keep
+    )
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1068 @@
+"""Module for measuring folder sizes with a single directory-tree traversal."""
+
+import asyncio
+import bisect
+import csv
+import fnmatch
+import functools
+import heapq
+import json
+import os
+import queue
+import re
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from size_index import SizeIndex
+
+# Callback signatures used by scan_tree
+FileCallback = Callable[[os.DirEntry, os.stat_result], None]
+DirCallback = Callable[[str, int, int], None]
+
+
+class FolderTree:
+    """
+    Per-directory sizes collected by a single scan of a directory tree.
+
+    The hierarchy is stored as parallel arrays rather than one object per
+    directory: parent index, depth, cumulative size and an offset into a
+    single buffer of encoded names. That is roughly 24 bytes plus the name
+    per directory, so ten-million-directory trees stay explorable in memory.
+    Full paths are rebuilt from the parent chain on demand.
+
+    Directories are stored in discovery order, so a parent always has a lower
+    index than any of its children. Index 0 is the scan root. A tree created
+    with keep_tree=False only keeps the counters and the total size, so its
+    memory use does not grow with the number of directories.
+
+    Attributes:
+        root: Absolute path of the scanned directory.
+        parents: Parent index for each directory (-1 for the root).
+        depths: Depth below the root for each directory (root is 0).
+        sizes: Cumulative size in bytes of each directory's subtree.
+        file_count: Number of files seen during the scan.
+        dir_count: Number of directories seen during the scan.
+        error_count: Number of entries or directories that could not be read.
+        listed_count: Number of directories actually listed; lower than
+            dir_count when unchanged directories were reused from a SizeIndex.
+        pruned_count: Number of directories skipped by prune rules.
+        unscanned_count: Number of directories found but never listed
+            because the scan was cancelled.
+        complete: False if the scan was cancelled; sizes are then lower
+            bounds that count only what was listed before it stopped.
+    """
+
+    def __init__(self, root: str, keep_tree: bool = True):
+        self.root = root
+        self.keep_tree = keep_tree
+        self.parents = array("i")
+        self.depths = array("I")
+        self.sizes = array("q")
+        self._names = bytearray()
+        # Name i is _names[_name_offsets[i]:_name_offsets[i + 1]]
+        self._name_offsets = array("Q", [0])
+        self.file_count = 0
+        self.dir_count = 0
+        self.error_count = 0
+        self.listed_count = 0
+        self.pruned_count = 0
+        self.unscanned_count = 0
+        self.complete = True
+        self._children: Optional[Tuple[array, array]] = None
+        self._discovered = 0
+        self._total = 0
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def add(self, path: str, parent: int, depth: int) -> int:
+        """
+        Record a newly discovered directory.
+
+        Args:
+            path: Path of the directory.
+            parent: Index of the parent directory (-1 for the root).
+            depth: Depth below the scan root.
+
+        Returns:
+            Index assigned to the directory.
+        """
+        self._discovered += 1
+        if self.keep_tree:
+            self._names += os.fsencode(os.path.basename(path) if parent >= 0 else path)
+            self._name_offsets.append(len(self._names))
+            self.parents.append(parent)
+            self.depths.append(depth)
+            self.sizes.append(0)
+            self._children = None
+        return self._discovered - 1
+
+    def set_size(self, index: int, size: int):
+        """
+        Record the cumulative size of a finished directory.
+
+        Args:
+            index: Index returned by add.
+            size: Size in bytes of the directory's subtree.
+        """
+        if self.keep_tree:
+            self.sizes[index] = size
+        if index == 0:
+            self._total = size
+
+    @property
+    def total_size(self) -> int:
+        """Total size in bytes of the whole tree."""
+        return self._total
+
+    def name_of(self, index: int) -> str:
+        """
+        Get the name of a directory (the full root path for index 0).
+
+        Args:
+            index: Directory index.
+
+        Returns:
+            Directory name.
+        """
+        offsets = self._name_offsets
+        return os.fsdecode(bytes(self._names[offsets[index] : offsets[index + 1]]))
+
+    def path_of(self, index: int) -> str:
+        """
+        Rebuild the full path of a directory from its parent chain.
+
+        Args:
+            index: Directory index.
+
+        Returns:
+            Directory path.
+        """
+        names = []
+        while index >= 0:
+            names.append(self.name_of(index))
+            index = self.parents[index]
+        return os.path.join(*reversed(names))
+
+    def children(self, index: int) -> List[int]:
+        """
+        Get the immediate subdirectories of a directory, largest first.
+
+        Args:
+            index: Directory index.
+
+        Returns:
+            List of child indices sorted by size descending.
+        """
+        starts, order = self._child_index()
+        kids = order[starts[index] : starts[index + 1]]
+        return sorted(kids, key=self.sizes.__getitem__, reverse=True)
+
+    def find(self, path: Union[str, Path]) -> int:
+        """
+        Get the index of a directory inside the scanned tree.
+
+        Args:
+            path: Path of the directory.
+
+        Returns:
+            Directory index.
+
+        Raises:
+            KeyError: If the path was not part of the scan.
+        """
+        relative = os.path.relpath(os.path.abspath(path), self.root)
+        if relative.startswith(os.pardir) or not len(self):
+            raise KeyError(str(path))
+        index = 0
+        if relative == os.curdir:
+            return index
+        starts, order = self._child_index()
+        for part in relative.split(os.sep):
+            for child in order[starts[index] : starts[index + 1]]:
+                if self.name_of(child) == part:
+                    index = child
+                    break
+            else:
+                raise KeyError(str(path))
+        return index
+
+    def size_of(self, path: Union[str, Path]) -> int:
+        """
+        Get the cumulative size of a directory inside the scanned tree.
+
+        Args:
+            path: Path of the directory.
+
+        Returns:
+            Size in bytes.
+
+        Raises:
+            KeyError: If the path was not part of the scan.
+        """
+        return self.sizes[self.find(path)]
+
+    def top_folders(self, top_n: int = 10, depth: int = 1) -> List[Tuple[str, int]]:
+        """
+        Get the largest directories at a given depth below the root.
+
+        Args:
+            top_n: Number of folders to return.
+            depth: Depth below the root (1 means immediate subfolders).
+
+        Returns:
+            List of tuples (folder_path, size_in_bytes) sorted by size descending.
+        """
+        depths, sizes = self.depths, self.sizes
+        candidates = (i for i in range(len(self)) if depths[i] == depth)
+        top = heapq.nlargest(top_n, candidates, key=sizes.__getitem__)
+        return [(self.path_of(i), sizes[i]) for i in top]
+
+    def export_csv(self, file: TextIO, max_depth: Optional[int] = None):
+        """
+        Write one CSV row per directory: index, parent, depth, size, name, path.
+
+        Args:
+            file: Text stream to write to.
+            max_depth: Only write directories down to this depth (default: all).
+        """
+        writer = csv.writer(file)
+        writer.writerow(["index", "parent", "depth", "size", "name", "path"])
+        for i in range(len(self)):
+            if max_depth is None or self.depths[i] <= max_depth:
+                row = [i, self.parents[i], self.depths[i], self.sizes[i]]
+                writer.writerow(row + [self.name_of(i), self.path_of(i)])
+
+    def export_json(self, file: TextIO, max_depth: Optional[int] = None):
+        """
+        Write the hierarchy as nested JSON objects with name, size and children.
+
+        The document is streamed without building it in memory, and children
+        are ordered largest first.
+
+        Args:
+            file: Text stream to write to.
+            max_depth: Only write directories down to this depth (default: all).
+        """
+        if not len(self):
+            file.write("null\n")
+            return
+        # Each stack item is a directory to open, or None to close the latest one
+        stack: List[Optional[int]] = [0]
+        first = True
+        while stack:
+            index = stack.pop()
+            if index is None:
+                file.write("]}")
+                first = False
+                continue
+            if not first:
+                file.write(",")
+            name = json.dumps(self.name_of(index))
+            file.write(f'{{"name": {name}, "size": {self.sizes[index]}, "children": [')
+            first = True
+            stack.append(None)
+            if max_depth is None or self.depths[index] < max_depth:
+                stack.extend(reversed(self.children(index)))
+        file.write("\n")
+
+    def sorted_records(self) -> Iterator[Tuple[bytes, int]]:
+        """
+        Yield every directory as (key, size) in ascending key order.
+
+        The key is the path relative to the root with the encoded names joined
+        by NUL bytes (the root itself is b""). Since names cannot contain NUL,
+        byte order of the keys is the same as comparing paths name by name,
+        and it comes straight out of a walk that visits children sorted by name.
+
+        Returns:
+            Iterator of (key, size_in_bytes) tuples.
+        """
+        if not len(self):
+            return
+        starts, order = self._child_index()
+        names, offsets = self._names, self._name_offsets
+        stack = [(0, b"")]
+        while stack:
+            index, key = stack.pop()
+            yield key, self.sizes[index]
+            prefix = key + b"\0" if index else b""
+            kids = sorted(
+                (prefix + bytes(names[offsets[child] : offsets[child + 1]]), child)
+                for child in order[starts[index] : starts[index + 1]]
+            )
+            # Pushed largest key first so the smallest is visited next
+            stack.extend((child, child_key) for child_key, child in reversed(kids))
+
+    def _child_index(self) -> Tuple[array, array]:
+        """Build (once) a CSR index: children of i are order[starts[i]:starts[i + 1]]."""
+        if self._children is None:
+            n = len(self)
+            starts = array("Q", bytes(8 * (n + 1)))
+            for parent in self.parents[1:]:
+                starts[parent + 1] += 1
+            for i in range(n):
+                starts[i + 1] += starts[i]
+            fill = array("Q", starts)
+            order = array("i", bytes(4 * max(n - 1, 0)))
+            for child in range(1, n):
+                parent = self.parents[child]
+                order[fill[parent]] = child
+                fill[parent] += 1
+            self._children = (starts, order)
+        return self._children
+
+
+class InodeSet:
+    """
+    Compact set of (device, inode) pairs used to count hardlinked files once.
+
+    Pairs live in two flat ``array('Q')`` tables with open addressing, about
+    24 bytes per entry instead of the ~150 bytes of a Python set of tuples.
+    Inode 0 is never a real file and marks an empty slot. The set is safe to
+    share between scan worker threads.
+    """
+
+    _MAX_LOAD = 2 / 3
+
+    def __init__(self, capacity: int = 1024):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self._devs = array("Q", bytes(8 * size))
+        self._inos = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, dev: int, ino: int) -> bool:
+        """
+        Add a (device, inode) pair.
+
+        Args:
+            dev: Device number (st_dev).
+            ino: Inode number (st_ino), must be non-zero.
+
+        Returns:
+            True if the pair was new, False if it was already in the set.
+        """
+        with self._lock:
+            if not self._insert(dev, ino):
+                return False
+            self._count += 1
+            if self._count > self._MAX_LOAD * (self._mask + 1):
+                self._grow()
+            return True
+
+    def __contains__(self, key: Tuple[int, int]) -> bool:
+        dev, ino = key
+        with self._lock:
+            devs, inos, mask = self._devs, self._inos, self._mask
+            slot = hash((dev, ino)) & mask
+            while inos[slot]:
+                if inos[slot] == ino and devs[slot] == dev:
+                    return True
+                slot = (slot + 1) & mask
+            return False
+
+    def _insert(self, dev: int, ino: int) -> bool:
+        devs, inos, mask = self._devs, self._inos, self._mask
+        slot = hash((dev, ino)) & mask
+        while inos[slot]:
+            if inos[slot] == ino and devs[slot] == dev:
+                return False
+            slot = (slot + 1) & mask
+        devs[slot] = dev
+        inos[slot] = ino
+        return True
+
+    def _grow(self):
+        old = zip(self._devs, self._inos)
+        size = (self._mask + 1) * 2
+        self._devs = array("Q", bytes(8 * size))
+        self._inos = array("Q", bytes(8 * size))
+        self._mask = size - 1
+        for dev, ino in old:
+            if ino:
+                self._insert(dev, ino)
+
+
+class TopNTracker:
+    """
+    Bounded leaderboards of the largest folders and files seen during a scan.
+
+    Pass the tracker's on_file and on_dir methods to scan_tree. Only top_n
+    entries are kept per leaderboard, so memory stays flat however large the
+    tree is. If a progress callback is given it is called with the tracker at
+    most once per interval while the scan runs.
+
+    Attributes:
+        entries: Number of files and directories seen so far.
+        bytes_seen: Total size of the files seen so far.
+    """
+
+    def __init__(
+        self,
+        top_n: int = 10,
+        depth: int = 1,
+        progress: Optional[Callable[["TopNTracker"], None]] = None,
+        interval: float = 5.0,
+    ):
+        self.top_n = top_n
+        self.depth = depth
+        self.entries = 0
+        self.bytes_seen = 0
+        self._folders: List[Tuple[int, str]] = []
+        self._files: List[Tuple[int, str]] = []
+        self._progress = progress
+        self._interval = interval
+        self._started = time.monotonic()
+        self._next_report = self._started + interval
+
+    def on_file(self, entry: os.DirEntry, st: os.stat_result):
+        """File callback for scan_tree."""
+        self.entries += 1
+        self.bytes_seen += st.st_size
+        self._offer(self._files, st.st_size, entry.path)
+        self._tick()
+
+    def on_dir(self, path: str, size: int, depth: int):
+        """Directory callback for scan_tree."""
+        self.entries += 1
+        if depth == self.depth:
+            self._offer(self._folders, size, path)
+        self._tick()
+
+    @property
+    def elapsed(self) -> float:
+        """Seconds since the tracker was created."""
+        return time.monotonic() - self._started
+
+    @property
+    def rate(self) -> float:
+        """Entries scanned per second."""
+        elapsed = self.elapsed
+        return self.entries / elapsed if elapsed > 0 else 0.0
+
+    def top_folders(self) -> List[Tuple[str, int]]:
+        """
+        Get the largest finished folders at the tracked depth.
+
+        Returns:
+            List of tuples (folder_path, size_in_bytes) sorted by size descending.
+        """
+        return [(path, size) for size, path in sorted(self._folders, reverse=True)]
+
+    def top_files(self) -> List[Tuple[str, int]]:
+        """
+        Get the largest files seen so far.
+
+        Returns:
+            List of tuples (file_path, size_in_bytes) sorted by size descending.
+        """
+        return [(path, size) for size, path in sorted(self._files, reverse=True)]
+
+    def _offer(self, heap: List[Tuple[int, str]], size: int, path: str):
+        """Keep (size, path) if it belongs in the bounded min-heap."""
+        if len(heap) < self.top_n:
+            heapq.heappush(heap, (size, path))
+        elif heap and size > heap[0][0]:
+            heapq.heapreplace(heap, (size, path))
+
+    def _tick(self):
+        if self._progress is None:
+            return
+        now = time.monotonic()
+        if now >= self._next_report:
+            self._next_report = now + self._interval
+            self._progress(self)
+
+
+# Upper bounds (in days) and labels of the file age buckets used by FileHistograms
+AGE_BUCKETS = [
+    (1, "< 1 day"),
+    (7, "1-7 days"),
+    (30, "7-30 days"),
+    (90, "1-3 months"),
+    (365, "3-12 months"),
+    (3 * 365, "1-3 years"),
+    (float("inf"), "> 3 years"),
+]
+
+
+class FileHistograms:
+    """
+    Extension and age histograms (file counts and bytes) built during a scan.
+
+    Pass the on_file method to scan_tree. Everything is computed from the
+    stat result the walker already has, so the histograms cost no extra
+    syscalls. Distinct extensions are capped at max_extensions; files with
+    further new extensions are counted under "(other)".
+
+    Attributes:
+        extensions: Dictionary mapping lowercase extension (or "(none)") to
+            [count, bytes].
+        mtime_ages: [count, bytes] per AGE_BUCKETS entry, by modification time.
+        atime_ages: [count, bytes] per AGE_BUCKETS entry, by access time.
+    """
+
+    def __init__(self, now: Optional[float] = None, max_extensions: int = 10000):
+        self.now = time.time() if now is None else now
+        self.max_extensions = max_extensions
+        self.extensions: Dict[str, List[int]] = {}
+        self.mtime_ages = [[0, 0] for _ in AGE_BUCKETS]
+        self.atime_ages = [[0, 0] for _ in AGE_BUCKETS]
+        self._bounds = [days * 86400 for days, _ in AGE_BUCKETS[:-1]]
+
+    def on_file(self, entry: os.DirEntry, st: os.stat_result):
+        """File callback for scan_tree."""
+        size = st.st_size
+        ext = os.path.splitext(entry.name)[1].lower() or "(none)"
+        counts = self.extensions.get(ext)
+        if counts is None:
+            if len(self.extensions) >= self.max_extensions:
+                ext = "(other)"
+            counts = self.extensions.setdefault(ext, [0, 0])
+        counts[0] += 1
+        counts[1] += size
+        bucket = self.mtime_ages[bisect.bisect_right(self._bounds, self.now - st.st_mtime)]
+        bucket[0] += 1
+        bucket[1] += size
+        bucket = self.atime_ages[bisect.bisect_right(self._bounds, self.now - st.st_atime)]
+        bucket[0] += 1
+        bucket[1] += size
+
+    def top_extensions(self, top_n: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Get the extensions using the most space.
+
+        Args:
+            top_n: Number of extensions to return.
+
+        Returns:
+            List of tuples (extension, file_count, bytes) sorted by bytes descending.
+        """
+        top = heapq.nlargest(top_n, self.extensions.items(), key=lambda x: x[1][1])
+        return [(ext, count, size) for ext, (count, size) in top]
+
+    def age_table(self, kind: str = "mtime") -> List[Tuple[str, int, int]]:
+        """
+        Get the age histogram.
+
+        Args:
+            kind: "mtime" for modification time or "atime" for access time.
+
+        Returns:
+            List of tuples (bucket_label, file_count, bytes), newest first.
+
+        Raises:
+            ValueError: If kind is not "mtime" or "atime".
+        """
+        if kind not in ("mtime", "atime"):
+            raise ValueError(f"Unknown age kind: {kind}")
+        ages = self.mtime_ages if kind == "mtime" else self.atime_ages
+        return [(label, count, size) for (_, label), (count, size) in zip(AGE_BUCKETS, ages)]
+
+
+class _PendingDir:
+    """A directory that has been discovered but whose subtree is not finished."""
+
+    __slots__ = ("index", "parent", "path", "depth", "size", "pending")
+
+    def __init__(self, index: int, parent: Optional["_PendingDir"], path: str, depth: int):
+        self.index = index
+        self.parent = parent
+        self.path = path
+        self.depth = depth
+        self.size = 0
+        # Unfinished work below this directory: its own listing plus one per subdirectory
+        self.pending = 1
+
+
+# Result of listing one directory: (file bytes, file count, error count,
+# subdirectory paths, 1 if read from disk else 0, subdirectories pruned)
+_Listing = Tuple[int, int, int, List[str], int, int]
+
+# Windows has no st_blocks; allocated size falls back to the apparent size there
+_HAS_BLOCKS = hasattr(os.stat_result, "st_blocks")
+
+# Directories modified this close to the scan are not cached, since a change
+# within the same mtime tick would go unnoticed (FAT and some NFS servers use 2s)
+_RACY_WINDOW_NS = 2_000_000_000
+
+
+def _list_dir(
+    node: _PendingDir, on_file: Optional[FileCallback], inodes: Optional[InodeSet] = None
+) -> _Listing:
+    """
+    List one directory and add up the sizes of the files directly inside it.
+
+    With an InodeSet the allocated size is used instead of the apparent size,
+    and files with several hardlinks are only counted the first time.
+
+    Raises:
+        OSError: If the scan root itself cannot be listed.
+    """
+    subdirs = []
+    size = 0
+    files = 0
+    errors = 0
+    try:
+        with os.scandir(node.path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                        continue
+                    # Symlinks are measured as links; the stat is reused from the entry
+                    st = entry.stat(follow_symlinks=False)
+                except OSError:
+                    errors += 1
+                    continue
+                if inodes is None:
+                    size += st.st_size
+                elif st.st_nlink < 2 or not st.st_ino or inodes.add(st.st_dev, st.st_ino):
+                    size += _allocated_size(st)
+                files += 1
+                if on_file is not None:
+                    on_file(entry, st)
+    except OSError:
+        if node.parent is None:
+            raise
+        errors += 1
+    return size, files, errors, subdirs, 1, 0
+
+
+def _allocated_size(st: os.stat_result) -> int:
+    """Bytes allocated on disk for a file (st_blocks is in 512-byte units)."""
+    if _HAS_BLOCKS:
+        return st.st_blocks * 512
+    return st.st_size
+
+
+def _list_dir_indexed(
+    node: _PendingDir, on_file: Optional[FileCallback], index: SizeIndex, started_ns: int
+) -> _Listing:
+    """
+    List one directory, reusing the index entry when inode and mtime are unchanged.
+
+    Reused directories are not read, so on_file is not called for their files.
+    """
+    try:
+        st = os.stat(node.path)
+    except OSError:
+        if node.parent is None:
+            raise
+        return 0, 0, 1, [], 0, 0
+
+    cached = index.lookup(node.path)
+    if cached is not None and cached.ino == st.st_ino and cached.mtime_ns == st.st_mtime_ns:
+        subdirs = [os.path.join(node.path, name) for name in cached.subdirs]
+        return cached.file_bytes, cached.file_count, 0, subdirs, 0, 0
+
+    listing = _list_dir(node, on_file)
+    size, files, errors, subdirs, _, _ = listing
+    names = [os.path.basename(subdir) for subdir in subdirs]
+    if cached is not None:
+        for name in set(cached.subdirs).difference(names):
+            index.forget(os.path.join(node.path, name))
+    if errors == 0 and started_ns - st.st_mtime_ns > _RACY_WINDOW_NS:
+        index.store(node.path, st, size, files, names)
+    return listing
+
+
+class PruneRules:
+    """
+    Decide which subdirectories a scan skips without descending into them.
+
+    Patterns use shell wildcards (fnmatch). A pattern without a path
+    separator is matched against the directory name, e.g. "node_modules" or
+    ".snapshot*"; a pattern with one is matched against the full path, e.g.
+    "/proc". All patterns are combined into one regular expression, so each
+    directory is checked once whatever the number of patterns.
+
+    Args:
+        patterns: Wildcard patterns of directories to skip.
+        one_file_system: Skip directories on a different device than root_dev.
+        root_dev: Device of the scan root (st_dev), used by one_file_system.
+    """
+
+    def __init__(
+        self,
+        patterns: Iterable[str] = (),
+        one_file_system: bool = False,
+        root_dev: Optional[int] = None,
+    ):
+        patterns = list(patterns)
+        names = [p for p in patterns if os.sep not in p and (os.altsep or os.sep) not in p]
+        paths = [p for p in patterns if p not in names]
+        self._name_re = self._compile(names)
+        self._path_re = self._compile([os.path.normcase(os.path.abspath(p)) for p in paths])
+        self.one_file_system = one_file_system
+        self.root_dev = root_dev
+
+    @staticmethod
+    def _compile(patterns: List[str]):
+        if not patterns:
+            return None
+        return re.compile("|".join(fnmatch.translate(p) for p in patterns))
+
+    def skips(self, path: str) -> bool:
+        """
+        Check whether a directory should be skipped.
+
+        Args:
+            path: Path of the directory.
+
+        Returns:
+            True if the directory matches a pattern or, in one-file-system
+            mode, is on another device (a mount point).
+        """
+        if self._name_re is not None and self._name_re.match(os.path.basename(path)):
+            return True
+        if self._path_re is not None and self._path_re.match(os.path.normcase(path)):
+            return True
+        if self.one_file_system:
+            try:
+                return os.lstat(path).st_dev != self.root_dev
+            except OSError:
+                return False
+        return False
+
+
+def _list_dir_pruned(
+    node: _PendingDir,
+    on_file: Optional[FileCallback],
+    list_dir: Callable[[_PendingDir, Optional[FileCallback]], _Listing],
+    rules: PruneRules,
+) -> _Listing:
+    """Apply prune rules to the subdirectories found by another list function."""
+    size, files, errors, subdirs, listed, _ = list_dir(node, on_file)
+    kept = [subdir for subdir in subdirs if not rules.skips(subdir)]
+    return size, files, errors, kept, listed, len(subdirs) - len(kept)
+
+
+def _add_listing(
+    node: _PendingDir,
+    listing: _Listing,
+    tree: FolderTree,
+    on_dir: Optional[DirCallback],
+    push: Callable[[_PendingDir], None],
+):
+    """Record a directory listing, queue its subdirectories and roll up if it is finished."""
+    size, files, errors, subdirs, listed, pruned = listing
+    node.size += size
+    tree.file_count += files
+    tree.error_count += errors
+    tree.dir_count += 1
+    tree.listed_count += listed
+    tree.pruned_count += pruned
+    depth = node.depth + 1
+    for subdir in subdirs:
+        node.pending += 1
+        push(_PendingDir(tree.add(subdir, node.index, depth), node, subdir, depth))
+    _finish(node, tree, on_dir)
+
+
+def _finish(node: Optional[_PendingDir], tree: FolderTree, on_dir: Optional[DirCallback]):
+    """Mark one unit of work done and roll completed subtrees up into their parents."""
+    while node is not None:
+        node.pending -= 1
+        if node.pending:
+            return
+        tree.set_size(node.index, node.size)
+        if on_dir is not None:
+            on_dir(node.path, node.size, node.depth)
+        parent = node.parent
+        if parent is not None:
+            parent.size += node.size
+        node = parent
+
+
+def _scan_parallel(
+    root: _PendingDir,
+    tree: FolderTree,
+    workers: int,
+    list_dir: Callable[[_PendingDir, Optional[FileCallback]], _Listing],
+    on_file: Optional[FileCallback],
+    on_dir: Optional[DirCallback],
+    cancel: Optional[threading.Event] = None,
+) -> List[_PendingDir]:
+    """
+    Scan with a pool of threads that share one queue of directories.
+
+    Every directory is its own unit of work, so a subfolder holding most of the
+    tree is spread over all workers instead of pinning one of them. Listing runs
+    without the lock; bookkeeping and callbacks run under it.
+
+    Returns:
+        Directories left unlisted because cancel was set.
+    """
+    lock = threading.Lock()
+    # LIFO keeps the walk depth-first, so the queue stays small on wide trees
+    work: "queue.LifoQueue[Optional[_PendingDir]]" = queue.LifoQueue()
+    failures: List[BaseException] = []
+    unscanned: List[_PendingDir] = []
+
+    if on_file is not None:
+        file_callback = on_file
+
+        def on_file(entry, st):
+            with lock:
+                file_callback(entry, st)
+
+    def worker():
+        while True:
+            node = work.get()
+            if node is None:
+                return
+            if cancel is not None and cancel.is_set():
+                # Drain the queue without listing so join returns promptly
+                with lock:
+                    unscanned.append(node)
+                work.task_done()
+                continue
+            try:
+                listing = list_dir(node, on_file)
+                with lock:
+                    _add_listing(node, listing, tree, on_dir, work.put)
+            except BaseException as exc:
+                failures.append(exc)
+            finally:
+                work.task_done()
+
+    # The root is listed up front so an unreadable root raises in the caller
+    _add_listing(root, list_dir(root, on_file), tree, on_dir, work.put)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    work.join()
+    for _ in threads:
+        work.put(None)
+    for thread in threads:
+        thread.join()
+
+    if failures:
+        raise failures[0]
+    return unscanned
+
+
+def scan_tree(
+    path: Union[str, Path],
+    on_file: Optional[FileCallback] = None,
+    on_dir: Optional[DirCallback] = None,
+    workers: int = 1,
+    index: Optional[SizeIndex] = None,
+    keep_tree: bool = True,
+    disk_usage: bool = False,
+    prune: Iterable[str] = (),
+    one_file_system: bool = False,
+    cancel: Optional[threading.Event] = None,
+) -> FolderTree:
+    """
+    Scan a directory tree once and compute the size of every directory in it.
+
+    Each file is stat'ed exactly once using the ``os.DirEntry`` returned by
+    ``os.scandir``. Sizes are rolled up into the parent as soon as a subtree is
+    finished, so every level of the hierarchy is available after one pass.
+
+    Args:
+        path: Directory to scan.
+        on_file: Optional callback called as ``on_file(entry, stat_result)``
+            for every non-directory entry.
+        on_dir: Optional callback called as ``on_dir(path, size, depth)`` when
+            a directory and everything below it has been measured.
+        workers: Number of threads listing directories concurrently. Values
+            above 1 help on network shares where each listing waits on a
+            metadata round-trip. Totals are identical to the serial scan.
+        index: Optional SizeIndex for incremental scans. Directories whose
+            inode and mtime match the index are not listed again; their
+            subdirectories are still visited, so every directory costs one
+            stat instead of one listing plus a stat per file. Files changed
+            in place (which does not touch the directory mtime) keep their
+            cached size until their directory changes.
+        keep_tree: Keep the size of every directory in the result. Pass False
+            when only callbacks and the total are needed, so memory stays
+            flat however many directories the tree has.
+        disk_usage: Measure allocated size (``st_blocks``) like ``du`` instead
+            of apparent size, counting each hardlinked (device, inode) once.
+            Sparse and compressed files count what they really occupy.
+        prune: Wildcard patterns of directories to skip, checked once per
+            directory before descending (see PruneRules).
+        one_file_system: Do not descend into directories on other
+            filesystems, like ``du -x``, so /proc or network mounts under
+            the root are left out.
+        cancel: Optional event checked before each directory is listed. Once
+            it is set the scan stops, directories not listed yet count as
+            empty and the tree is returned with complete set to False. on_dir
+            is only called for directories that were measured in full.
+
+    Returns:
+        FolderTree with the cumulative size of every directory.
+
+    Raises:
+        FileNotFoundError: If the path does not exist.
+        PermissionError: If lacking permission to list the path.
+        ValueError: If disk_usage is combined with an index, since hardlinks
+            can only be counted once when every file is visited.
+    """
+    if disk_usage and index is not None:
+        raise ValueError("disk_usage cannot be combined with an incremental index")
+
+    root = os.path.abspath(path)
+    tree = FolderTree(root, keep_tree)
+    root_node = _PendingDir(tree.add(root, -1, 0), None, root, 0)
+
+    list_dir = _list_dir
+    if disk_usage:
+        list_dir = functools.partial(_list_dir, inodes=InodeSet())
+    if index is not None:
+        list_dir = functools.partial(_list_dir_indexed, index=index, started_ns=time.time_ns())
+        dir_callback = on_dir
+
+        def on_dir(path, size, depth):
+            index.store_total(path, size)
+            if dir_callback is not None:
+                dir_callback(path, size, depth)
+
+    prune = list(prune)
+    if prune or one_file_system:
+        rules = PruneRules(prune, one_file_system, os.stat(root).st_dev)
+        list_dir = functools.partial(_list_dir_pruned, list_dir=list_dir, rules=rules)
+
+    if workers > 1:
+        unscanned = _scan_parallel(root_node, tree, workers, list_dir, on_file, on_dir, cancel)
+    else:
+        unscanned = [root_node]
+        while unscanned and not (cancel is not None and cancel.is_set()):
+            node = unscanned.pop()
+            _add_listing(node, list_dir(node, on_file), tree, on_dir, unscanned.append)
+
+    if unscanned:
+        # Close the unlisted directories so what was measured rolls up to the root
+        tree.complete = False
+        tree.unscanned_count = len(unscanned)
+        for node in unscanned:
+            _finish(node, tree, None)
+
+    if index is not None:
+        index.flush()
+    return tree
+
+
+class ScanResult(NamedTuple):
+    """Outcome of a time-budgeted scan."""
+
+    size: int
+    complete: bool
+    elapsed: float
+    tree: Optional[FolderTree]
+
+
+async def scan_tree_async(
+    path: Union[str, Path],
+    timeout: Optional[float] = None,
+    grace: float = 1.0,
+    **kwargs,
+) -> ScanResult:
+    """
+    Scan a directory tree in a worker thread without blocking the event loop.
+
+    When the timeout expires the scan is told to stop and the partial tree is
+    returned with complete set to False. The scan only checks for that
+    between directories, so if one listing is stuck (a hung network share)
+    for longer than grace, the call returns anyway with the bytes of the
+    files seen so far (allocated bytes with disk_usage=True) and no tree;
+    the thread exits on its own later.
+    Cancelling the awaiting task stops the scan the same way.
+
+    Args:
+        path: Directory to scan.
+        timeout: Seconds to scan before returning partial results, or None
+            to wait for the whole tree.
+        grace: Seconds to wait for the scan to stop after the timeout.
+        **kwargs: Other scan_tree arguments (workers, on_file, prune, ...).
+
+    Returns:
+        ScanResult with the total size, whether the scan finished, the
+        elapsed seconds and the FolderTree (None if the scan did not stop
+        within the grace period).
+
+    Raises:
+        FileNotFoundError: If the path does not exist.
+        PermissionError: If lacking permission to list the path.
+    """
+    cancel = threading.Event()
+    seen = [0]
+    file_callback = kwargs.pop("on_file", None)
+    # Measured like the scan itself, so a stuck scan's size is in the same units
+    inodes = InodeSet() if kwargs.get("disk_usage") else None
+
+    def on_file(entry, st):
+        if inodes is None:
+            seen[0] += st.st_size
+        elif st.st_nlink < 2 or not st.st_ino or inodes.add(st.st_dev, st.st_ino):
+            seen[0] += _allocated_size(st)
+        if file_callback is not None:
+            file_callback(entry, st)
+
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def settle(tree, exc):
+        if future.done():
+            return
+        if exc is None:
+            future.set_result(tree)
+        else:
+            future.set_exception(exc)
+
+    def run():
+        tree, exc = None, None
+        try:
+            tree = scan_tree(path, on_file=on_file, cancel=cancel, **kwargs)
+        except BaseException as error:
+            exc = error
+        try:
+            loop.call_soon_threadsafe(settle, tree, exc)
+        except RuntimeError:
+            pass  # The event loop was closed while the scan was stuck
+
+    # A daemon thread rather than the loop's executor, so a scan stuck on a
+    # hung share cannot hold up executor shutdown when the loop closes
+    started = time.monotonic()
+    threading.Thread(target=run, name="scan_tree_async", daemon=True).start()
+    try:
+        done, _ = await asyncio.wait({future}, timeout=timeout)
+        if not done:
+            cancel.set()
+            done, _ = await asyncio.wait({future}, timeout=grace)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
+    elapsed = time.monotonic() - started
+
+    if not done:
+        # Retrieve the eventual outcome so a late error is not reported as unhandled
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        return ScanResult(seen[0], False, elapsed, None)
+    tree = future.result()
+    return ScanResult(tree.total_size, tree.complete, elapsed, tree)
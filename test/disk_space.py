@@ -1,8 +1,18 @@
 """Module for checking disk space."""
 
+import argparse
+import json
+import os
 import shutil
+import sys
+import threading
+import time
+from array import array
 from pathlib import Path
-from typing import Dict, Union
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, TextIO, Tuple, Union
+
+# Path-to-device entries kept by DiskSpaceCache before expired ones are dropped
+_MAX_CACHED_PATHS = 4096
 
 
 def get_disk_space_free(path: Union[str, Path] = "/") -> int:
@@ -86,3 +96,450 @@ def has_sufficient_space(path: Union[str, Path], required_bytes: int) -> bool:
     """
     free_space = get_disk_space_free(path)
     return free_space >= required_bytes
+
+
+class DiskSpaceCache:
+    """
+    Cached disk space lookups for many paths.
+
+    Paths on the same filesystem (same ``st_dev``) share a single
+    ``shutil.disk_usage`` call, and both the path-to-filesystem mapping and
+    the usage figures are reused for ``ttl`` seconds. A service that checks
+    free space before every write therefore makes no syscalls at all for
+    repeated checks within the TTL. Safe to share between threads: the lock
+    only guards the cache entries, so a slow filesystem holds up the threads
+    asking about it and no others.
+
+    Args:
+        ttl: Seconds a result stays valid. 0 disables caching between calls
+            but still collapses paths on the same filesystem within a call.
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        self._devices: Dict[str, Tuple[float, int]] = {}
+        self._usage: Dict[int, Tuple[float, Dict[str, int]]] = {}
+        self._lock = threading.Lock()
+
+    def snapshot(
+        self, paths: Iterable[Union[str, Path]]
+    ) -> Dict[Hashable, Dict[str, int]]:
+        """
+        Get disk space information for many paths at once.
+
+        Args:
+            paths: The paths to check.
+
+        Returns:
+            Dictionary mapping each given path to a dictionary with 'total',
+            'used', and 'free' space in bytes.
+
+        Raises:
+            FileNotFoundError: If a path does not exist.
+            PermissionError: If lacking permission to access a path.
+        """
+        now = time.monotonic()
+        batch: Dict[int, Dict[str, int]] = {}
+        result = {}
+        for path in paths:
+            key = os.fspath(path)
+            dev = self._device_of(key, now)
+            info = batch.get(dev)
+            if info is None:
+                info = batch[dev] = self._usage_of(dev, key, now)
+            result[path] = dict(info)
+        return result
+
+    def get_disk_space_info(self, path: Union[str, Path] = "/") -> Dict[str, int]:
+        """
+        Get cached disk space information for the given path.
+
+        Args:
+            path: The path to check. Defaults to root directory.
+
+        Returns:
+            Dictionary with 'total', 'used', and 'free' space in bytes.
+
+        Raises:
+            FileNotFoundError: If the path does not exist.
+            PermissionError: If lacking permission to access the path.
+        """
+        return self.snapshot([path])[path]
+
+    def get_disk_space_free(self, path: Union[str, Path] = "/") -> int:
+        """
+        Get cached free disk space in bytes for the given path.
+
+        Args:
+            path: The path to check. Defaults to root directory.
+
+        Returns:
+            Free disk space in bytes.
+
+        Raises:
+            FileNotFoundError: If the path does not exist.
+            PermissionError: If lacking permission to access the path.
+        """
+        return self.get_disk_space_info(path)["free"]
+
+    def has_sufficient_space(self, path: Union[str, Path], required_bytes: int) -> bool:
+        """
+        Check, using cached figures, if the filesystem has sufficient free space.
+
+        Args:
+            path: The path to check.
+            required_bytes: The required space in bytes.
+
+        Returns:
+            True if sufficient space is available, False otherwise.
+        """
+        return self.get_disk_space_free(path) >= required_bytes
+
+    def clear(self):
+        """Drop all cached results."""
+        with self._lock:
+            self._devices.clear()
+            self._usage.clear()
+
+    def _device_of(self, path: str, now: float) -> int:
+        """Get the filesystem device of a path, stat'ing it only when expired."""
+        with self._lock:
+            cached = self._devices.get(path)
+        if cached is not None and now < cached[0]:
+            return cached[1]
+        try:
+            dev = os.stat(path).st_dev
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Path does not exist: {path}") from None
+        with self._lock:
+            if len(self._devices) >= _MAX_CACHED_PATHS:
+                self._devices = {p: v for p, v in self._devices.items() if now < v[0]}
+            self._devices[path] = (now + self.ttl, dev)
+        return dev
+
+    def _usage_of(self, dev: int, path: str, now: float) -> Dict[str, int]:
+        """Get usage of a filesystem, calling disk_usage only when expired."""
+        with self._lock:
+            cached = self._usage.get(dev)
+        if cached is not None and now < cached[0]:
+            return cached[1]
+        usage = shutil.disk_usage(path)
+        info = {"total": usage.total, "used": usage.used, "free": usage.free}
+        with self._lock:
+            self._usage[dev] = (now + self.ttl, info)
+        return info
+
+
+def snapshot_disk_space(paths: Iterable[Union[str, Path]]) -> Dict[Hashable, Dict[str, int]]:
+    """
+    Get disk space information for many paths with one call per filesystem.
+
+    Args:
+        paths: The paths to check.
+
+    Returns:
+        Dictionary mapping each given path to a dictionary with 'total',
+        'used', and 'free' space in bytes.
+
+    Raises:
+        FileNotFoundError: If a path does not exist.
+        PermissionError: If lacking permission to access a path.
+    """
+    return DiskSpaceCache(ttl=0).snapshot(paths)
+
+
+class SpaceHistory:
+    """
+    Fixed-size ring buffer of free/used samples for one filesystem.
+
+    Samples are stored in flat arrays, so memory is fixed by ``capacity``
+    however long the watch runs. Once full, the oldest sample is overwritten.
+
+    Args:
+        capacity: Number of samples kept.
+
+    Raises:
+        ValueError: If capacity is less than 2.
+    """
+
+    def __init__(self, capacity: int = 60):
+        if capacity < 2:
+            raise ValueError("capacity must be at least 2")
+        self.capacity = capacity
+        self._times = array("d", bytes(8 * capacity))
+        self._free = array("q", bytes(8 * capacity))
+        self._used = array("q", bytes(8 * capacity))
+        self._next = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, timestamp: float, free: int, used: int):
+        """
+        Record a sample.
+
+        Args:
+            timestamp: Sample time in seconds since the epoch.
+            free: Free space in bytes.
+            used: Used space in bytes.
+        """
+        i = self._next
+        self._times[i] = timestamp
+        self._free[i] = free
+        self._used[i] = used
+        self._next = (i + 1) % self.capacity
+        self._count = min(self._count + 1, self.capacity)
+
+    def samples(self) -> List[Tuple[float, int, int]]:
+        """
+        Get the recorded samples.
+
+        Returns:
+            List of tuples (timestamp, free, used), oldest first.
+        """
+        start = (self._next - self._count) % self.capacity
+        order = [(start + k) % self.capacity for k in range(self._count)]
+        return [(self._times[i], self._free[i], self._used[i]) for i in order]
+
+    def fill_rate(self) -> Optional[float]:
+        """
+        Get the rate at which free space is being consumed.
+
+        The rate is the least-squares slope of free space over time, negated,
+        so short spikes between samples do not dominate.
+
+        Returns:
+            Bytes per second (negative while space is being freed), or None
+            with fewer than two samples.
+        """
+        samples = self.samples()
+        if len(samples) < 2:
+            return None
+        t0 = samples[0][0]
+        n = len(samples)
+        mean_t = sum(t - t0 for t, _, _ in samples) / n
+        mean_free = sum(free for _, free, _ in samples) / n
+        var = sum((t - t0 - mean_t) ** 2 for t, _, _ in samples)
+        if var == 0:
+            return None
+        cov = sum((t - t0 - mean_t) * (free - mean_free) for t, free, _ in samples)
+        return -cov / var if cov else 0.0
+
+    def time_to_full(self) -> Optional[float]:
+        """
+        Project how long until the filesystem is full at the current fill rate.
+
+        Returns:
+            Seconds until full, or None when space is not being consumed.
+        """
+        rate = self.fill_rate()
+        if rate is None or rate <= 0:
+            return None
+        latest_free = self._free[(self._next - 1) % self.capacity]
+        return latest_free / rate
+
+
+def _escape_label(value: str) -> str:
+    """Escape a Prometheus label value."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_PROMETHEUS_METRICS = [
+    ("disk_space_up", "1 if the path could be sampled, 0 if the last sample failed.", "up"),
+    ("disk_space_total_bytes", "Size of the filesystem in bytes.", "total"),
+    ("disk_space_used_bytes", "Used space on the filesystem in bytes.", "used"),
+    ("disk_space_free_bytes", "Free space on the filesystem in bytes.", "free"),
+    (
+        "disk_space_fill_rate_bytes_per_second",
+        "Rate at which free space is being consumed.",
+        "fill_rate",
+    ),
+    (
+        "disk_space_time_to_full_seconds",
+        "Projected seconds until the filesystem is full at the current fill rate.",
+        "time_to_full",
+    ),
+]
+
+
+def format_prometheus(records: List[Dict[str, object]]) -> str:
+    """
+    Format watch records in the Prometheus text exposition format.
+
+    Args:
+        records: Records produced by watch_disk_space.
+
+    Returns:
+        Metrics text. Fill rate and time to full are omitted while unknown,
+        and a path whose sample failed only gets disk_space_up 0.
+    """
+    lines = []
+    for name, help_text, key in _PROMETHEUS_METRICS:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        for record in records:
+            value = int("error" not in record) if key == "up" else record.get(key)
+            if value is not None:
+                lines.append(f'{name}{{path="{_escape_label(str(record["path"]))}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _write_textfile(path: Union[str, Path], text: str):
+    """Replace a file atomically so a collector never reads a partial file."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def _sample(cache: DiskSpaceCache, paths: List[str]) -> Dict[str, Union[Dict[str, int], OSError]]:
+    """Sample every path, mapping each to its figures or to the error it raised."""
+    try:
+        return cache.snapshot(paths)
+    except OSError:
+        pass
+    # Something failed: go path by path so the others are still sampled
+    samples: Dict[str, Union[Dict[str, int], OSError]] = {}
+    for path in paths:
+        try:
+            samples[path] = cache.get_disk_space_info(path)
+        except OSError as e:
+            samples[path] = e
+    return samples
+
+
+def watch_disk_space(
+    paths: Iterable[Union[str, Path]],
+    interval: float = 60.0,
+    capacity: int = 60,
+    output_format: str = "ndjson",
+    output: Union[str, Path, None] = None,
+    iterations: Optional[int] = None,
+    stream: TextIO = sys.stdout,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Dict[str, SpaceHistory]:
+    """
+    Sample free/used space periodically and report fill rate and time to full.
+
+    Each tick makes one disk_usage call per filesystem, appends the sample to
+    a per-path SpaceHistory and writes one record per path. Running this as
+    one long-lived process avoids paying interpreter startup per sample. A
+    path that cannot be sampled (unmounted, permission denied) gets a record
+    with an "error" message for that tick and the watch carries on.
+
+    Args:
+        paths: The paths (mount points) to watch.
+        interval: Seconds between samples.
+        capacity: Samples kept per path for the fill-rate estimate.
+        output_format: "ndjson" to append one JSON object per path and tick,
+            or "prometheus" to rewrite a node_exporter textfile each tick.
+        output: File to write to. NDJSON goes to stream when None; the
+            Prometheus format requires a file.
+        iterations: Number of samples to take, or None to run until interrupted.
+        stream: Stream for NDJSON output when no file is given.
+        sleep: Function used to wait between samples.
+
+    Returns:
+        Dictionary mapping each path to its SpaceHistory.
+
+    Raises:
+        ValueError: If the output format is unknown or missing its file.
+    """
+    if output_format not in ("ndjson", "prometheus"):
+        raise ValueError(f"Unknown output format: {output_format}")
+    if output_format == "prometheus" and output is None:
+        raise ValueError("The prometheus format needs an output file")
+
+    paths = [os.fspath(path) for path in paths]
+    histories = {path: SpaceHistory(capacity) for path in paths}
+    cache = DiskSpaceCache(ttl=0)
+    taken = 0
+    while iterations is None or taken < iterations:
+        if taken:
+            sleep(interval)
+        now = time.time()
+        records = []
+        for path, info in _sample(cache, paths).items():
+            if isinstance(info, OSError):
+                records.append({"timestamp": now, "path": path, "error": str(info)})
+                continue
+            history = histories[path]
+            history.append(now, info["free"], info["used"])
+            records.append(
+                {
+                    "timestamp": now,
+                    "path": path,
+                    **info,
+                    "fill_rate": history.fill_rate(),
+                    "time_to_full": history.time_to_full(),
+                }
+            )
+        if output_format == "prometheus":
+            _write_textfile(output, format_prometheus(records))
+        else:
+            text = "".join(json.dumps(record) + "\n" for record in records)
+            if output is None:
+                stream.write(text)
+                stream.flush()
+            else:
+                with open(output, "a", encoding="utf-8") as f:
+                    f.write(text)
+        taken += 1
+    return histories
+
+
+def main():
+    """Watch free space from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Disk space watcher - samples free space and projects time to full"
+    )
+    parser.add_argument("paths", nargs="+", help="Paths (mount points) to watch")
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=60.0,
+        help="Seconds between samples (default: 60)",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=60,
+        help="Samples kept per path for the fill rate (default: 60)",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["ndjson", "prometheus"],
+        default="ndjson",
+        help="Output format (default: ndjson)",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Output file; NDJSON is appended, the Prometheus textfile is replaced",
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="Number of samples to take (default: run until interrupted)",
+    )
+
+    args = parser.parse_args()
+    if args.format == "prometheus" and not args.output:
+        parser.error("--format prometheus requires --output")
+
+    try:
+        watch_disk_space(
+            args.paths,
+            interval=args.interval,
+            capacity=args.samples,
+            output_format=args.format,
+            output=args.output,
+            iterations=args.count,
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
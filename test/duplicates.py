@@ -0,0 +1,191 @@
+"""Module for finding duplicate files below a directory."""
+
+import hashlib
+import mmap
+import os
+import stat
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from disk_scan import scan_tree
+
+# Bytes read from the start of each file for the first comparison
+PARTIAL_SIZE = 64 * 1024
+
+# Files are hashed through mmap in slices this big to bound resident memory
+_HASH_CHUNK = 8 * 1024 * 1024
+
+# Paths sent to a hashing process at a time
+_POOL_CHUNK = 32
+
+
+class DuplicateGroup(NamedTuple):
+    """Files with identical content; paths are sorted and the first is kept."""
+
+    size: int
+    digest: str
+    paths: List[str]
+
+    @property
+    def reclaimable(self) -> int:
+        """Bytes freed by keeping one copy."""
+        return self.size * (len(self.paths) - 1)
+
+
+def hash_file(path: str, limit: Optional[int] = None) -> Optional[str]:
+    """
+    Hash the content of a file, or only its first bytes.
+
+    Args:
+        path: Path of the file.
+        limit: Number of bytes to hash from the start, or None for the whole file.
+
+    Returns:
+        Hex BLAKE2b digest, or None if the file cannot be read.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    try:
+        with open(path, "rb") as f:
+            if limit is not None:
+                digest.update(f.read(limit))
+                return digest.hexdigest()
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return digest.hexdigest()
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for start in range(0, size, _HASH_CHUNK):
+                        digest.update(view[start : start + _HASH_CHUNK])
+                finally:
+                    view.release()
+    except (OSError, ValueError):
+        return None
+    return digest.hexdigest()
+
+
+def _partial_hash(path: str) -> Optional[str]:
+    return hash_file(path, PARTIAL_SIZE)
+
+
+def _group_by_hash(
+    buckets: List[Tuple[int, List[str]]],
+    hasher: Callable[[str], Optional[str]],
+    pool: Optional[ProcessPoolExecutor],
+) -> List[DuplicateGroup]:
+    """Split each bucket of same-size paths by hash, keeping groups of two or more."""
+    paths = [path for _, bucket in buckets for path in bucket]
+    if pool is None:
+        digests = map(hasher, paths)
+    else:
+        digests = pool.map(hasher, paths, chunksize=_POOL_CHUNK)
+
+    groups = []
+    for size, bucket in buckets:
+        by_digest: Dict[str, List[str]] = {}
+        for path, digest in zip(bucket, digests):
+            # Files that vanished or became unreadable drop out here
+            if digest is not None:
+                by_digest.setdefault(digest, []).append(path)
+        groups.extend(
+            DuplicateGroup(size, digest, group)
+            for digest, group in by_digest.items()
+            if len(group) > 1
+        )
+    return groups
+
+
+def find_duplicates(
+    path: Union[str, Path],
+    min_size: int = 1,
+    workers: int = 1,
+    prune: Iterable[str] = (),
+    one_file_system: bool = False,
+) -> List[DuplicateGroup]:
+    """
+    Find files with identical content below a directory.
+
+    Files are bucketed by size during one scan, so a file whose size is unique
+    is never opened. Candidates are then compared by a hash of their first
+    64 KiB and only the survivors are hashed in full. Hardlinks to the same
+    inode count as one file, since removing one frees nothing.
+
+    Args:
+        path: Directory to search.
+        min_size: Smallest file size in bytes to consider (empty files are
+            skipped by default).
+        workers: Number of processes used for hashing; 1 hashes in-process.
+        prune: Wildcards of directories to skip, as for scan_tree.
+        one_file_system: Do not descend into other filesystems.
+
+    Returns:
+        List of DuplicateGroup sorted by reclaimable bytes descending.
+
+    Raises:
+        FileNotFoundError: If the path does not exist.
+        PermissionError: If lacking permission to read the path.
+    """
+    by_size: Dict[int, Dict[Union[Tuple[int, int], str], str]] = {}
+
+    def on_file(entry, st):
+        if stat.S_ISREG(st.st_mode) and st.st_size >= min_size:
+            # One path per inode; the first one seen stands for its hardlinks.
+            # DirEntry.stat() gives st_ino 0 on Windows, so key by path there.
+            key = (st.st_dev, st.st_ino) if st.st_ino else entry.path
+            by_size.setdefault(st.st_size, {}).setdefault(key, entry.path)
+
+    scan_tree(
+        path, on_file=on_file, keep_tree=False, prune=prune, one_file_system=one_file_system
+    )
+
+    candidates = [
+        (size, sorted(inodes.values())) for size, inodes in by_size.items() if len(inodes) > 1
+    ]
+    del by_size
+
+    pool = ProcessPoolExecutor(workers) if workers > 1 and candidates else None
+    try:
+        groups = _group_by_hash(candidates, _partial_hash, pool)
+        # The partial hash already covers small files completely
+        result = [g for g in groups if g.size <= PARTIAL_SIZE]
+        large = [(g.size, g.paths) for g in groups if g.size > PARTIAL_SIZE]
+        result.extend(_group_by_hash(large, hash_file, pool))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    result.sort(key=lambda g: (-g.reclaimable, g.paths[0]))
+    return result
+
+
+def reclaimable_by_folder(
+    groups: Iterable[DuplicateGroup], root: Union[str, Path], depth: int = 1
+) -> List[Tuple[str, int]]:
+    """
+    Add up the bytes freed by removing duplicate copies, per folder.
+
+    The first path of every group is the copy that is kept; each other copy
+    is charged to its ancestor folder at the given depth below root, the same
+    folders that the top folders report ranks. Files directly in root are
+    charged to root.
+
+    Args:
+        groups: Duplicate groups from find_duplicates.
+        root: Directory that was searched.
+        depth: Folder level to charge, 1 for the immediate subfolders.
+
+    Returns:
+        List of tuples (folder_path, reclaimable_bytes) sorted by bytes descending.
+    """
+    root = os.path.abspath(root)
+    totals: Dict[str, int] = {}
+    for group in groups:
+        for path in group.paths[1:]:
+            parts = os.path.relpath(os.path.dirname(path), root).split(os.sep)
+            if parts == ["."]:
+                folder = root
+            else:
+                folder = os.path.join(root, *parts[:depth])
+            totals[folder] = totals.get(folder, 0) + group.size
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
@@ -3,73 +3,278 @@
 
 import argparse
 import os
+import time
 from pathlib import Path
 
 from disk_space import (
-    get_disk_space_free,
-    get_disk_space_info,
+    DiskSpaceCache,
     format_bytes,
-    has_sufficient_space,
 )
+from disk_scan import FileHistograms, TopNTracker, scan_tree, scan_tree_async
+from duplicates import find_duplicates, reclaimable_by_folder
+from size_estimate import estimate_top_folders
+from snapshot import Snapshot, diff_snapshots, print_diff, save_snapshot
+from size_index import SizeIndex
 
 
-def get_folder_size(folder_path):
+def get_folder_size(folder_path, workers=1, disk_usage=False):
     """
     Calculate the total size of a folder and all its contents.
 
     Args:
         folder_path: Path to the folder to measure.
+        workers: Number of threads scanning directories in parallel (default: 1).
+        disk_usage: Count allocated blocks, hardlinked files once (default: False).
 
     Returns:
         Total size in bytes, or 0 if inaccessible.
     """
-    total_size = 0
     try:
-        for dirpath, dirnames, filenames in os.walk(folder_path):
-            for filename in filenames:
-                filepath = os.path.join(dirpath, filename)
-                try:
-                    total_size += os.path.getsize(filepath)
-                except (OSError, PermissionError):
-                    # Skip files we can't access
-                    pass
+        return scan_tree(folder_path, workers=workers, disk_usage=disk_usage).total_size
     except (OSError, PermissionError):
         # Skip folders we can't access
-        pass
-    return total_size
+        return 0
 
 
-def get_top_folders(path, top_n=10):
+async def get_folder_size_async(folder_path, timeout=None, workers=1, disk_usage=False):
+    """
+    Calculate the size of a folder from asyncio code within a time budget.
+
+    Args:
+        folder_path: Path to the folder to measure.
+        timeout: Seconds before partial results are returned (default: no limit).
+        workers: Number of threads scanning directories in parallel (default: 1).
+        disk_usage: Count allocated blocks, hardlinked files once (default: False).
+
+    Returns:
+        Tuple (size_in_bytes, complete). complete is False when the timeout
+        expired and size only counts what was scanned; size is 0 if inaccessible.
+    """
+    try:
+        result = await scan_tree_async(
+            folder_path, timeout, workers=workers, disk_usage=disk_usage, keep_tree=False
+        )
+    except (OSError, PermissionError):
+        return 0, True
+    return result.size, result.complete
+
+
+def get_top_folders(
+    path,
+    top_n=10,
+    depth=1,
+    workers=1,
+    index_path=None,
+    disk_usage=False,
+    export_path=None,
+    export_depth=None,
+    on_file=None,
+    exclude=(),
+    one_file_system=False,
+    snapshot_path=None,
+    compare_path=None,
+):
     """
     Get the top N largest subfolders in a given directory.
 
+    The whole tree is scanned once, so every level is measured in one pass.
+
     Args:
         path: Directory to analyze.
         top_n: Number of top folders to return (default: 10).
+        depth: Depth of the subfolders to rank (default: 1, immediate subfolders).
+        workers: Number of threads scanning directories in parallel (default: 1).
+        index_path: SQLite index file for an incremental scan that only lists
+            directories changed since the previous run (default: None, full scan).
+        disk_usage: Count allocated blocks, hardlinked files once (default: False).
+        export_path: Also write every directory's size to this file, as CSV if
+            it ends in .csv and as nested JSON otherwise (default: None).
+        export_depth: Deepest level to export (default: None, all levels).
+        on_file: Callback called as on_file(entry, stat_result) for every file
+            listed during the scan, e.g. FileHistograms.on_file (default: None).
+        exclude: Wildcard patterns of directory names or paths to skip (default: none).
+        one_file_system: Do not cross into other mounted filesystems (default: False).
+        snapshot_path: Save every directory's size to this snapshot file for
+            a later comparison (default: None).
+        compare_path: Print which folders, at any depth, grew or shrank since
+            this earlier snapshot; it may be the same file as snapshot_path.
+            A snapshot of another directory is neither compared nor
+            overwritten (default: None).
 
     Returns:
         List of tuples (folder_path, size_in_bytes) sorted by size descending.
     """
-    folder_sizes = []
-
     try:
-        # Get all immediate subfolders
-        with os.scandir(path) as entries:
-            for entry in entries:
-                if entry.is_dir(follow_symlinks=False):
-                    try:
-                        size = get_folder_size(entry.path)
-                        folder_sizes.append((entry.path, size))
-                    except (OSError, PermissionError):
-                        # Skip folders we can't access
-                        pass
+        if index_path:
+            with SizeIndex(index_path) as index:
+                tree = scan_tree(
+                    path,
+                    on_file,
+                    workers=workers,
+                    index=index,
+                    prune=exclude,
+                    one_file_system=one_file_system,
+                )
+        else:
+            tree = scan_tree(
+                path,
+                on_file,
+                workers=workers,
+                disk_usage=disk_usage,
+                prune=exclude,
+                one_file_system=one_file_system,
+            )
     except (OSError, PermissionError):
         print(f"Error: Cannot access directory {path}")
         return []
 
-    # Sort by size (descending) and return top N
-    folder_sizes.sort(key=lambda x: x[1], reverse=True)
-    return folder_sizes[:top_n]
+    if export_path:
+        with open(export_path, "w", encoding="utf-8", newline="") as f:
+            if export_path.lower().endswith(".csv"):
+                tree.export_csv(f, export_depth)
+            else:
+                tree.export_json(f, export_depth)
+
+    if compare_path:
+        try:
+            with Snapshot(compare_path) as old:
+                if old.root != tree.root:
+                    print(f"{compare_path} is a snapshot of {old.root}, not {tree.root}; nothing compared.")
+                    if snapshot_path and os.path.abspath(snapshot_path) == os.path.abspath(compare_path):
+                        # Keep the other directory's history rather than replace it
+                        print("Not overwriting it with this scan; save to another file.")
+                        snapshot_path = None
+                    print()
+                else:
+                    print(f"=== Changes since {time.ctime(old.created)} ===\n")
+                    print_diff(diff_snapshots(old, tree.sorted_records(), top_n, 1024**2))
+                    print()
+        except FileNotFoundError:
+            print(f"No earlier snapshot at {compare_path}; nothing to compare yet.\n")
+        except (OSError, ValueError, EOFError):
+            # wrong magic, not gzip, bad header JSON or a truncated file
+            print(f"Error: {compare_path} is not a snapshot file; nothing compared.\n")
+
+    # Saved after comparing, so one file can hold the previous run's sizes
+    if snapshot_path:
+        save_snapshot(tree, snapshot_path)
+
+    return tree.top_folders(top_n, depth)
+
+
+def print_leaderboard(tracker):
+    """Print interim results of a streaming scan."""
+    print(
+        f"[{tracker.elapsed:7.1f}s] {tracker.entries:,} entries "
+        f"({tracker.rate:,.0f}/s), {format_bytes(tracker.bytes_seen)} scanned"
+    )
+    for folder_path, size in tracker.top_folders():
+        print(f"    {format_bytes(size):>12} - {folder_path}")
+    for file_path, size in tracker.top_files()[:3]:
+        print(f"    {format_bytes(size):>12}   {file_path}")
+
+
+def print_estimates(estimator):
+    """Print interim results of a sampling estimate."""
+    state = "exact" if estimator.complete else f"{estimator.listed_count:,} directories listed"
+    print(f"Estimate ({state}):")
+    for estimate in estimator.estimates()[:10]:
+        if estimate.exact:
+            bounds = "exact"
+        elif estimate.low is None:
+            bounds = "too few samples"
+        else:
+            bounds = f"{format_bytes(estimate.low)} .. {format_bytes(estimate.high)}"
+        print(f"    {format_bytes(estimate.size):>12} ({bounds}) - {estimate.path}")
+
+
+def stream_top_folders(
+    path,
+    top_n=10,
+    depth=1,
+    workers=1,
+    interval=5.0,
+    disk_usage=False,
+    on_file=None,
+    exclude=(),
+    one_file_system=False,
+):
+    """
+    Get the top N largest folders and files while printing live progress.
+
+    Only the top N of each are kept in memory, so memory stays flat on trees
+    of any size. Interim leaderboards and the scan rate are printed every
+    interval seconds.
+
+    Args:
+        path: Directory to analyze.
+        top_n: Number of top folders and files to return (default: 10).
+        depth: Depth of the subfolders to rank (default: 1, immediate subfolders).
+        workers: Number of threads scanning directories in parallel (default: 1).
+        interval: Seconds between progress reports (default: 5.0).
+        disk_usage: Count allocated blocks, hardlinked files once (default: False).
+            File sizes are always apparent sizes.
+        on_file: Extra callback called as on_file(entry, stat_result) for every
+            file, e.g. FileHistograms.on_file (default: None).
+        exclude: Wildcard patterns of directory names or paths to skip (default: none).
+        one_file_system: Do not cross into other mounted filesystems (default: False).
+
+    Returns:
+        Tuple of (top folders, top files), each a list of (path, size_in_bytes)
+        sorted by size descending.
+    """
+    tracker = TopNTracker(top_n, depth, print_leaderboard, interval)
+    file_callback = tracker.on_file
+    if on_file is not None:
+
+        def file_callback(entry, st):
+            tracker.on_file(entry, st)
+            on_file(entry, st)
+
+    try:
+        scan_tree(
+            path,
+            on_file=file_callback,
+            on_dir=tracker.on_dir,
+            workers=workers,
+            keep_tree=False,
+            disk_usage=disk_usage,
+            prune=exclude,
+            one_file_system=one_file_system,
+        )
+    except (OSError, PermissionError):
+        print(f"Error: Cannot access directory {path}")
+        return [], []
+
+    return tracker.top_folders(), tracker.top_files()
+
+
+def print_histograms(histograms, top_n=10):
+    """Print the extension and age histograms of a scan."""
+    print(f"\n=== Top {top_n} File Types by Size ===\n")
+    for ext, count, size in histograms.top_extensions(top_n):
+        print(f"{format_bytes(size):>12} {count:>10,} files  {ext}")
+
+    for kind, title in (("mtime", "Last Modified"), ("atime", "Last Accessed")):
+        print(f"\n=== Files by {title} ===\n")
+        for label, count, size in histograms.age_table(kind):
+            print(f"{label:<12} {format_bytes(size):>12} {count:>10,} files")
+
+
+def print_duplicates(path, top_n=10, depth=1, workers=1, exclude=(), one_file_system=False):
+    """Find duplicate files and print how much space each folder would free."""
+    print("\nLooking for duplicate files (only files sharing a size are read)...")
+    groups = find_duplicates(path, workers=workers, prune=exclude, one_file_system=one_file_system)
+    total = sum(group.reclaimable for group in groups)
+    print(f"\n=== Duplicates: {format_bytes(total)} reclaimable in {len(groups):,} groups ===\n")
+    for folder_path, size in reclaimable_by_folder(groups, path, depth)[:top_n]:
+        print(f"{format_bytes(size):>12} - {folder_path}")
+    for group in groups[:top_n]:
+        print(f"\n{format_bytes(group.size)} x {len(group.paths)} copies:")
+        for file_path in group.paths[:5]:
+            print(f"    {file_path}")
+        if len(group.paths) > 5:
+            print(f"    ... and {len(group.paths) - 5} more")
 
 
 def main():
@@ -90,6 +295,99 @@ def main():
         default=10,
         help="Number of top folders to display (default: 10)",
     )
+    parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        default=1,
+        help="Depth of the subfolders to rank (default: 1, immediate subfolders)",
+    )
+    parser.add_argument(
+        "--workers",
+        "-w",
+        type=int,
+        default=1,
+        help="Threads scanning directories in parallel; helps on network shares (default: 1)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only list directories changed since the last incremental run",
+    )
+    parser.add_argument(
+        "--index-file",
+        default=os.path.join(os.path.expanduser("~"), ".disk_scan_index.sqlite"),
+        help="Index used by --incremental (default: ~/.disk_scan_index.sqlite)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Print live leaderboards while scanning and also list the largest files",
+    )
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=5.0,
+        help="Seconds between progress reports in --stream mode (default: 5)",
+    )
+    parser.add_argument(
+        "--disk-usage",
+        action="store_true",
+        help="Measure allocated size like du, counting hardlinked files once",
+    )
+    parser.add_argument(
+        "--export",
+        help="Write the size of every scanned folder to a .csv or .json file",
+    )
+    parser.add_argument(
+        "--export-depth",
+        type=int,
+        help="Deepest folder level written by --export (default: all)",
+    )
+    parser.add_argument(
+        "--histograms",
+        action="store_true",
+        help="Also show space by file type and by file age, from the same scan",
+    )
+    parser.add_argument(
+        "--exclude",
+        "-e",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Skip directories whose name (or full path, if the pattern has a /) "
+        "matches this wildcard; repeatable, e.g. -e node_modules -e /proc",
+    )
+    parser.add_argument(
+        "--one-file-system",
+        "-x",
+        action="store_true",
+        help="Stay on the filesystem of --path; skip mount points below it",
+    )
+    parser.add_argument(
+        "--save-snapshot",
+        metavar="FILE",
+        help="Save every folder's size to FILE for a later --compare",
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="Show which folders at any depth grew or shrank since the snapshot "
+        "in FILE (use the same FILE as --save-snapshot to compare run to run)",
+    )
+    parser.add_argument(
+        "--duplicates",
+        action="store_true",
+        help="Also report duplicate files and reclaimable bytes per folder "
+        "(hashing uses --workers processes)",
+    )
+    parser.add_argument(
+        "--estimate",
+        type=float,
+        metavar="SECONDS",
+        help="Estimate immediate subfolder sizes by sampling for at most this "
+        "many seconds instead of a full scan; shows confidence bounds every --interval",
+    )
     parser.add_argument(
         "--no-details",
         action="store_true",
@@ -97,13 +395,37 @@ def main():
     )
 
     args = parser.parse_args()
+    if args.disk_usage and args.incremental:
+        parser.error("--disk-usage cannot be combined with --incremental")
+    if args.histograms and args.incremental:
+        parser.error("--histograms needs every file and cannot be combined with --incremental")
+    if args.export and args.stream:
+        parser.error("--export needs the full tree and cannot be combined with --stream")
+    if (args.save_snapshot or args.compare) and args.stream:
+        parser.error("snapshots need the full tree and cannot be combined with --stream")
+    if args.estimate is not None:
+        for flag, used in [
+            ("--stream", args.stream),
+            ("--incremental", args.incremental),
+            ("--disk-usage", args.disk_usage),
+            ("--export", args.export),
+            ("--save-snapshot", args.save_snapshot),
+            ("--compare", args.compare),
+            ("--histograms", args.histograms),
+            ("--exclude", args.exclude),
+            ("--one-file-system", args.one_file_system),
+            ("--depth", args.depth != 1),
+        ]:
+            if used:
+                parser.error(f"--estimate cannot be combined with {flag}")
     path = os.path.abspath(args.path)
 
     if not args.no_details:
         print("=== Disk Space Information ===\n")
 
-        # Get complete disk info
-        info = get_disk_space_info(path)
+        # One disk_usage call serves the info and every availability check
+        space = DiskSpaceCache()
+        info = space.get_disk_space_info(path)
 
         print(f"Path: {path}")
         print(f"Total space: {format_bytes(info['total'])}")
@@ -128,7 +450,7 @@ def main():
         ]
 
         for size_bytes, size_name in test_sizes:
-            has_space = has_sufficient_space(path, size_bytes)
+            has_space = space.has_sufficient_space(path, size_bytes)
             status = "✓" if has_space else "✗"
             print(f"{status} Sufficient space for {size_name}: {has_space}")
 
@@ -136,7 +458,51 @@ def main():
     print(f"\n=== Top {args.top} Largest Subfolders in {path} ===\n")
     print("Analyzing folders (this may take a moment)...\n")
 
-    top_folders = get_top_folders(path, args.top)
+    top_files = []
+    histograms = FileHistograms() if args.histograms else None
+    on_file = histograms.on_file if histograms else None
+    if args.estimate is not None:
+        try:
+            top_folders = estimate_top_folders(
+                path,
+                args.top,
+                args.estimate,
+                args.interval,
+                print_estimates,
+            )
+        except (OSError, PermissionError):
+            print(f"Error: Cannot access directory {path}")
+            top_folders = []
+        else:
+            print("\nSizes below are sampled estimates; see the bounds above.\n")
+    elif args.stream:
+        top_folders, top_files = stream_top_folders(
+            path,
+            args.top,
+            args.depth,
+            args.workers,
+            args.interval,
+            args.disk_usage,
+            on_file,
+            args.exclude,
+            args.one_file_system,
+        )
+    else:
+        top_folders = get_top_folders(
+            path,
+            args.top,
+            args.depth,
+            args.workers,
+            args.index_file if args.incremental else None,
+            args.disk_usage,
+            args.export,
+            args.export_depth,
+            on_file,
+            args.exclude,
+            args.one_file_system,
+            args.save_snapshot,
+            args.compare,
+        )
 
     if not top_folders:
         print("No accessible subfolders found or unable to access directory.")
@@ -150,6 +516,22 @@ def main():
         total_top_size = sum(size for _, size in top_folders)
         print(f"\nTotal size of top {len(top_folders)} folders: {format_bytes(total_top_size)}")
 
+    if top_files:
+        print(f"\n=== Top {len(top_files)} Largest Files ===\n")
+        for idx, (file_path, size) in enumerate(top_files, 1):
+            print(f"{idx:2}. {format_bytes(size):>12} - {file_path}")
+
+    if histograms:
+        print_histograms(histograms, args.top)
+
+    if args.duplicates:
+        try:
+            print_duplicates(
+                path, args.top, args.depth, args.workers, args.exclude, args.one_file_system
+            )
+        except (OSError, PermissionError):
+            print(f"Error: Cannot access directory {path}")
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,256 @@
+"""Module for estimating folder sizes by sampling instead of a full scan."""
+
+import math
+import os
+import random
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+
+class FolderEstimate(NamedTuple):
+    """Estimated size of one folder with its confidence interval."""
+
+    path: str
+    size: int
+    low: Optional[int]
+    high: Optional[int]
+    exact: bool
+    probes: int
+
+
+class _SampledDir:
+    """A listed directory whose subtree is not yet fully measured."""
+
+    __slots__ = ("own", "pending", "done")
+
+    def __init__(self, own: int, subdirs: List[str]):
+        # Bytes in files directly inside the directory
+        self.own = own
+        # Subdirectories whose size is not known exactly yet
+        self.pending = subdirs
+        # Total size of the subdirectories already measured exactly
+        self.done = 0
+
+
+class _Stats:
+    """Running mean and variance of the probes of one folder (Welford)."""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+
+    def stderr(self) -> Optional[float]:
+        if self.n < 2:
+            return None
+        return math.sqrt(self.m2 / (self.n - 1) / self.n)
+
+
+def _list(path: str) -> Tuple[int, List[str]]:
+    """Get the bytes of the files directly in a directory and its subdirectories."""
+    own = 0
+    subdirs = []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    else:
+                        own += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    pass
+    except OSError:
+        pass
+    return own, subdirs
+
+
+class SizeEstimator:
+    """
+    Estimate the sizes of the immediate subfolders of a directory by sampling.
+
+    Each probe walks one random path from a subfolder down to a leaf and
+    multiplies the bytes found at every level by the number of unmeasured
+    subdirectories it chose from (Knuth's tree-size estimator). The mean of
+    the probes is an unbiased estimate of the subtree size, and their spread
+    gives a confidence interval.
+
+    Listings are cached, and a subtree becomes exact once every directory in
+    it has been visited; its real size then replaces sampling. The longer
+    refine runs, the tighter the bounds, until the estimate equals the exact
+    scan.
+
+    Args:
+        path: Directory whose subfolders are estimated.
+        seed: Seed for the random choices, for reproducible estimates.
+        z: Width of the interval in standard errors (1.96 is about 95%).
+
+    Raises:
+        FileNotFoundError: If the path does not exist.
+        PermissionError: If lacking permission to list the path.
+    """
+
+    def __init__(self, path: Union[str, Path], seed: Optional[int] = None, z: float = 1.96):
+        self.root = os.path.abspath(path)
+        self.z = z
+        self._rng = random.Random(seed)
+        self._exact: Dict[str, int] = {}
+        self._dirs: Dict[str, _SampledDir] = {}
+        self._stats: Dict[str, _Stats] = {}
+        self.listed_count = 0
+
+        # The root is listed with errors raised, like an exact scan
+        with os.scandir(self.root) as entries:
+            self._folders = [e.path for e in entries if e.is_dir(follow_symlinks=False)]
+        for folder in self._folders:
+            self._stats[folder] = _Stats()
+
+    @property
+    def complete(self) -> bool:
+        """True once every subfolder has been measured exactly."""
+        return all(folder in self._exact for folder in self._folders)
+
+    def refine(self, seconds: float, max_probes: Optional[int] = None) -> int:
+        """
+        Probe the subfolders round-robin until time runs out or all are exact.
+
+        Args:
+            seconds: Time budget for this call.
+            max_probes: Optional limit on the number of probes.
+
+        Returns:
+            Number of probes made.
+        """
+        deadline = time.monotonic() + seconds
+        probes = 0
+        while not self.complete:
+            for folder in self._folders:
+                if folder in self._exact:
+                    continue
+                self._stats[folder].add(self._probe(folder))
+                probes += 1
+                if time.monotonic() >= deadline or probes == max_probes:
+                    return probes
+        return probes
+
+    def estimates(self) -> List[FolderEstimate]:
+        """
+        Get the current estimate of every subfolder.
+
+        Returns:
+            List of FolderEstimate sorted by estimated size descending. low
+            and high are None until a folder has had two probes.
+        """
+        result = []
+        for folder in self._folders:
+            stats = self._stats[folder]
+            if folder in self._exact:
+                size = self._exact[folder]
+                result.append(FolderEstimate(folder, size, size, size, True, stats.n))
+                continue
+            sampled = self._dirs.get(folder)
+            known = sampled.own + sampled.done if sampled else 0
+            size = max(known, round(stats.mean))
+            stderr = stats.stderr()
+            if stderr is None:
+                result.append(FolderEstimate(folder, size, None, None, False, stats.n))
+            else:
+                low = max(known, round(stats.mean - self.z * stderr))
+                high = max(low, round(stats.mean + self.z * stderr))
+                result.append(FolderEstimate(folder, size, low, high, False, stats.n))
+        result.sort(key=lambda e: e.size, reverse=True)
+        return result
+
+    def top_folders(self, top_n: int = 10) -> List[Tuple[str, int]]:
+        """
+        Get the largest subfolders by current estimate.
+
+        Args:
+            top_n: Number of folders to return.
+
+        Returns:
+            List of tuples (folder_path, estimated_size_in_bytes) sorted by
+            size descending, the same format as the exact scan.
+        """
+        return [(e.path, e.size) for e in self.estimates()[:top_n]]
+
+    def _probe(self, folder: str) -> int:
+        """Walk one random path below folder and return its size estimate."""
+        chain = []
+        factor = 1
+        total = 0
+        path = folder
+        while path not in self._exact:
+            sampled = self._dirs.get(path)
+            if sampled is None:
+                sampled = self._dirs[path] = _SampledDir(*_list(path))
+                self.listed_count += 1
+            chain.append((path, sampled))
+            total += factor * (sampled.own + sampled.done)
+            if not sampled.pending:
+                break
+            factor *= len(sampled.pending)
+            path = self._rng.choice(sampled.pending)
+        else:
+            total += factor * self._exact[path]
+
+        # Directories whose last unmeasured child just became exact are exact too
+        child = None
+        for path, sampled in reversed(chain):
+            if child is not None:
+                sampled.pending.remove(child)
+                sampled.done += self._exact[child]
+            if sampled.pending:
+                break
+            self._exact[path] = sampled.own + sampled.done
+            del self._dirs[path]
+            child = path
+        return total
+
+
+def estimate_top_folders(
+    path: Union[str, Path],
+    top_n: int = 10,
+    seconds: float = 10.0,
+    interval: float = 1.0,
+    progress: Optional[Callable[[SizeEstimator], None]] = None,
+    seed: Optional[int] = None,
+) -> List[Tuple[str, int]]:
+    """
+    Estimate the top N largest subfolders within a time budget.
+
+    Args:
+        path: Directory to analyze.
+        top_n: Number of top folders to return.
+        seconds: Total time budget; the estimate stops early once exact.
+        interval: Seconds between calls to progress.
+        progress: Optional callback called with the estimator after each interval.
+        seed: Seed for reproducible sampling.
+
+    Returns:
+        List of tuples (folder_path, estimated_size_in_bytes) sorted by size
+        descending.
+
+    Raises:
+        FileNotFoundError: If the path does not exist.
+        PermissionError: If lacking permission to list the path.
+    """
+    estimator = SizeEstimator(path, seed)
+    deadline = time.monotonic() + seconds
+    while not estimator.complete:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        estimator.refine(min(interval, remaining))
+        if progress is not None:
+            progress(estimator)
+    return estimator.top_folders(top_n)
@@ -0,0 +1,191 @@
+"""Module for persisting per-directory sizes between disk scans."""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Union
+
+# Rows are written in batches to keep the cost per directory low
+_BATCH_SIZE = 5000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS dirs (
+    path BLOB PRIMARY KEY,
+    ino INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_bytes INTEGER NOT NULL,
+    file_count INTEGER NOT NULL,
+    subdirs BLOB NOT NULL,
+    total INTEGER
+)
+"""
+
+
+class IndexedDir(NamedTuple):
+    """Cached listing of one directory."""
+
+    ino: int
+    mtime_ns: int
+    file_bytes: int
+    file_count: int
+    subdirs: List[str]
+
+
+def _encode(path: str) -> bytes:
+    return os.fsencode(path)
+
+
+class SizeIndex:
+    """
+    SQLite index of per-directory sizes keyed by path, inode and mtime.
+
+    Each row holds the bytes and number of files directly inside a directory
+    plus the names of its subdirectories, which is everything needed to skip
+    listing the directory again while its inode and mtime are unchanged.
+    The cumulative size from the last scan is kept alongside for reporting.
+
+    The index is safe to share between scan worker threads.
+    """
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = str(db_path)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.execute(_SCHEMA)
+        self._lock = threading.Lock()
+        self._rows: List[tuple] = []
+        self._totals: List[tuple] = []
+
+    def __enter__(self) -> "SizeIndex":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def lookup(self, path: str) -> Optional[IndexedDir]:
+        """
+        Get the cached listing of a directory.
+
+        Args:
+            path: Path of the directory.
+
+        Returns:
+            IndexedDir, or None if the directory is not in the index.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT ino, mtime_ns, file_bytes, file_count, subdirs FROM dirs WHERE path = ?",
+                (_encode(path),),
+            ).fetchone()
+        if row is None:
+            return None
+        ino, mtime_ns, file_bytes, file_count, subdirs = row
+        names = [os.fsdecode(name) for name in subdirs.split(b"\0")] if subdirs else []
+        return IndexedDir(ino, mtime_ns, file_bytes, file_count, names)
+
+    def store(
+        self,
+        path: str,
+        st: os.stat_result,
+        file_bytes: int,
+        file_count: int,
+        subdirs: List[str],
+    ):
+        """
+        Record a fresh listing of a directory.
+
+        Args:
+            path: Path of the directory.
+            st: Stat result of the directory taken before it was listed.
+            file_bytes: Bytes in the files directly inside the directory.
+            file_count: Number of files directly inside the directory.
+            subdirs: Names of the subdirectories.
+        """
+        row = (
+            _encode(path),
+            st.st_ino,
+            st.st_mtime_ns,
+            file_bytes,
+            file_count,
+            b"\0".join(_encode(name) for name in subdirs),
+        )
+        with self._lock:
+            self._rows.append(row)
+            if len(self._rows) >= _BATCH_SIZE:
+                self._flush()
+
+    def store_total(self, path: str, total: int):
+        """
+        Record the cumulative size of a directory from the current scan.
+
+        Args:
+            path: Path of the directory.
+            total: Size in bytes of the whole subtree.
+        """
+        with self._lock:
+            self._totals.append((total, _encode(path)))
+            if len(self._totals) >= _BATCH_SIZE:
+                self._flush()
+
+    def forget(self, path: str):
+        """
+        Remove a directory and everything below it from the index.
+
+        Args:
+            path: Path of a directory that no longer exists.
+        """
+        path = _encode(path)
+        # Everything below path sorts between "path/" and "path0"
+        prefix = path + os.sep.encode()
+        upper = prefix[:-1] + bytes([prefix[-1] + 1])
+        with self._lock:
+            self._flush()
+            with self._conn:
+                self._conn.execute(
+                    "DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                    (path, prefix, upper),
+                )
+
+    def total_of(self, path: Union[str, Path]) -> Optional[int]:
+        """
+        Get the cumulative size recorded for a directory by the last scan.
+
+        Args:
+            path: Path of the directory.
+
+        Returns:
+            Size in bytes, or None if the directory is not in the index.
+        """
+        with self._lock:
+            self._flush()
+            row = self._conn.execute(
+                "SELECT total FROM dirs WHERE path = ?", (_encode(os.path.abspath(path)),)
+            ).fetchone()
+        return row[0] if row else None
+
+    def flush(self):
+        """Write pending rows to the database."""
+        with self._lock:
+            self._flush()
+
+    def close(self):
+        """Write pending rows and close the database."""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.close()
+            self._conn = None
+
+    def _flush(self):
+        """Write batched changes in one transaction. Caller holds the lock."""
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO dirs"
+                " (path, ino, mtime_ns, file_bytes, file_count, subdirs)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                self._rows,
+            )
+            self._conn.executemany("UPDATE dirs SET total = ? WHERE path = ?", self._totals)
+        self._rows = []
+        self._totals = []
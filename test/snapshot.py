@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""Module for saving per-directory sizes and diffing two scans."""
+
+import argparse
+import gzip
+import heapq
+import json
+import math
+import os
+import struct
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from disk_scan import FolderTree
+from disk_space import format_bytes
+
+_MAGIC = b"BBBSNAP1\n"
+
+# Each record is the size, the key length, then the key itself
+_RECORD = struct.Struct("<qI")
+
+
+def save_snapshot(tree: FolderTree, path: Union[str, Path]):
+    """
+    Write the size of every directory in a scanned tree to a snapshot file.
+
+    The file is gzip-compressed: a magic line, a JSON header line, then one
+    binary record per directory sorted by path so that two snapshots can be
+    diffed in a single merge pass. The file is replaced atomically, so a
+    snapshot can be compared against and then overwritten in the same run.
+
+    Args:
+        tree: Tree from scan_tree (kept with keep_tree=True).
+        path: Snapshot file to write.
+    """
+    header = {
+        "root": tree.root,
+        "created": time.time(),
+        "dirs": len(tree),
+        "total": tree.total_size,
+        "complete": tree.complete,
+    }
+    temp = f"{path}.tmp"
+    with gzip.open(temp, "wb", compresslevel=6) as f:
+        f.write(_MAGIC)
+        f.write(json.dumps(header).encode() + b"\n")
+        for key, size in tree.sorted_records():
+            f.write(_RECORD.pack(size, len(key)))
+            f.write(key)
+    os.replace(temp, path)
+
+
+class Snapshot:
+    """
+    Snapshot file opened for streaming, in the sorted order it was written.
+
+    Attributes:
+        root: Path of the directory that was scanned.
+        created: Unix time the snapshot was written.
+        total: Total size of the tree in bytes.
+        dirs: Number of directories recorded.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        self._file: BinaryIO = gzip.open(self.path, "rb")
+        if self._file.readline() != _MAGIC:
+            self._file.close()
+            raise ValueError(f"{self.path} is not a disk snapshot")
+        header = json.loads(self._file.readline())
+        self.root = header["root"]
+        self.created = header["created"]
+        self.total = header["total"]
+        self.dirs = header["dirs"]
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self) -> Iterator[Tuple[bytes, int]]:
+        """Yield (key, size) records in ascending key order."""
+        read = self._file.read
+        while True:
+            fixed = read(_RECORD.size)
+            if not fixed:
+                return
+            size, length = _RECORD.unpack(fixed)
+            yield read(length), size
+
+    def close(self):
+        """Close the underlying file."""
+        self._file.close()
+
+
+def key_to_path(key: bytes) -> str:
+    """
+    Turn a snapshot key into a path relative to the scanned root.
+
+    Args:
+        key: Record key (encoded names joined by NUL bytes).
+
+    Returns:
+        Relative path, or "." for the root itself.
+    """
+    if not key:
+        return os.curdir
+    return os.path.join(*(os.fsdecode(name) for name in key.split(b"\0")))
+
+
+class FolderChange(NamedTuple):
+    """Size of one directory in the old and new snapshot."""
+
+    path: str
+    old: int
+    new: int
+
+    @property
+    def change(self) -> int:
+        """Difference in bytes (negative when the folder shrank)."""
+        return self.new - self.old
+
+    @property
+    def ratio(self) -> float:
+        """Change relative to the old size (inf for new folders)."""
+        if self.old == 0:
+            return math.inf if self.new else 0.0
+        return (self.new - self.old) / self.old
+
+
+class SnapshotDiff(NamedTuple):
+    """Top changes between two snapshots."""
+
+    grown: List[FolderChange]
+    shrunk: List[FolderChange]
+    grown_relative: List[FolderChange]
+    shrunk_relative: List[FolderChange]
+    added: int
+    removed: int
+    total_change: int
+
+
+class _Top:
+    """Bounded min-heap keeping the items with the largest scores."""
+
+    def __init__(self, size: int):
+        self.size = size
+        # Keys are unique, so ties on score never fall through to the item
+        self._heap: List[Tuple[float, bytes, FolderChange]] = []
+
+    def push(self, score: float, key: bytes, item: FolderChange):
+        if len(self._heap) < self.size:
+            heapq.heappush(self._heap, (score, key, item))
+        elif (score, key) > self._heap[0][:2]:
+            heapq.heapreplace(self._heap, (score, key, item))
+
+    def items(self) -> List[FolderChange]:
+        # Largest first; on equal scores a parent is listed before its children
+        return [item for _, _, item in sorted(self._heap, key=lambda e: (-e[0], e[1]))]
+
+
+def _merge(
+    old: Iterable[Tuple[bytes, int]], new: Iterable[Tuple[bytes, int]]
+) -> Iterator[Tuple[bytes, Optional[int], Optional[int]]]:
+    """Walk two key-sorted record streams together, yielding (key, old, new)."""
+    old, new = iter(old), iter(new)
+    a = next(old, None)
+    b = next(new, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            yield a[0], a[1], None
+            a = next(old, None)
+        elif a is None or b[0] < a[0]:
+            yield b[0], None, b[1]
+            b = next(new, None)
+        else:
+            yield a[0], a[1], b[1]
+            a = next(old, None)
+            b = next(new, None)
+
+
+def diff_snapshots(
+    old: Iterable[Tuple[bytes, int]],
+    new: Iterable[Tuple[bytes, int]],
+    top_n: int = 10,
+    min_size: int = 0,
+    max_depth: Optional[int] = None,
+) -> SnapshotDiff:
+    """
+    Compare two sorted streams of directory sizes and rank the changes.
+
+    Both inputs are (key, size) records in ascending key order, such as a
+    Snapshot or FolderTree.sorted_records(). They are merged in one pass and
+    only the top_n entries of each ranking are kept, so memory does not grow
+    with the size of the trees. Folders that exist in only one snapshot count
+    as size 0 in the other.
+
+    Args:
+        old: Records of the earlier scan.
+        new: Records of the later scan.
+        top_n: Number of folders in each ranking.
+        min_size: Folders smaller than this in both scans are left out of the
+            relative rankings, where a few bytes would otherwise dominate.
+        max_depth: Only rank folders down to this depth below the root.
+
+    Returns:
+        SnapshotDiff with the largest absolute and relative growers and
+        shrinkers, counts of added and removed folders and the change of
+        the root.
+    """
+    grown, shrunk = _Top(top_n), _Top(top_n)
+    grown_relative, shrunk_relative = _Top(top_n), _Top(top_n)
+    added = removed = total_change = 0
+
+    for key, old_size, new_size in _merge(old, new):
+        if old_size is None:
+            added += 1
+        if new_size is None:
+            removed += 1
+        old_size, new_size = old_size or 0, new_size or 0
+        change = new_size - old_size
+        if not key:
+            total_change = change
+            continue
+        if not change or (max_depth is not None and key.count(b"\0") >= max_depth):
+            continue
+        item = FolderChange(key_to_path(key), old_size, new_size)
+        if change > 0:
+            grown.push(change, key, item)
+        else:
+            shrunk.push(-change, key, item)
+        if max(item.old, item.new) >= min_size:
+            if change > 0:
+                grown_relative.push(item.ratio, key, item)
+            else:
+                shrunk_relative.push(-item.ratio, key, item)
+
+    return SnapshotDiff(
+        grown.items(),
+        shrunk.items(),
+        grown_relative.items(),
+        shrunk_relative.items(),
+        added,
+        removed,
+        total_change,
+    )
+
+
+def _format_change(item: FolderChange) -> str:
+    sign = "+" if item.change > 0 else "-"
+    ratio = "new" if item.ratio == math.inf else f"{item.ratio:+.0%}"
+    return (
+        f"{sign + format_bytes(abs(item.change)):>12} {ratio:>7}  "
+        f"{format_bytes(item.old)} -> {format_bytes(item.new)}  {item.path}"
+    )
+
+
+def print_diff(diff: SnapshotDiff):
+    """Print the rankings of a snapshot diff."""
+    sign = "+" if diff.total_change >= 0 else "-"
+    print(
+        f"Total change: {sign}{format_bytes(abs(diff.total_change))}, "
+        f"{diff.added:,} folders added, {diff.removed:,} removed"
+    )
+    sections: Dict[str, List[FolderChange]] = {
+        "Grew the most": diff.grown,
+        "Shrank the most": diff.shrunk,
+        "Grew the most (relative)": diff.grown_relative,
+        "Shrank the most (relative)": diff.shrunk_relative,
+    }
+    for title, items in sections.items():
+        if items:
+            print(f"\n=== {title} ===\n")
+            for item in items:
+                print(_format_change(item))
+
+
+def main():
+    """Diff two snapshot files from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Snapshot diff - shows which folders grew or shrank between two scans"
+    )
+    parser.add_argument("old", help="Earlier snapshot file")
+    parser.add_argument("new", help="Later snapshot file")
+    parser.add_argument(
+        "--top",
+        "-t",
+        type=int,
+        default=10,
+        help="Number of folders in each ranking (default: 10)",
+    )
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=1024**2,
+        help="Smallest folder, in bytes, ranked by relative change (default: 1 MiB)",
+    )
+    parser.add_argument(
+        "--depth",
+        "-d",
+        type=int,
+        help="Deepest folder level to rank (default: all)",
+    )
+
+    args = parser.parse_args()
+    with Snapshot(args.old) as old, Snapshot(args.new) as new:
+        print(f"Comparing {old.root} ({time.ctime(old.created)})")
+        print(f"     with {new.root} ({time.ctime(new.created)})\n")
+        print_diff(diff_snapshots(old, new, args.top, args.min_size, args.depth))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Tests for bench_disk_scan helpers."""
+
+import os
+
+import pytest
+
+from bench_disk_scan import SHAPES, count_calls, generate_tree, measure, remove_tree
+from disk_scan import scan_tree
+
+
+class TestGenerateTree:
+    """Tests for generate_tree function."""
+
+    @pytest.mark.parametrize("shape", SHAPES)
+    def test_same_seed_gives_same_tree(self, tmp_path, shape):
+        """Test that trees are reproducible for every shape."""
+        first = generate_tree(str(tmp_path / "one"), shape, files=200, seed=3)
+        second = generate_tree(str(tmp_path / "two"), shape, files=200, seed=3)
+
+        try:
+            a = scan_tree(first)
+            b = scan_tree(second)
+            assert a.total_size == b.total_size
+            assert a.file_count == b.file_count > 0
+        finally:
+            remove_tree(first)
+            remove_tree(second)
+
+    def test_hardlinks_share_inodes(self, tmp_path):
+        """Test that the hardlinks shape links every file three times."""
+        root = generate_tree(str(tmp_path / "t"), "hardlinks", files=30)
+
+        st = os.stat(os.path.join(root, "data", "f00000.dat"))
+
+        assert st.st_nlink == 3
+
+    def test_rejects_unknown_shape(self, tmp_path):
+        """Test that an unknown shape raises ValueError."""
+        with pytest.raises(ValueError, match="Unknown shape"):
+            generate_tree(str(tmp_path), "round")
+
+
+class TestMeasurement:
+    """Tests for call counting and measure."""
+
+    def test_counts_listings_and_stats(self, tmp_path):
+        """Test that the engine makes one listing per directory and one stat per file."""
+        root = generate_tree(str(tmp_path / "t"), "wide", files=50)
+
+        with count_calls() as counts:
+            tree = scan_tree(root)
+
+        assert counts["scandir"] == tree.dir_count
+        assert counts["stat"] == tree.file_count
+
+    def test_restores_os_functions(self):
+        """Test that patched functions are restored."""
+        real = os.scandir
+
+        with count_calls():
+            pass
+
+        assert os.scandir is real
+
+    def test_measure_reports_totals(self, tmp_path):
+        """Test that legacy and single-pass strategies agree on bytes."""
+        root = generate_tree(str(tmp_path / "t"), "skewed", files=100)
+
+        legacy = measure("legacy", root, workers=1, repeat=1)
+        single = measure("single", root, workers=1, repeat=1)
+
+        assert legacy["bytes"] == single["bytes"]
+        assert single["scandir_calls"] == scan_tree(root).dir_count
@@ -0,0 +1,742 @@
+"""Tests for disk_scan module."""
+
+import asyncio
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from disk_scan import (
+    FileHistograms,
+    InodeSet,
+    PruneRules,
+    TopNTracker,
+    scan_tree,
+    scan_tree_async,
+)
+from size_index import SizeIndex
+
+
+def make_tree(root):
+    """Create a small tree with known sizes under root."""
+    (root / "a" / "deep").mkdir(parents=True)
+    (root / "b").mkdir()
+    (root / "empty").mkdir()
+    (root / "top.bin").write_bytes(b"x" * 5)
+    (root / "a" / "one.bin").write_bytes(b"x" * 100)
+    (root / "a" / "deep" / "two.bin").write_bytes(b"x" * 1000)
+    (root / "b" / "three.bin").write_bytes(b"x" * 10)
+    return root
+
+
+def walk_size(path):
+    """Reference size computed with os.walk and lstat."""
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.lstat(os.path.join(dirpath, filename)).st_size
+    return total
+
+
+class TestScanTree:
+    """Tests for scan_tree function."""
+
+    def test_total_size_matches_walk(self, tmp_path):
+        """Test that the root total equals a reference os.walk sum."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path)
+
+        assert tree.total_size == walk_size(tmp_path) == 1115
+
+    def test_rolls_up_every_level(self, tmp_path):
+        """Test that every directory gets its cumulative size."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path)
+
+        assert tree.size_of(tmp_path / "a") == 1100
+        assert tree.size_of(tmp_path / "a" / "deep") == 1000
+        assert tree.size_of(tmp_path / "b") == 10
+        assert tree.size_of(tmp_path / "empty") == 0
+
+    def test_counts_files_and_dirs(self, tmp_path):
+        """Test file and directory counters."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path)
+
+        assert tree.file_count == 4
+        assert tree.dir_count == 5
+        assert tree.error_count == 0
+
+    def test_parent_index_precedes_child(self, tmp_path):
+        """Test that directories are stored parent-first."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path)
+
+        assert tree.parents[0] == -1
+        assert all(tree.parents[i] < i for i in range(1, len(tree)))
+
+    def test_stats_each_file_once(self, tmp_path):
+        """Test that the file callback sees each file exactly once."""
+        make_tree(tmp_path)
+        seen = []
+
+        scan_tree(tmp_path, on_file=lambda entry, st: seen.append(entry.name))
+
+        assert sorted(seen) == ["one.bin", "three.bin", "top.bin", "two.bin"]
+
+    def test_dir_callback_runs_after_children(self, tmp_path):
+        """Test that directories complete bottom-up with final sizes."""
+        make_tree(tmp_path)
+        done = []
+
+        scan_tree(tmp_path, on_dir=lambda path, size, depth: done.append((path, size)))
+
+        order = [path for path, _ in done]
+        assert order.index(str(tmp_path / "a" / "deep")) < order.index(str(tmp_path / "a"))
+        assert done[-1] == (str(tmp_path), 1115)
+
+    def test_does_not_follow_directory_symlinks(self, tmp_path):
+        """Test that symlinked directories are not descended into."""
+        make_tree(tmp_path)
+        (tmp_path / "link").symlink_to(tmp_path / "a", target_is_directory=True)
+
+        tree = scan_tree(tmp_path)
+
+        assert tree.size_of(tmp_path / "a") == 1100
+        assert tree.total_size < 1115 + 1100
+
+    def test_raises_error_for_nonexistent_path(self, tmp_path):
+        """Test that FileNotFoundError is raised for a missing root."""
+        with pytest.raises(FileNotFoundError):
+            scan_tree(tmp_path / "missing")
+
+
+class TestParallelScan:
+    """Tests for scan_tree with several workers."""
+
+    def make_skewed_tree(self, root):
+        """Create a tree where one subfolder holds almost everything."""
+        for i in range(30):
+            deep = root / "big" / f"d{i}" / "x" / "y"
+            deep.mkdir(parents=True)
+            for j in range(5):
+                (deep / f"f{j}").write_bytes(b"x" * (i + j))
+        (root / "small").mkdir()
+        (root / "small" / "f").write_bytes(b"x" * 3)
+        return root
+
+    def test_totals_match_serial(self, tmp_path):
+        """Test that every directory size matches the serial scan."""
+        self.make_skewed_tree(tmp_path)
+
+        serial = scan_tree(tmp_path)
+        parallel = scan_tree(tmp_path, workers=4)
+
+        assert parallel.total_size == serial.total_size
+        assert sorted(
+            (parallel.path_of(i), parallel.sizes[i]) for i in range(len(parallel))
+        ) == sorted((serial.path_of(i), serial.sizes[i]) for i in range(len(serial)))
+        assert parallel.file_count == serial.file_count
+        assert parallel.dir_count == serial.dir_count
+
+    def test_callbacks_see_every_entry(self, tmp_path):
+        """Test that callbacks fire once per file and directory."""
+        self.make_skewed_tree(tmp_path)
+        files = []
+        dirs = []
+
+        tree = scan_tree(
+            tmp_path,
+            on_file=lambda entry, st: files.append(entry.path),
+            on_dir=lambda path, size, depth: dirs.append(path),
+            workers=4,
+        )
+
+        assert len(set(files)) == len(files) == tree.file_count
+        assert len(set(dirs)) == len(dirs) == tree.dir_count
+        assert dirs[-1] == str(tmp_path)
+
+    def test_raises_error_for_nonexistent_path(self, tmp_path):
+        """Test that a missing root raises in the caller."""
+        with pytest.raises(FileNotFoundError):
+            scan_tree(tmp_path / "missing", workers=4)
+
+    def test_callback_errors_propagate(self, tmp_path):
+        """Test that an exception in a worker is re-raised."""
+        self.make_skewed_tree(tmp_path)
+
+        def fail(entry, st):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            scan_tree(tmp_path / "big", on_file=fail, workers=4)
+
+
+class TestDiskUsage:
+    """Tests for scan_tree with disk_usage=True."""
+
+    def test_counts_hardlinks_once(self, tmp_path):
+        """Test that hardlinked copies add no allocated size."""
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+        (tmp_path / "a" / "data.bin").write_bytes(os.urandom(64 * 1024))
+        os.link(tmp_path / "a" / "data.bin", tmp_path / "b" / "copy.bin")
+        os.link(tmp_path / "a" / "data.bin", tmp_path / "b" / "copy2.bin")
+        blocks = os.lstat(tmp_path / "a" / "data.bin").st_blocks * 512
+
+        apparent = scan_tree(tmp_path)
+        allocated = scan_tree(tmp_path, disk_usage=True)
+
+        assert apparent.total_size == 3 * 64 * 1024
+        assert allocated.total_size == blocks
+        assert allocated.file_count == 3
+
+    def test_sparse_file_counts_allocated_blocks(self, tmp_path):
+        """Test that a sparse file counts only what is allocated."""
+        with open(tmp_path / "sparse.bin", "wb") as f:
+            f.truncate(10 * 1024 * 1024)
+
+        allocated = scan_tree(tmp_path, disk_usage=True)
+
+        assert allocated.total_size < 10 * 1024 * 1024
+
+    def test_parallel_matches_serial(self, tmp_path):
+        """Test that hardlink accounting gives the same total with workers."""
+        for i in range(20):
+            (tmp_path / f"d{i}").mkdir()
+            (tmp_path / f"d{i}" / "f").write_bytes(b"x" * 5000)
+            os.link(tmp_path / "d0" / "f", tmp_path / f"d{i}" / "link")
+
+        serial = scan_tree(tmp_path, disk_usage=True)
+        parallel = scan_tree(tmp_path, disk_usage=True, workers=4)
+
+        assert parallel.total_size == serial.total_size
+
+    def test_rejects_index(self, tmp_path):
+        """Test that disk_usage cannot be used with an incremental index."""
+        with pytest.raises(ValueError, match="incremental"):
+            scan_tree(tmp_path, disk_usage=True, index=object())
+
+
+class TestInodeSet:
+    """Tests for InodeSet."""
+
+    def test_add_reports_new_pairs(self):
+        """Test that add returns False for duplicates."""
+        inodes = InodeSet()
+
+        assert inodes.add(1, 10) is True
+        assert inodes.add(1, 10) is False
+        assert inodes.add(2, 10) is True
+        assert len(inodes) == 2
+
+    def test_grows_past_initial_capacity(self):
+        """Test that every pair survives resizing."""
+        inodes = InodeSet(capacity=4)
+
+        for ino in range(1, 5001):
+            assert inodes.add(7, ino)
+
+        assert len(inodes) == 5000
+        assert all((7, ino) in inodes for ino in range(1, 5001))
+        assert (8, 1) not in inodes
+
+    def test_accepts_large_numbers(self):
+        """Test 64-bit device and inode numbers."""
+        inodes = InodeSet()
+
+        assert inodes.add(2**63, 2**64 - 1)
+        assert (2**63, 2**64 - 1) in inodes
+
+
+class TestTopFolders:
+    """Tests for FolderTree.top_folders."""
+
+    def test_immediate_subfolders_sorted(self, tmp_path):
+        """Test ranking of immediate subfolders."""
+        make_tree(tmp_path)
+
+        top = scan_tree(tmp_path).top_folders(10)
+
+        assert top == [
+            (str(tmp_path / "a"), 1100),
+            (str(tmp_path / "b"), 10),
+            (str(tmp_path / "empty"), 0),
+        ]
+
+    def test_limits_to_top_n(self, tmp_path):
+        """Test that only top_n folders are returned."""
+        make_tree(tmp_path)
+
+        top = scan_tree(tmp_path).top_folders(1)
+
+        assert top == [(str(tmp_path / "a"), 1100)]
+
+    def test_deeper_level(self, tmp_path):
+        """Test ranking folders at depth 2 from the same scan."""
+        make_tree(tmp_path)
+
+        top = scan_tree(tmp_path).top_folders(10, depth=2)
+
+        assert top == [(str(tmp_path / "a" / "deep"), 1000)]
+
+
+class TestTopNTracker:
+    """Tests for streaming TopNTracker."""
+
+    def test_matches_full_tree_ranking(self, tmp_path):
+        """Test that streaming folders match the full-tree ranking."""
+        make_tree(tmp_path)
+        tracker = TopNTracker(top_n=2)
+
+        tree = scan_tree(
+            tmp_path, on_file=tracker.on_file, on_dir=tracker.on_dir, keep_tree=False
+        )
+
+        assert tracker.top_folders() == scan_tree(tmp_path).top_folders(2)
+        assert tree.total_size == 1115
+        assert len(tree) == 0
+
+    def test_keeps_largest_files(self, tmp_path):
+        """Test that only the top_n largest files are kept."""
+        make_tree(tmp_path)
+        tracker = TopNTracker(top_n=2)
+
+        scan_tree(tmp_path, on_file=tracker.on_file, on_dir=tracker.on_dir)
+
+        assert tracker.top_files() == [
+            (str(tmp_path / "a" / "deep" / "two.bin"), 1000),
+            (str(tmp_path / "a" / "one.bin"), 100),
+        ]
+
+    def test_counts_entries_and_bytes(self, tmp_path):
+        """Test running counters."""
+        make_tree(tmp_path)
+        tracker = TopNTracker()
+
+        scan_tree(tmp_path, on_file=tracker.on_file, on_dir=tracker.on_dir)
+
+        assert tracker.entries == 9
+        assert tracker.bytes_seen == 1115
+        assert tracker.rate > 0
+
+    def test_reports_progress(self, tmp_path):
+        """Test that the progress callback runs during the scan."""
+        make_tree(tmp_path)
+        reports = []
+        tracker = TopNTracker(progress=lambda t: reports.append(t.entries), interval=0)
+
+        scan_tree(tmp_path, on_file=tracker.on_file, on_dir=tracker.on_dir)
+
+        assert reports == list(range(1, 10))
+
+    def test_zero_top_n_keeps_nothing(self, tmp_path):
+        """Test that top_n=0 keeps empty leaderboards."""
+        make_tree(tmp_path)
+        tracker = TopNTracker(top_n=0)
+
+        scan_tree(tmp_path, on_file=tracker.on_file, on_dir=tracker.on_dir)
+
+        assert tracker.top_folders() == []
+        assert tracker.top_files() == []
+
+
+class TestFolderTreeModel:
+    """Tests for the array-backed FolderTree and its exports."""
+
+    def test_rebuilds_paths_from_parents(self, tmp_path):
+        """Test that full paths come back from the parent chain."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path)
+
+        paths = sorted(tree.path_of(i) for i in range(len(tree)))
+        expected = [tmp_path, tmp_path / "a", tmp_path / "a" / "deep", tmp_path / "b"]
+        expected.append(tmp_path / "empty")
+        assert paths == sorted(str(p) for p in expected)
+
+    def test_children_largest_first(self, tmp_path):
+        """Test drill-down into immediate subdirectories."""
+        make_tree(tmp_path)
+        tree = scan_tree(tmp_path)
+
+        names = [tree.name_of(i) for i in tree.children(0)]
+        deep = [tree.name_of(i) for i in tree.children(tree.find(tmp_path / "a"))]
+
+        assert names == ["a", "b", "empty"]
+        assert deep == ["deep"]
+
+    def test_find_unknown_path_raises(self, tmp_path):
+        """Test that paths outside the scan raise KeyError."""
+        make_tree(tmp_path)
+        tree = scan_tree(tmp_path / "a")
+
+        with pytest.raises(KeyError):
+            tree.find(tmp_path / "b")
+        with pytest.raises(KeyError):
+            tree.find(tmp_path / "a" / "missing")
+
+    def test_handles_undecodable_names(self, tmp_path):
+        """Test that non-UTF-8 directory names round-trip."""
+        raw = os.path.join(os.fsencode(tmp_path), b"bad\xff")
+        os.mkdir(raw)
+
+        tree = scan_tree(tmp_path)
+
+        assert os.fsencode(tree.path_of(1)) == raw
+
+    def test_export_csv(self, tmp_path):
+        """Test CSV export rows and depth limit."""
+        make_tree(tmp_path)
+        tree = scan_tree(tmp_path)
+        out = io.StringIO()
+
+        tree.export_csv(out, max_depth=1)
+
+        rows = list(csv.DictReader(io.StringIO(out.getvalue())))
+        assert len(rows) == 4
+        by_path = {row["path"]: row for row in rows}
+        assert by_path[str(tmp_path / "a")]["size"] == "1100"
+        assert by_path[str(tmp_path / "a")]["parent"] == "0"
+        assert by_path[str(tmp_path)]["parent"] == "-1"
+
+    def test_export_json(self, tmp_path):
+        """Test nested JSON export."""
+        make_tree(tmp_path)
+        tree = scan_tree(tmp_path)
+        out = io.StringIO()
+
+        tree.export_json(out)
+
+        doc = json.loads(out.getvalue())
+        assert doc["name"] == str(tmp_path)
+        assert doc["size"] == 1115
+        assert [c["name"] for c in doc["children"]] == ["a", "b", "empty"]
+        assert doc["children"][0]["children"] == [
+            {"name": "deep", "size": 1000, "children": []}
+        ]
+
+    def test_export_json_depth_limit(self, tmp_path):
+        """Test that max_depth prunes deeper levels."""
+        make_tree(tmp_path)
+        tree = scan_tree(tmp_path)
+        out = io.StringIO()
+
+        tree.export_json(out, max_depth=1)
+
+        doc = json.loads(out.getvalue())
+        assert doc["children"][0]["children"] == []
+
+
+class TestFileHistograms:
+    """Tests for FileHistograms."""
+
+    def make_aged_files(self, root, now):
+        """Create files with known extensions and ages."""
+        files = [
+            ("new.log", 100, 0),
+            ("old.LOG", 50, 400 * 86400),
+            ("photo.jpg", 1000, 10 * 86400),
+            ("README", 7, 2 * 86400),
+        ]
+        for name, size, age in files:
+            path = root / name
+            path.write_bytes(b"x" * size)
+            os.utime(path, (now - age, now - age))
+
+    def test_extension_counts_and_bytes(self, tmp_path):
+        """Test that extensions are lowercased and summed."""
+        now = 2_000_000_000.0
+        self.make_aged_files(tmp_path, now)
+        histograms = FileHistograms(now=now)
+
+        scan_tree(tmp_path, on_file=histograms.on_file)
+
+        assert histograms.extensions == {
+            ".log": [2, 150],
+            ".jpg": [1, 1000],
+            "(none)": [1, 7],
+        }
+        assert histograms.top_extensions(1) == [(".jpg", 1, 1000)]
+
+    def test_mtime_buckets(self, tmp_path):
+        """Test that files land in the right age buckets."""
+        now = 2_000_000_000.0
+        self.make_aged_files(tmp_path, now)
+        histograms = FileHistograms(now=now)
+
+        scan_tree(tmp_path, on_file=histograms.on_file)
+
+        table = {label: (count, size) for label, count, size in histograms.age_table()}
+        assert table["< 1 day"] == (1, 100)
+        assert table["1-7 days"] == (1, 7)
+        assert table["7-30 days"] == (1, 1000)
+        assert table["1-3 years"] == (1, 50)
+        assert sum(count for count, _ in table.values()) == 4
+
+    def test_atime_buckets(self, tmp_path):
+        """Test that access times get their own histogram."""
+        now = 2_000_000_000.0
+        self.make_aged_files(tmp_path, now)
+        histograms = FileHistograms(now=now)
+
+        scan_tree(tmp_path, on_file=histograms.on_file)
+
+        assert sum(count for _, count, _ in histograms.age_table("atime")) == 4
+
+    def test_caps_distinct_extensions(self, tmp_path):
+        """Test that extensions beyond the cap go to (other)."""
+        for i in range(5):
+            (tmp_path / f"f.e{i}").write_bytes(b"x")
+        histograms = FileHistograms(max_extensions=2)
+
+        scan_tree(tmp_path, on_file=histograms.on_file)
+
+        assert len(histograms.extensions) == 3
+        assert histograms.extensions["(other)"] == [3, 3]
+
+    def test_rejects_unknown_kind(self):
+        """Test that age_table validates its argument."""
+        with pytest.raises(ValueError, match="Unknown age kind"):
+            FileHistograms().age_table("ctime")
+
+
+class TestPruneRules:
+    """Tests for prune patterns and one-file-system mode."""
+
+    def test_prunes_by_name(self, tmp_path):
+        """Test that matching directory names are not descended into."""
+        make_tree(tmp_path)
+        (tmp_path / "a" / "node_modules").mkdir()
+        (tmp_path / "a" / "node_modules" / "big.js").write_bytes(b"x" * 5000)
+
+        tree = scan_tree(tmp_path, prune=["node_modules", "deep"])
+
+        assert tree.total_size == 115
+        assert tree.pruned_count == 2
+        with pytest.raises(KeyError):
+            tree.find(tmp_path / "a" / "deep")
+
+    def test_prunes_by_wildcard_path(self, tmp_path):
+        """Test that patterns with a separator match full paths."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path, prune=[str(tmp_path / "a" / "*")])
+
+        assert tree.size_of(tmp_path / "a") == 100
+        assert tree.size_of(tmp_path / "b") == 10
+
+    def test_accepts_generator(self, tmp_path):
+        """Test that name and path patterns given as a one-shot iterator are all applied."""
+        rules = PruneRules(p for p in ["deep", str(tmp_path / "b")])
+
+        assert rules.skips(str(tmp_path / "a" / "deep"))
+        assert rules.skips(str(tmp_path / "b"))
+        assert not rules.skips(str(tmp_path / "a"))
+
+    def test_does_not_prune_root(self, tmp_path):
+        """Test that the scan root itself is always scanned."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path / "a", prune=["a"])
+
+        assert tree.total_size == 1100
+
+    def test_prunes_with_workers_and_index(self, tmp_path):
+        """Test pruning combined with parallel and incremental scans."""
+        make_tree(tmp_path)
+        with SizeIndex(tmp_path / "index.sqlite") as index:
+            tree = scan_tree(tmp_path / "a", prune=["deep"], workers=3, index=index)
+
+        assert tree.total_size == 100
+
+    def test_one_file_system_skips_other_devices(self, tmp_path):
+        """Test that directories on another device are skipped."""
+        make_tree(tmp_path)
+        rules = PruneRules(one_file_system=True, root_dev=os.stat(tmp_path).st_dev)
+
+        assert not rules.skips(str(tmp_path / "a"))
+        assert PruneRules(one_file_system=True, root_dev=-1).skips(str(tmp_path / "a"))
+
+    def test_one_file_system_scan_matches_plain_scan(self, tmp_path):
+        """Test that a single-device tree is unchanged by one_file_system."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path, one_file_system=True)
+
+        assert tree.total_size == 1115
+        assert tree.pruned_count == 0
+
+    def test_one_file_system_stops_at_mount(self):
+        """Test that /proc is skipped when scanning from / with -x, where available."""
+        if not os.path.ismount("/proc") or os.stat("/proc").st_dev == os.stat("/").st_dev:
+            pytest.skip("no separate /proc mount")
+        rules = PruneRules(one_file_system=True, root_dev=os.stat("/").st_dev)
+
+        assert rules.skips("/proc")
+
+
+class TestCancelledScan:
+    """Tests for scan_tree with a cancel event."""
+
+    def test_cancel_before_start_lists_nothing(self, tmp_path):
+        """Test that a set event stops the serial scan before the root."""
+        make_tree(tmp_path)
+        cancel = threading.Event()
+        cancel.set()
+
+        tree = scan_tree(tmp_path, cancel=cancel)
+
+        assert not tree.complete
+        assert tree.total_size == 0
+        assert tree.unscanned_count == 1
+
+    def test_cancel_midway_keeps_measured_part(self, tmp_path):
+        """Test that sizes listed before the cancel still roll up to the root."""
+        make_tree(tmp_path)
+        cancel = threading.Event()
+        finished = []
+
+        def on_dir(path, size, depth):
+            finished.append(path)
+            cancel.set()
+
+        tree = scan_tree(tmp_path, on_dir=on_dir, cancel=cancel)
+
+        assert not tree.complete
+        assert tree.unscanned_count > 0
+        assert 0 < tree.total_size < 1115
+        # Directories finished before the cancel were reported, the root was not
+        assert finished
+        assert str(tmp_path) not in finished
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_unset_event_scans_everything(self, tmp_path, workers):
+        """Test that an event that is never set changes nothing."""
+        make_tree(tmp_path)
+
+        tree = scan_tree(tmp_path, workers=workers, cancel=threading.Event())
+
+        assert tree.complete
+        assert tree.total_size == 1115
+
+    def test_parallel_cancel_drains_queue(self, tmp_path):
+        """Test that workers stop listing once the event is set."""
+        for i in range(50):
+            (tmp_path / f"d{i}").mkdir()
+            (tmp_path / f"d{i}" / "f").write_bytes(b"x")
+        cancel = threading.Event()
+
+        tree = scan_tree(
+            tmp_path, workers=4, on_file=lambda entry, st: cancel.set(), cancel=cancel
+        )
+
+        assert not tree.complete
+        assert tree.dir_count + tree.unscanned_count == 51
+        assert tree.total_size == tree.file_count
+
+
+class TestScanTreeAsync:
+    """Tests for scan_tree_async function."""
+
+    def test_completes_within_timeout(self, tmp_path):
+        """Test that a fast scan returns the full tree."""
+        make_tree(tmp_path)
+
+        result = asyncio.run(scan_tree_async(tmp_path, timeout=30))
+
+        assert result.complete
+        assert result.size == result.tree.total_size == 1115
+
+    def test_timeout_returns_partial_tree(self, tmp_path):
+        """Test that a slow scan is stopped and marked incomplete."""
+        for i in range(40):
+            (tmp_path / f"d{i}").mkdir()
+            (tmp_path / f"d{i}" / "f").write_bytes(b"x" * 10)
+
+        result = asyncio.run(
+            scan_tree_async(tmp_path, timeout=0.1, on_file=lambda e, st: time.sleep(0.02))
+        )
+
+        assert not result.complete
+        assert result.tree is not None
+        assert result.size == result.tree.total_size < 400
+
+    def test_stuck_scan_returns_without_tree(self, tmp_path):
+        """Test that a listing that does not return in time does not block the caller."""
+        make_tree(tmp_path)
+        release = threading.Event()
+
+        async def check():
+            return await scan_tree_async(
+                tmp_path, timeout=0.05, grace=0.05, on_file=lambda e, st: release.wait(5)
+            )
+
+        try:
+            started = time.monotonic()
+            result = asyncio.run(check())
+            assert time.monotonic() - started < 2
+        finally:
+            release.set()
+
+        assert not result.complete
+        assert result.tree is None
+
+    def test_stuck_scan_size_uses_disk_usage(self, tmp_path):
+        """Test that the size of a stuck disk_usage scan is in allocated bytes, links once."""
+        (tmp_path / "data.bin").write_bytes(os.urandom(64 * 1024))
+        os.link(tmp_path / "data.bin", tmp_path / "copy.bin")
+        with open(tmp_path / "sparse.bin", "wb") as f:
+            f.truncate(10 * 1024 * 1024)
+        (tmp_path / "z").mkdir()
+        (tmp_path / "z" / "stop").write_bytes(b"x")
+        release = threading.Event()
+
+        def on_file(entry, st):
+            if entry.name == "stop":
+                release.wait(5)
+
+        try:
+            result = asyncio.run(
+                scan_tree_async(tmp_path, timeout=0.05, grace=0.05, disk_usage=True, on_file=on_file)
+            )
+        finally:
+            release.set()
+
+        assert result.tree is None
+        assert result.size == scan_tree(tmp_path, disk_usage=True).total_size
+        assert result.size < 64 * 1024 * 2 + 10 * 1024 * 1024
+
+    def test_task_cancellation_stops_scan(self, tmp_path):
+        """Test that cancelling the awaiting task sets the scan's cancel event."""
+        make_tree(tmp_path)
+        calls = []
+
+        def on_file(entry, st):
+            calls.append(entry.path)
+            time.sleep(0.1)
+
+        async def check():
+            task = asyncio.ensure_future(scan_tree_async(tmp_path, on_file=on_file))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            await asyncio.sleep(0.3)
+
+        asyncio.run(check())
+
+        assert len(calls) < 4
+
+    def test_missing_path_raises(self, tmp_path):
+        """Test that scan errors are raised in the caller."""
+        with pytest.raises(FileNotFoundError):
+            asyncio.run(scan_tree_async(tmp_path / "missing", timeout=5))
@@ -1,15 +1,24 @@
 """Tests for disk_space module."""
 
+import io
+import json
+import threading
+
 import pytest
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 from collections import namedtuple
 
 from disk_space import (
+    DiskSpaceCache,
+    SpaceHistory,
+    format_prometheus,
     get_disk_space_free,
     get_disk_space_info,
     format_bytes,
     has_sufficient_space,
+    snapshot_disk_space,
+    watch_disk_space,
 )
 
 
@@ -201,6 +210,281 @@ class TestHasSufficientSpace:
         mock_get_free.assert_called_once_with(Path("/home/user"))
 
 
+class TestDiskSpaceCache:
+    """Tests for DiskSpaceCache and snapshot_disk_space."""
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_collapses_paths_on_same_filesystem(self, mock_disk_usage, tmp_path):
+        """Test that paths sharing st_dev cost one disk_usage call."""
+        mock_disk_usage.return_value = DiskUsage(
+            total=1000000000, used=600000000, free=400000000
+        )
+        (tmp_path / "a").mkdir()
+
+        result = snapshot_disk_space([tmp_path, tmp_path / "a", str(tmp_path)])
+
+        mock_disk_usage.assert_called_once()
+        assert result[tmp_path] == {
+            "total": 1000000000,
+            "used": 600000000,
+            "free": 400000000,
+        }
+        assert result[str(tmp_path)] == result[tmp_path / "a"]
+
+    @patch("disk_space.time.monotonic")
+    @patch("disk_space.shutil.disk_usage")
+    def test_reuses_results_within_ttl(self, mock_disk_usage, mock_monotonic, tmp_path):
+        """Test that repeated checks inside the TTL make no new calls."""
+        mock_disk_usage.return_value = DiskUsage(
+            total=1000000000, used=600000000, free=400000000
+        )
+        mock_monotonic.return_value = 100.0
+        cache = DiskSpaceCache(ttl=5)
+
+        for _ in range(5):
+            assert cache.has_sufficient_space(tmp_path, 1000)
+
+        mock_disk_usage.assert_called_once()
+
+    @patch("disk_space.time.monotonic")
+    @patch("disk_space.shutil.disk_usage")
+    def test_refreshes_after_ttl(self, mock_disk_usage, mock_monotonic, tmp_path):
+        """Test that expired results are fetched again."""
+        mock_disk_usage.side_effect = [
+            DiskUsage(total=1000, used=600, free=400),
+            DiskUsage(total=1000, used=900, free=100),
+        ]
+        cache = DiskSpaceCache(ttl=5)
+
+        mock_monotonic.return_value = 100.0
+        first = cache.get_disk_space_free(tmp_path)
+        mock_monotonic.return_value = 106.0
+        second = cache.get_disk_space_free(tmp_path)
+
+        assert (first, second) == (400, 100)
+        assert mock_disk_usage.call_count == 2
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_clear_forces_refresh(self, mock_disk_usage, tmp_path):
+        """Test that clear drops cached results."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=600, free=400)
+        cache = DiskSpaceCache(ttl=60)
+
+        cache.get_disk_space_info(tmp_path)
+        cache.clear()
+        cache.get_disk_space_info(tmp_path)
+
+        assert mock_disk_usage.call_count == 2
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_returns_copies(self, mock_disk_usage, tmp_path):
+        """Test that callers cannot modify cached results."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=600, free=400)
+        cache = DiskSpaceCache(ttl=60)
+
+        cache.get_disk_space_info(tmp_path)["free"] = 0
+
+        assert cache.get_disk_space_free(tmp_path) == 400
+
+    def test_slow_filesystem_does_not_block_others(self, tmp_path):
+        """Test that a lookup stuck in disk_usage does not hold the cache lock."""
+        slow, fast = tmp_path / "slow", tmp_path / "fast"
+        slow.mkdir()
+        fast.mkdir()
+        entered, release = threading.Event(), threading.Event()
+
+        def disk_usage(path):
+            if path == str(slow):
+                entered.set()
+                release.wait(5)
+            return DiskUsage(total=1000, used=600, free=400)
+
+        cache = DiskSpaceCache(ttl=0)
+        with patch("disk_space.shutil.disk_usage", side_effect=disk_usage):
+            stuck = threading.Thread(target=cache.snapshot, args=([slow],))
+            stuck.start()
+            try:
+                assert entered.wait(5)
+                assert cache.get_disk_space_free(fast) == 400
+                assert stuck.is_alive()
+            finally:
+                release.set()
+                stuck.join()
+
+    def test_raises_error_for_nonexistent_path(self, tmp_path):
+        """Test that FileNotFoundError is raised for nonexistent path."""
+        with pytest.raises(FileNotFoundError, match="Path does not exist"):
+            DiskSpaceCache().get_disk_space_free(tmp_path / "missing")
+
+    def test_matches_uncached_values(self):
+        """Test that the cache reports the same figures as a direct call."""
+        assert DiskSpaceCache().get_disk_space_info("/")["total"] == (
+            get_disk_space_info("/")["total"]
+        )
+
+
+class TestSpaceHistory:
+    """Tests for SpaceHistory ring buffer and projections."""
+
+    def test_keeps_only_latest_samples(self):
+        """Test that the oldest samples are overwritten once full."""
+        history = SpaceHistory(capacity=3)
+
+        for t in range(5):
+            history.append(float(t), 1000 - t, t)
+
+        assert len(history) == 3
+        assert history.samples() == [(2.0, 998, 2), (3.0, 997, 3), (4.0, 996, 4)]
+
+    def test_fill_rate_from_linear_consumption(self):
+        """Test fill rate when 10 bytes are used per second."""
+        history = SpaceHistory()
+        for t in range(10):
+            history.append(100.0 + t, 1000 - 10 * t, 10 * t)
+
+        assert history.fill_rate() == pytest.approx(10.0)
+        # 910 bytes left at 10 bytes/second
+        assert history.time_to_full() == pytest.approx(91.0)
+
+    def test_no_projection_while_freeing_space(self):
+        """Test that time to full is None when free space grows."""
+        history = SpaceHistory()
+        history.append(0.0, 100, 900)
+        history.append(1.0, 200, 800)
+
+        assert history.fill_rate() == pytest.approx(-100.0)
+        assert history.time_to_full() is None
+
+    def test_no_rate_with_single_sample(self):
+        """Test that one sample gives no rate."""
+        history = SpaceHistory()
+        history.append(0.0, 100, 900)
+
+        assert history.fill_rate() is None
+        assert history.time_to_full() is None
+
+    def test_rejects_tiny_capacity(self):
+        """Test that capacity below 2 is refused."""
+        with pytest.raises(ValueError, match="capacity"):
+            SpaceHistory(capacity=1)
+
+
+class TestWatchDiskSpace:
+    """Tests for watch_disk_space and its output formats."""
+
+    @patch("disk_space.time.time")
+    @patch("disk_space.shutil.disk_usage")
+    def test_writes_ndjson_records(self, mock_disk_usage, mock_time, tmp_path):
+        """Test NDJSON output with a projection after two samples."""
+        mock_disk_usage.side_effect = [
+            DiskUsage(total=1000, used=500, free=500),
+            DiskUsage(total=1000, used=600, free=400),
+        ]
+        mock_time.side_effect = [0.0, 10.0]
+        out = io.StringIO()
+
+        watch_disk_space([tmp_path], interval=10, iterations=2, stream=out, sleep=lambda s: None)
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [r["free"] for r in records] == [500, 400]
+        assert records[0]["fill_rate"] is None
+        assert records[1]["fill_rate"] == pytest.approx(10.0)
+        assert records[1]["time_to_full"] == pytest.approx(40.0)
+        assert records[1]["path"] == str(tmp_path)
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_one_call_per_filesystem_per_tick(self, mock_disk_usage, tmp_path):
+        """Test that paths on one filesystem share a sample."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=500, free=500)
+        (tmp_path / "a").mkdir()
+
+        histories = watch_disk_space(
+            [tmp_path, tmp_path / "a"], iterations=3, stream=io.StringIO(), sleep=lambda s: None
+        )
+
+        assert mock_disk_usage.call_count == 3
+        assert len(histories[str(tmp_path / "a")]) == 3
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_writes_prometheus_textfile(self, mock_disk_usage, tmp_path):
+        """Test that the Prometheus textfile is replaced each tick."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=500, free=500)
+        out = tmp_path / "disk.prom"
+
+        watch_disk_space(
+            [tmp_path],
+            output_format="prometheus",
+            output=out,
+            iterations=2,
+            sleep=lambda s: None,
+        )
+
+        text = out.read_text()
+        assert f'disk_space_free_bytes{{path="{tmp_path}"}} 500' in text
+        assert "disk_space_fill_rate_bytes_per_second" in text
+        assert not (tmp_path / "disk.prom.tmp").exists()
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_failing_path_does_not_stop_watch(self, mock_disk_usage, tmp_path):
+        """Test that a missing path gets an error record each tick until it appears."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=500, free=500)
+        mount = tmp_path / "mnt"
+        out = io.StringIO()
+
+        histories = watch_disk_space(
+            [tmp_path, mount], iterations=3, stream=out, sleep=lambda s: mount.mkdir(exist_ok=True)
+        )
+
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        assert [(r["path"], "error" in r) for r in records] == [
+            (str(tmp_path), False),
+            (str(mount), True),
+            (str(tmp_path), False),
+            (str(mount), False),
+            (str(tmp_path), False),
+            (str(mount), False),
+        ]
+        assert "Path does not exist" in records[1]["error"]
+        assert (len(histories[str(tmp_path)]), len(histories[str(mount)])) == (3, 2)
+
+    @patch("disk_space.shutil.disk_usage")
+    def test_prometheus_marks_failing_path_down(self, mock_disk_usage, tmp_path):
+        """Test that a failing path is exported as disk_space_up 0 with no figures."""
+        mock_disk_usage.return_value = DiskUsage(total=1000, used=500, free=500)
+        missing = tmp_path / "missing"
+        out = tmp_path / "disk.prom"
+
+        watch_disk_space([tmp_path, missing], output_format="prometheus", output=out, iterations=1)
+
+        text = out.read_text()
+        assert f'disk_space_up{{path="{tmp_path}"}} 1' in text
+        assert f'disk_space_up{{path="{missing}"}} 0' in text
+        assert f'disk_space_free_bytes{{path="{missing}"}}' not in text
+
+    def test_prometheus_requires_output_file(self, tmp_path):
+        """Test that the Prometheus format needs a file."""
+        with pytest.raises(ValueError, match="output file"):
+            watch_disk_space([tmp_path], output_format="prometheus", iterations=1)
+
+    def test_format_prometheus_escapes_labels(self):
+        """Test label escaping and omission of unknown values."""
+        text = format_prometheus(
+            [
+                {
+                    "path": 'C:\\a"b',
+                    "total": 1,
+                    "used": 0,
+                    "free": 1,
+                    "fill_rate": None,
+                    "time_to_full": None,
+                }
+            ]
+        )
+
+        assert 'disk_space_total_bytes{path="C:\\\\a\\"b"} 1' in text
+        assert "disk_space_time_to_full_seconds{" not in text
+
+
 class TestIntegration:
     """Integration tests that use real filesystem."""
 
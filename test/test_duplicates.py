@@ -0,0 +1,144 @@
+"""Tests for duplicates module."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+import duplicates
+from duplicates import PARTIAL_SIZE, find_duplicates, hash_file, reclaimable_by_folder
+
+
+@pytest.fixture
+def dup_tree(tmp_path):
+    """Create a tree with small, large, near-duplicate and unique files."""
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b" / "deep").mkdir(parents=True)
+    small = b"s" * 100
+    large = os.urandom(PARTIAL_SIZE + 5000)
+    (tmp_path / "a" / "small1.txt").write_bytes(small)
+    (tmp_path / "b" / "small2.txt").write_bytes(small)
+    (tmp_path / "a" / "large1.bin").write_bytes(large)
+    (tmp_path / "b" / "deep" / "large2.bin").write_bytes(large)
+    (tmp_path / "b" / "large3.bin").write_bytes(large)
+    # Same size and same first 64 KiB as the large files, different tail
+    (tmp_path / "b" / "near.bin").write_bytes(large[:-1] + bytes([large[-1] ^ 1]))
+    (tmp_path / "unique.bin").write_bytes(b"u" * 7)
+    return tmp_path
+
+
+class TestHashFile:
+    """Tests for hash_file function."""
+
+    def test_partial_hash_ignores_tail(self, tmp_path):
+        """Test that only the first limit bytes are hashed."""
+        (tmp_path / "x").write_bytes(b"abc" + b"1")
+        (tmp_path / "y").write_bytes(b"abc" + b"2")
+
+        assert hash_file(str(tmp_path / "x"), 3) == hash_file(str(tmp_path / "y"), 3)
+        assert hash_file(str(tmp_path / "x")) != hash_file(str(tmp_path / "y"))
+
+    def test_empty_file(self, tmp_path):
+        """Test that empty files hash without mapping."""
+        (tmp_path / "e").write_bytes(b"")
+
+        assert hash_file(str(tmp_path / "e")) is not None
+
+    def test_missing_file_returns_none(self, tmp_path):
+        """Test that unreadable files give None."""
+        assert hash_file(str(tmp_path / "missing")) is None
+
+
+class TestFindDuplicates:
+    """Tests for find_duplicates function."""
+
+    def test_finds_groups(self, dup_tree):
+        """Test that identical files are grouped and near-duplicates are not."""
+        groups = find_duplicates(dup_tree)
+
+        assert [(g.size, len(g.paths)) for g in groups] == [(PARTIAL_SIZE + 5000, 3), (100, 2)]
+        assert not any("near.bin" in p for g in groups for p in g.paths)
+        assert groups[0].reclaimable == 2 * (PARTIAL_SIZE + 5000)
+
+    def test_unique_sizes_are_not_read(self, dup_tree):
+        """Test that files with a unique size are never hashed."""
+        hashed = []
+        real = duplicates.hash_file
+
+        def spy(path, limit=None):
+            hashed.append(path)
+            return real(path, limit)
+
+        with patch("duplicates.hash_file", spy):
+            find_duplicates(dup_tree)
+
+        assert not any(p.endswith("unique.bin") for p in hashed)
+
+    def test_small_files_hashed_once(self, dup_tree):
+        """Test that files within the partial size skip the full hash."""
+        calls = []
+        real = duplicates.hash_file
+
+        def spy(path, limit=None):
+            calls.append((os.path.basename(path), limit))
+            return real(path, limit)
+
+        with patch("duplicates.hash_file", spy):
+            find_duplicates(dup_tree)
+
+        assert [c for c in calls if c[0].startswith("small")] == [
+            ("small1.txt", PARTIAL_SIZE),
+            ("small2.txt", PARTIAL_SIZE),
+        ]
+
+    def test_hardlinks_are_not_duplicates(self, tmp_path):
+        """Test that links to one inode free nothing and are not reported."""
+        (tmp_path / "one").write_bytes(b"x" * 50)
+        os.link(tmp_path / "one", tmp_path / "two")
+
+        assert find_duplicates(tmp_path) == []
+
+    def test_zero_inodes_are_not_merged(self, dup_tree):
+        """Test that st_ino 0 (DirEntry.stat() on Windows) does not collapse a size bucket."""
+        real = duplicates.scan_tree
+
+        def scan_without_inodes(path, on_file, **kwargs):
+            def strip(entry, st):
+                fields = list(st)
+                fields[1] = fields[2] = 0  # st_ino, st_dev
+                on_file(entry, os.stat_result(fields))
+
+            return real(path, on_file=strip, **kwargs)
+
+        with patch("duplicates.scan_tree", scan_without_inodes):
+            groups = find_duplicates(dup_tree)
+
+        assert [(g.size, len(g.paths)) for g in groups] == [(PARTIAL_SIZE + 5000, 3), (100, 2)]
+
+    def test_process_pool_matches(self, dup_tree):
+        """Test that hashing in worker processes gives the same groups."""
+        assert find_duplicates(dup_tree, workers=2) == find_duplicates(dup_tree)
+
+
+class TestReclaimableByFolder:
+    """Tests for reclaimable_by_folder function."""
+
+    def test_charges_extra_copies_to_top_folders(self, dup_tree):
+        """Test that every copy but the first is charged to its folder."""
+        groups = find_duplicates(dup_tree)
+
+        result = reclaimable_by_folder(groups, dup_tree)
+
+        # a/ sorts first and keeps the originals; b/ holds all the extra copies
+        assert result == [(str(dup_tree / "b"), 2 * (PARTIAL_SIZE + 5000) + 100)]
+
+    def test_deeper_level(self, dup_tree):
+        """Test charging at depth 2, with shallower files charged to their folder."""
+        groups = find_duplicates(dup_tree)
+
+        result = dict(reclaimable_by_folder(groups, dup_tree, depth=2))
+
+        assert result == {
+            str(dup_tree / "b" / "deep"): PARTIAL_SIZE + 5000,
+            str(dup_tree / "b"): PARTIAL_SIZE + 5000 + 100,
+        }
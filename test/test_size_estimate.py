@@ -0,0 +1,94 @@
+"""Tests for size_estimate module."""
+
+import random
+
+import pytest
+
+from disk_scan import scan_tree
+from size_estimate import SizeEstimator, estimate_top_folders
+
+
+def make_branches(path, fanout, levels, rng):
+    """Create a tree with fanout subdirectories per level and a file in each."""
+    path.mkdir()
+    (path / "f.bin").write_bytes(b"x" * rng.randint(1, 500))
+    if levels:
+        for i in range(fanout):
+            make_branches(path / f"d{i}", fanout, levels - 1, rng)
+
+
+@pytest.fixture
+def big_tree(tmp_path):
+    """Create three bushy top-level folders of 121 directories each."""
+    rng = random.Random(5)
+    root = tmp_path / "t"
+    root.mkdir()
+    for name in ["a", "b", "c"]:
+        make_branches(root / name, 3, 4, rng)
+    return root
+
+
+class TestSizeEstimator:
+    """Tests for SizeEstimator."""
+
+    def test_converges_to_exact_sizes(self, big_tree):
+        """Test that with enough time every folder becomes exact."""
+        estimator = SizeEstimator(big_tree, seed=1)
+
+        estimator.refine(60)
+
+        assert estimator.complete
+        assert estimator.top_folders(100) == scan_tree(big_tree).top_folders(100)
+        assert all(e.exact and e.low == e.size == e.high for e in estimator.estimates())
+
+    def test_partial_estimate_has_bounds(self, big_tree):
+        """Test that a few probes give an interval around the estimate."""
+        estimator = SizeEstimator(big_tree, seed=2)
+
+        estimator.refine(60, max_probes=20)
+
+        assert not estimator.complete
+        sampled = [e for e in estimator.estimates() if not e.exact and e.probes >= 2]
+        assert sampled
+        for estimate in sampled:
+            assert estimate.low <= estimate.size <= estimate.high
+
+    def test_single_probe_has_no_bounds(self, tmp_path):
+        """Test that bounds are withheld until a folder has two probes."""
+        for name in ["x", "y"]:
+            (tmp_path / "a" / name).mkdir(parents=True)
+        estimator = SizeEstimator(tmp_path, seed=0)
+
+        estimator.refine(60, max_probes=1)
+
+        (estimate,) = estimator.estimates()
+        assert estimate.probes == 1
+        assert estimate.low is None and estimate.high is None
+
+    def test_same_seed_same_estimate(self, big_tree):
+        """Test that seeded estimators are reproducible."""
+        first = SizeEstimator(big_tree, seed=9)
+        second = SizeEstimator(big_tree, seed=9)
+
+        first.refine(60, max_probes=15)
+        second.refine(60, max_probes=15)
+
+        assert first.estimates() == second.estimates()
+
+    def test_missing_path_raises(self, tmp_path):
+        """Test that a missing root raises FileNotFoundError."""
+        with pytest.raises(FileNotFoundError):
+            SizeEstimator(tmp_path / "missing")
+
+
+class TestEstimateTopFolders:
+    """Tests for estimate_top_folders function."""
+
+    def test_reports_progress_and_returns_top_n(self, big_tree):
+        """Test that progress is called and the result is limited to top_n."""
+        seen = []
+
+        result = estimate_top_folders(big_tree, top_n=2, seconds=60, progress=seen.append)
+
+        assert seen
+        assert result == scan_tree(big_tree).top_folders(2)
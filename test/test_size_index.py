@@ -0,0 +1,144 @@
+"""Tests for size_index module."""
+
+import os
+import shutil
+
+import pytest
+
+from disk_scan import scan_tree
+from size_index import SizeIndex
+
+
+def age_dirs(root, seconds=3600):
+    """Push directory mtimes into the past so they are eligible for caching."""
+    past = os.stat(root).st_mtime - seconds
+    for dirpath, _, _ in os.walk(root):
+        os.utime(dirpath, (past, past))
+
+
+@pytest.fixture
+def tree_root(tmp_path):
+    """Create a small aged tree with known sizes."""
+    root = tmp_path / "data"
+    (root / "a" / "deep").mkdir(parents=True)
+    (root / "b").mkdir()
+    (root / "a" / "one.bin").write_bytes(b"x" * 100)
+    (root / "a" / "deep" / "two.bin").write_bytes(b"x" * 1000)
+    (root / "b" / "three.bin").write_bytes(b"x" * 10)
+    age_dirs(root)
+    return root
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Open an index in a temporary file."""
+    with SizeIndex(tmp_path / "index.sqlite") as idx:
+        yield idx
+
+
+class TestSizeIndex:
+    """Tests for SizeIndex storage."""
+
+    def test_lookup_missing_returns_none(self, index):
+        """Test that unknown paths are not found."""
+        assert index.lookup("/nowhere") is None
+
+    def test_store_and_lookup_round_trip(self, index, tree_root):
+        """Test that a stored listing comes back unchanged."""
+        st = os.stat(tree_root)
+
+        index.store(str(tree_root), st, 5, 1, ["a", "b"])
+        index.close()
+        reopened = SizeIndex(index.db_path)
+        cached = reopened.lookup(str(tree_root))
+        reopened.close()
+
+        assert cached.ino == st.st_ino
+        assert cached.mtime_ns == st.st_mtime_ns
+        assert cached.file_bytes == 5
+        assert cached.file_count == 1
+        assert cached.subdirs == ["a", "b"]
+
+    def test_forget_removes_subtree_only(self, index, tree_root):
+        """Test that forget drops a directory and its descendants."""
+        st = os.stat(tree_root)
+        for path in ["/x/a", "/x/a/deep", "/x/ab", "/x/b"]:
+            index.store(path, st, 0, 0, [])
+
+        index.forget("/x/a")
+        index.total_of("/x")  # flushes pending changes
+
+        assert index.lookup("/x/a") is None
+        assert index.lookup("/x/a/deep") is None
+        assert index.lookup("/x/ab") is not None
+        assert index.lookup("/x/b") is not None
+
+
+class TestIncrementalScan:
+    """Tests for scan_tree with a SizeIndex."""
+
+    def test_first_scan_matches_full_scan(self, index, tree_root):
+        """Test that an empty index gives the same totals as a normal scan."""
+        tree = scan_tree(tree_root, index=index)
+
+        assert tree.total_size == scan_tree(tree_root).total_size == 1110
+        assert tree.listed_count == tree.dir_count
+
+    def test_rescan_lists_nothing_when_unchanged(self, index, tree_root):
+        """Test that unchanged directories are reused from the index."""
+        scan_tree(tree_root, index=index)
+
+        tree = scan_tree(tree_root, index=index)
+
+        assert tree.listed_count == 0
+        assert tree.total_size == 1110
+        assert tree.size_of(tree_root / "a") == 1100
+        assert tree.file_count == 3
+
+    def test_rescan_lists_only_changed_directory(self, index, tree_root):
+        """Test that a new file is picked up by re-listing just its directory."""
+        scan_tree(tree_root, index=index)
+        (tree_root / "a" / "deep" / "new.bin").write_bytes(b"x" * 7)
+
+        tree = scan_tree(tree_root, index=index)
+
+        assert tree.listed_count == 1
+        assert tree.total_size == 1117
+        assert tree.size_of(tree_root / "a" / "deep") == 1007
+
+    def test_removed_directory_is_forgotten(self, index, tree_root):
+        """Test that deleted subtrees drop out of totals and the index."""
+        scan_tree(tree_root, index=index)
+        shutil.rmtree(tree_root / "a")
+
+        tree = scan_tree(tree_root, index=index)
+
+        assert tree.total_size == 10
+        assert index.lookup(str(tree_root / "a" / "deep")) is None
+
+    def test_recently_modified_directory_not_cached(self, index, tree_root):
+        """Test that directories changed within the racy window are relisted."""
+        (tree_root / "b" / "fresh.bin").write_bytes(b"x")
+        scan_tree(tree_root, index=index)
+
+        tree = scan_tree(tree_root, index=index)
+
+        assert tree.listed_count == 1
+        assert tree.size_of(tree_root / "b") == 11
+
+    def test_records_totals(self, index, tree_root):
+        """Test that cumulative sizes are stored for each directory."""
+        scan_tree(tree_root, index=index)
+
+        assert index.total_of(tree_root) == 1110
+        assert index.total_of(tree_root / "a") == 1100
+
+    def test_parallel_incremental_matches(self, index, tree_root):
+        """Test incremental scans with several workers."""
+        scan_tree(tree_root, index=index, workers=4)
+        (tree_root / "b" / "new.bin").write_bytes(b"x" * 3)
+
+        tree = scan_tree(tree_root, index=index, workers=4)
+
+        assert tree.total_size == 1113
+        assert tree.listed_count == 1
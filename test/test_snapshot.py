@@ -0,0 +1,137 @@
+"""Tests for snapshot module."""
+
+import math
+import os
+import shutil
+
+import pytest
+
+from disk_scan import scan_tree
+from snapshot import FolderChange, Snapshot, diff_snapshots, key_to_path, save_snapshot
+
+
+def make_tree(root):
+    """Create a small tree with known sizes under root."""
+    (root / "a" / "deep").mkdir(parents=True)
+    (root / "a-b").mkdir()
+    (root / "b").mkdir()
+    (root / "a" / "one.bin").write_bytes(b"x" * 100)
+    (root / "a" / "deep" / "two.bin").write_bytes(b"x" * 1000)
+    (root / "a-b" / "three.bin").write_bytes(b"x" * 10)
+    (root / "b" / "four.bin").write_bytes(b"x" * 50)
+    return root
+
+
+class TestSortedRecords:
+    """Tests for FolderTree.sorted_records."""
+
+    def test_keys_are_sorted_and_complete(self, tmp_path):
+        """Test that every directory appears once in ascending key order."""
+        tree = scan_tree(make_tree(tmp_path))
+
+        records = list(tree.sorted_records())
+        keys = [key for key, _ in records]
+
+        assert keys == sorted(keys)
+        assert len(keys) == len(tree)
+        # "a/deep" sorts before "a-b", as comparing name by name requires
+        assert keys == [b"", b"a", b"a\0deep", b"a-b", b"b"]
+        assert dict(records)[b"a"] == 1100
+
+    def test_key_to_path(self):
+        """Test that keys turn back into relative paths."""
+        assert key_to_path(b"") == "."
+        assert key_to_path(b"a\0deep") == os.path.join("a", "deep")
+
+
+class TestSnapshotFile:
+    """Tests for save_snapshot and Snapshot."""
+
+    def test_round_trip(self, tmp_path):
+        """Test that a saved snapshot reads back the same records and header."""
+        tree = scan_tree(make_tree(tmp_path / "data"))
+        path = tmp_path / "snap.gz"
+
+        save_snapshot(tree, path)
+
+        with Snapshot(path) as snap:
+            assert snap.root == tree.root
+            assert snap.total == 1160
+            assert snap.dirs == 5
+            assert list(snap) == list(tree.sorted_records())
+        assert not os.path.exists(f"{path}.tmp")
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test that a file without the snapshot header raises ValueError."""
+        import gzip
+
+        path = tmp_path / "other.gz"
+        with gzip.open(path, "wb") as f:
+            f.write(b"hello\n")
+
+        with pytest.raises(ValueError, match="not a disk snapshot"):
+            Snapshot(path)
+
+
+class TestDiffSnapshots:
+    """Tests for diff_snapshots function."""
+
+    def test_ranks_growers_and_shrinkers(self, tmp_path):
+        """Test absolute and relative rankings across every level."""
+        root = make_tree(tmp_path / "data")
+        before = scan_tree(root)
+        (root / "a" / "deep" / "more.bin").write_bytes(b"x" * 500)
+        (root / "b" / "four.bin").write_bytes(b"x" * 5)
+        shutil.rmtree(root / "a-b")
+        (root / "c").mkdir()
+        (root / "c" / "new.bin").write_bytes(b"x" * 20)
+        after = scan_tree(root)
+
+        diff = diff_snapshots(before.sorted_records(), after.sorted_records())
+
+        deep = os.path.join("a", "deep")
+        assert [(c.path, c.change) for c in diff.grown] == [("a", 500), (deep, 500), ("c", 20)]
+        assert [(c.path, c.change) for c in diff.shrunk] == [("b", -45), ("a-b", -10)]
+        assert diff.grown_relative[0] == FolderChange("c", 0, 20)
+        assert diff.shrunk_relative[0].path == "a-b"
+        assert (diff.added, diff.removed) == (1, 1)
+        assert diff.total_change == 500 - 45 - 10 + 20
+
+    def test_top_n_and_depth_limits(self, tmp_path):
+        """Test that rankings are cut to top_n and max_depth."""
+        root = make_tree(tmp_path / "data")
+        before = scan_tree(root)
+        (root / "a" / "deep" / "more.bin").write_bytes(b"x" * 500)
+        (root / "b" / "more.bin").write_bytes(b"x" * 1)
+        after = scan_tree(root)
+
+        diff = diff_snapshots(before.sorted_records(), after.sorted_records(), 1, max_depth=1)
+
+        assert [c.path for c in diff.grown] == ["a"]
+
+    def test_min_size_filters_relative_rankings(self):
+        """Test that tiny folders are kept out of relative rankings only."""
+        old = [(b"", 1000), (b"big", 900), (b"tiny", 1)]
+        new = [(b"", 1100), (b"big", 990), (b"tiny", 11)]
+
+        diff = diff_snapshots(old, new, min_size=100)
+
+        assert [c.path for c in diff.grown] == ["big", "tiny"]
+        assert [c.path for c in diff.grown_relative] == ["big"]
+
+    def test_diff_of_saved_snapshots(self, tmp_path):
+        """Test diffing two snapshot files streamed from disk."""
+        root = make_tree(tmp_path / "data")
+        save_snapshot(scan_tree(root), tmp_path / "old.gz")
+        (root / "b" / "extra.bin").write_bytes(b"x" * 7)
+        save_snapshot(scan_tree(root), tmp_path / "new.gz")
+
+        with Snapshot(tmp_path / "old.gz") as old, Snapshot(tmp_path / "new.gz") as new:
+            diff = diff_snapshots(old, new)
+
+        assert diff.grown == [FolderChange("b", 50, 57)]
+        assert diff.total_change == 7
+
+    def test_new_folder_ratio_is_infinite(self):
+        """Test that a folder with no earlier size has an infinite ratio."""
+        assert FolderChange("x", 0, 5).ratio == math.inf